@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Compare a bench_suite.py run against a baseline and fail on regressions.
+
+Cases are matched by name. Throughputs (upload and hashing ``MBps``,
+listing ``files_per_s``, parsing ``names_per_s``) regress when they drop
+by more than their tolerance, and ``peak_rss_mib`` when it grows by more
+than its tolerance. A tolerance is a fraction of the baseline. It is looked
+up as ``<case>.<metric>``, then ``<metric>``: first in ``--tolerance``, then
+in the baseline's ``"tolerances"``, then in the defaults below.
+
+Exits 1 on a regression, and 2 when no metric could be compared.
+``--update`` writes the run as the new baseline instead, keeping the
+baseline's tolerances.
+
+Usage:
+    python benchmarks/bench_compare.py results.json [--baseline FILE]
+        [--tolerance METRIC=FRACTION ...] [--update]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Metrics compared, whether higher is better, and their default tolerance.
+METRICS = {
+    "MBps": (True, 0.3),
+    "files_per_s": (True, 0.3),
+    "names_per_s": (True, 0.3),
+    "peak_rss_mib": (False, 0.15),
+}
+
+_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _tolerance(case: str, metric: str, tolerances: dict) -> float:
+    for key in (f"{case}.{metric}", metric):
+        if key in tolerances:
+            return float(tolerances[key])
+    return METRICS[metric][1]
+
+
+def compare(baseline: dict, current: dict, tolerances: dict) -> tuple[list, int]:
+    """
+    Compare the results of ``current`` against ``baseline``
+
+    Returns
+    -------
+    tuple[list[dict], int]
+        One row per compared metric (name, metric, baseline, current,
+        change, tolerance, status) plus one per case missing from
+        ``current``, and the number of regressions
+    """
+    results = {r["name"]: r for r in current["results"]}
+    rows, regressions = [], 0
+    for base in baseline["results"]:
+        result = results.get(base["name"])
+        if result is None:
+            rows.append({"name": base["name"], "metric": "", "status": "missing"})
+            continue
+        for metric, (higher, _) in METRICS.items():
+            if base.get(metric) is None or result.get(metric) is None:
+                continue
+            tolerance = _tolerance(base["case"], metric, tolerances)
+            change = result[metric] / base[metric] - 1 if base[metric] else 0.0
+            worse = -change if higher else change
+            if worse > tolerance:
+                status = "REGRESSION"
+                regressions += 1
+            else:
+                status = "improved" if -worse > tolerance else "ok"
+            rows.append(
+                {
+                    "name": base["name"],
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                    "change": change,
+                    "tolerance": tolerance,
+                    "status": status,
+                }
+            )
+    return rows, regressions
+
+
+def _print(rows: list) -> None:
+    print(f"{'case':40s} {'metric':13s} {'baseline':>11s} {'current':>11s} change")
+    for row in rows:
+        if row["status"] == "missing":
+            print(f"{row['name']:40s} {'':13s} {'':>11s} {'':>11s} missing")
+            continue
+        print(
+            f"{row['name']:40s} {row['metric']:13s} {row['baseline']:11.1f} "
+            f"{row['current']:11.1f} {row['change']:+7.1%} "
+            f"(±{row['tolerance']:.0%}) {row['status']}"
+        )
+
+
+def _pair(text: str) -> tuple:
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected METRIC=FRACTION, got '{text}'")
+    return key, float(value)
+
+
+def main() -> int:
+    """Compare, print the table and return the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results", help="JSON written by bench_suite.py")
+    parser.add_argument("--baseline", default=_BASELINE)
+    parser.add_argument("--tolerance", type=_pair, action="append", default=[])
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.results, encoding="utf-8") as fh:
+        current = json.load(fh)
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    if args.update:
+        current["tolerances"] = baseline.get("tolerances", {})
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+            fh.write("\n")
+        print(f"baseline {args.baseline} updated")
+        return 0
+
+    if baseline["meta"].get("portal") != current["meta"].get("portal"):
+        print(
+            f"warning: fake portal settings differ, baseline "
+            f"{baseline['meta'].get('portal')}, run {current['meta'].get('portal')}"
+        )
+    tolerances = baseline.get("tolerances", {}) | dict(args.tolerance)
+    rows, regressions = compare(baseline, current, tolerances)
+    _print(rows)
+    if not any(row["status"] != "missing" for row in rows):
+        print("no metric compared")
+        return 2
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
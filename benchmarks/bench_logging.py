@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Benchmark eager against lazy JSON debug logging of a listing response.
+
+``_list_files`` used to log ``json.dumps(j, indent=3)`` of the whole
+response, building the string even when DEBUG is off. Times that against
+``logjson.LazyJSON``, which serialises only when a handler formats the
+record, with DEBUG off (the normal case) and on (logging to a string).
+
+Usage:
+    python benchmarks/bench_logging.py [--files N] [--runs N]
+"""
+
+import argparse
+import io
+import json
+import logging
+import time
+
+from dataportaltools.local_utils import logjson
+
+_logger = logging.getLogger("toolslib.bench_logging")
+
+
+def _make_listing(count: int) -> dict:
+    return {
+        "data": [
+            {
+                "FileID": i,
+                "FileName": f"metric_float_2024-01-01T00:00:00Z_2024-01-02T00:00:00Z_"
+                f"{i}_raw.parquet.zst",
+                "Size": 1000 + i,
+                "Tags": ["a", "b"],
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def _time(label: str, fn, runs: int, baseline: float = 0.0) -> float:
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    elapsed = (time.perf_counter() - t0) / runs
+    speedup = f"  ({baseline / elapsed:.0f}x)" if baseline else ""
+    print(f"  {label:10s} {elapsed * 1e3:10.3f} ms{speedup}")
+    return elapsed
+
+
+def main() -> None:
+    """Run the comparison and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    j = _make_listing(args.files)
+    handler = logging.StreamHandler(io.StringIO())
+    _logger.addHandler(handler)
+    _logger.propagate = False
+
+    def eager():
+        _logger.debug("listing %s", json.dumps(j, indent=3))
+
+    def lazy():
+        _logger.debug("listing %s", logjson.LazyJSON(j, indent=3))
+
+    for level in (logging.WARNING, logging.DEBUG):
+        _logger.setLevel(level)
+        print(f"{args.files} files, level {logging.getLevelName(level)}")
+        eager_s = _time("eager", eager, args.runs)
+        _time("lazy", lazy, args.runs, eager_s)
+        handler.stream = io.StringIO()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark ``utils.normalize_dataframe`` against the previous implementation.
+
+Builds a wide frame of string columns (a mix of integer, float and text
+columns, like our telemetry exports) and times the column type inference of
+the current engine and of the original serial ``pd.to_numeric`` loop.
+
+Usage:
+    python benchmarks/bench_normalize.py [--rows N] [--cols N] [--workers N]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataportaltools.local_utils import utils
+
+
+def _legacy_normalize(frame, skip_cols=None):
+    """The original serial implementation, kept verbatim for comparison."""
+    skip = set(skip_cols or [])
+    text_cols = []
+    for col in frame.columns:
+        if col in skip:
+            continue
+        if pd.api.types.is_numeric_dtype(frame[col]):
+            continue
+
+        numeric = pd.to_numeric(frame[col], errors="coerce")
+        if numeric.notna().all():
+            if (numeric == numeric.astype("int64")).all():
+                frame[col] = numeric.astype("int64")
+            else:
+                frame[col] = numeric.astype("float64")
+        else:
+            text_cols.append(str(col))
+
+    return text_cols
+
+
+def _make_frame(rows: int, cols: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {}
+    for i in range(cols):
+        kind = i % 3
+        if kind == 0:
+            data[f"c{i}"] = rng.integers(0, 10_000, rows).astype(str)
+        elif kind == 1:
+            data[f"c{i}"] = np.round(rng.random(rows) * 100, 3).astype(str)
+        else:
+            data[f"c{i}"] = np.char.add("host-", rng.integers(0, 50, rows).astype(str))
+    return pd.DataFrame(data)
+
+
+def _time(fn, frame) -> tuple[float, list]:
+    work = frame.copy()
+    t0 = time.perf_counter()
+    review = fn(work)
+    return time.perf_counter() - t0, review
+
+
+def main() -> None:
+    """Run the comparison and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--cols", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    frame = _make_frame(args.rows, args.cols)
+
+    legacy_s, legacy_review = _time(_legacy_normalize, frame)
+    new_s, new_review = _time(
+        lambda f: utils.normalize_dataframe(f, workers=args.workers), frame
+    )
+    assert legacy_review == new_review, "text column sets differ"
+
+    print(f"frame: {args.rows} rows x {args.cols} cols")
+    print(f"legacy normalize : {legacy_s:8.3f} s")
+    print(f"normalize        : {new_s:8.3f} s  ({legacy_s / new_s:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
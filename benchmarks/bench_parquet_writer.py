@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Size/time matrix for the ``--apply`` parquet writer settings.
+
+Writes a synthetic metric frame (timestamp, host label, integer counter and a
+float gauge -- the shape of our typical metric files) with each combination
+of zstd level, row-group size and time sorting, and prints the write time and
+resulting file size.
+
+Usage:
+    python benchmarks/bench_parquet_writer.py [--rows N] [--levels 1,3,9,19]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataportaltools.local_utils import utils
+
+
+def _make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2024-01-01T00:00:00")
+    # Collectors deliver roughly ordered data with some jitter.
+    offsets = np.sort(rng.integers(0, 86_400, rows)) + rng.integers(-30, 30, rows)
+    return pd.DataFrame(
+        {
+            "timestamp": (start + offsets.astype("timedelta64[s]")).astype(str),
+            "host": np.char.add("node-", rng.integers(0, 64, rows).astype(str)),
+            "counter": np.cumsum(rng.integers(0, 5, rows)),
+            "gauge": rng.normal(50.0, 5.0, rows),
+        }
+    )
+
+
+def main() -> None:
+    """Run the matrix and print one row per combination."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--levels", default="1,3,9,19")
+    parser.add_argument("--row-groups", default="65536,1048576")
+    args = parser.parse_args()
+
+    frame = _make_frame(args.rows)
+    times = pd.to_datetime(frame["timestamp"], utc=True)
+    levels = [int(v) for v in args.levels.split(",")]
+    row_groups = [int(v) for v in args.row_groups.split(",")]
+
+    fmt = "{:>5} | {:>10} | {:>6} | {:>9} | {:>12}"
+    print(fmt.format("level", "row group", "sorted", "write (s)", "size (B)"))
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "bench.parquet.zst")
+        for level in levels:
+            for row_group in row_groups:
+                for sort in (False, True):
+                    data = utils._sort_by_time(frame, times) if sort else frame
+                    t0 = time.perf_counter()
+                    utils.write_parquet(
+                        data,
+                        out,
+                        {"compression_level": level, "row_group_size": row_group},
+                    )
+                    elapsed = time.perf_counter() - t0
+                    print(
+                        fmt.format(
+                            level,
+                            row_group,
+                            str(sort),
+                            f"{elapsed:.3f}",
+                            os.path.getsize(out),
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Benchmark ``utils.parse_filenames`` against the previous regex parser.
+
+Parses a mix of metric, log and extra file names (1M by default, the size of
+a large dataset listing) with the original per-name ``re.search`` parser and
+with the bulk columnar API, then times both on pathological names: long
+names without enough underscores, on which the old unanchored patterns
+backtrack quadratically.
+
+Usage:
+    python benchmarks/bench_parse_filenames.py [--names N] [--long N,N,...]
+"""
+
+import argparse
+import re
+import time
+
+from dataportaltools.local_utils import utils
+
+
+def _legacy_valid_date(s):
+    date_pattern = r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?Z?"
+    return re.search(date_pattern, s) is not None
+
+
+def _legacy_parse_filename(fname):
+    """The original regex implementation, kept verbatim for comparison."""
+    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)"
+    m = re.search(regex_pattern, fname)
+    if m is not None:
+        if _legacy_valid_date(m.group(3)) and _legacy_valid_date(m.group(4)):
+            tail = m.group(6)
+            tail_pattern = r"([^.]+)\.([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "metric", {
+                    "name": m.group(1),
+                    "type": m.group(2),
+                    "start": m.group(3),
+                    "stop": m.group(4),
+                    "count": m.group(5),
+                    "flag": t.group(1),
+                    "ext": t.group(2),
+                    "compression": t.group(3),
+                    "prefix": m.group(3)[0:4],
+                }
+
+            tail_pattern = r"([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "metric", {
+                    "name": m.group(1),
+                    "type": m.group(2),
+                    "start": m.group(3),
+                    "stop": m.group(4),
+                    "count": m.group(5),
+                    "flag": t.group(1),
+                    "ext": t.group(2),
+                    "prefix": m.group(3)[0:4],
+                }
+        else:
+            # invalid date(s)
+            pass
+
+    # try log
+    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^.]+)\.(.*)"
+    m = re.search(regex_pattern, fname)
+    if m is not None:
+        if _legacy_valid_date(m.group(2)) and _legacy_valid_date(m.group(3)):
+            tail = m.group(7)
+            tail_pattern = r"([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "log", {
+                    "name": m.group(1),
+                    "start": m.group(2),
+                    "stop": m.group(3),
+                    "count": m.group(4),
+                    "size": m.group(5),
+                    "flag": m.group(6),
+                    "type": t.group(1),
+                    "compression": t.group(2),
+                    "prefix": m.group(3)[0:4],
+                }
+
+            return "log", {
+                "name": m.group(1),
+                "start": m.group(2),
+                "stop": m.group(3),
+                "count": m.group(4),
+                "size": m.group(5),
+                "flag": m.group(6),
+                "compression": m.group(7),
+                "prefix": m.group(3)[0:4],
+            }
+        # invalid date(s)
+
+    return "extra", {}
+
+
+def _make_names(count: int) -> list:
+    names = []
+    for i in range(count):
+        start = f"2024-01-{1 + i % 28:02d}T{i % 24:02d}:00:00Z"
+        stop = f"2024-01-{1 + i % 28:02d}T{i % 24:02d}:59:59Z"
+        kind = i % 4
+        if kind == 0:
+            names.append(f"cpu{i % 97}_float_{start}_{stop}_{i}_raw.parquet.zst")
+        elif kind == 1:
+            names.append(f"hist{i % 13}_uint_{start}_{stop}_{i}_raw.csv")
+        elif kind == 2:
+            names.append(f"app{i % 7}_{start}_{stop}_{i}_{i % 900}MB_raw.json.zst")
+        else:
+            names.append(f"docs/notes-{i}.md")
+    return names
+
+
+def _time(fn, *args) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    """Run the comparison and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--long", default="1000,4000,16000")
+    args = parser.parse_args()
+
+    names = _make_names(args.names)
+    legacy_s, legacy = _time(lambda: [_legacy_parse_filename(n) for n in names])
+    new_s, cols = _time(utils.parse_filenames, names)
+    assert [kind for kind, _ in legacy] == cols["kind"], "kinds differ"
+    assert [d.get("start") for _, d in legacy] == cols["start"], "starts differ"
+
+    print(f"{args.names} names")
+    print(f"legacy parse_filename loop : {legacy_s:8.3f} s")
+    print(f"parse_filenames            : {new_s:8.3f} s  ({legacy_s / new_s:.2f}x)")
+
+    for length in (int(n) for n in args.long.split(",")):
+        fname = "a_b_" + "x" * length
+        legacy_s, legacy = _time(_legacy_parse_filename, fname)
+        new_s, new = _time(utils.parse_filename, fname)
+        assert legacy == new
+        print(f"pathological {length:>6} chars : legacy {legacy_s:8.4f} s, ", end="")
+        print(f"new {new_s:8.6f} s")
+
+
+if __name__ == "__main__":
+    main()
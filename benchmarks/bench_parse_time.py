@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark timestamp normalization against the original generic parse.
+
+Times the original ``_parse_time`` body (``float()``, ``fromisoformat``,
+``strftime`` and a regex substitution per value), ``utils.normalize_timestamp``
+per value (fixed-shape parser behind an LRU cache) and the vectorized
+``utils.normalize_timestamps``. Two inputs: all-distinct values, and a
+listing-like one where ``--distinct`` start/stop values repeat.
+
+Usage:
+    python benchmarks/bench_parse_time.py [--values N] [--distinct N]
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd  # noqa: F401  imported up front so no timing includes it
+
+from dataportaltools.local_utils import utils
+
+
+def _legacy_parse_time(s: str) -> tuple[object, str]:
+    """The original ``_parse_time``, without its debug logging."""
+    if s == "":
+        return None, ""
+    try:
+        time_f = float(s)
+    except ValueError:
+        time_f = -1.0
+    if time_f > 1e9:
+        if time_f / 1e10 > 1.0:
+            return None, ""
+        time_o = datetime.fromtimestamp(time_f, timezone.utc)
+    else:
+        try:
+            time_o = datetime.fromisoformat(s)
+        except ValueError:
+            return None, ""
+    time_ts = time_o.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    time_ts = re.sub(r"\.000000", "", time_ts)
+    if "." in time_ts:
+        time_ts = time_ts[:-3]
+    return time_o, f"{time_ts}Z"
+
+
+def _make_values(count: int, distinct: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [
+        (start + timedelta(seconds=17 * (i % distinct))).isoformat() + "Z"
+        for i in range(count)
+    ]
+
+
+def _time(label: str, fn, values: list, baseline: float = 0.0) -> tuple:
+    utils._parse_time.cache_clear()  # pylint: disable=protected-access
+    t0 = time.perf_counter()
+    out = fn(values)
+    elapsed = time.perf_counter() - t0
+    speedup = f"  ({baseline / elapsed:.1f}x)" if baseline else ""
+    print(f"  {label:28s} {elapsed:8.3f} s{speedup}")
+    return elapsed, out
+
+
+def main() -> None:
+    """Run the comparison and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=2_000)
+    args = parser.parse_args()
+
+    for label, distinct in (("distinct", args.values), ("repeated", args.distinct)):
+        values = _make_values(args.values, distinct)
+        print(f"{args.values} values, {distinct} distinct ({label})")
+        legacy_s, legacy = _time(
+            "legacy _parse_time loop",
+            lambda v: [_legacy_parse_time(s)[1] for s in v],
+            values,
+        )
+        _, scalar = _time(
+            "normalize_timestamp loop",
+            lambda v: [utils.normalize_timestamp(s)[1] for s in v],
+            values,
+            legacy_s,
+        )
+        _, vector = _time(
+            "normalize_timestamps", utils.normalize_timestamps, values, legacy_s
+        )
+        assert legacy == scalar == vector, "normalized strings differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Simulate the upload time of a batch in glob order against largest first.
+
+Draws a batch of mostly small files with a few huge ones, then simulates
+``--workers`` lanes uploading it at ``--bandwidth`` bytes/s each, in three
+orders:
+
+* ``glob``: sorted by name, as a glob lists them (the huge files last);
+* ``largest-first``: ``schedule.SizeQueue`` (LPT);
+* ``small-lanes``: largest first, with ``--small-lanes`` lanes reserved for
+  files up to ``schedule.SMALL_FILE_SIZE``.
+
+Prints the time until the last file is uploaded and until half of the small
+files are. No files are written; the sizes are drawn with ``--seed``.
+
+Usage:
+    python benchmarks/bench_schedule.py [--files N] [--huge N] [--workers N]
+        [--small-lanes N] [--bandwidth B] [--seed N]
+"""
+
+import argparse
+import heapq
+import random
+import statistics
+
+from dataportaltools.local_utils import schedule
+
+_MIB = 1024 * 1024
+
+
+class _Listed:
+    """The files in their order, with the interface of SizeQueue."""
+
+    def __init__(self, files: list[str]):
+        self._files = list(files)
+
+    def take(self, small: bool = False) -> str:
+        del small
+        return self._files.pop(0) if self._files else None
+
+
+def _simulate(queue: object, lanes: list, sizes: dict, bandwidth: float) -> dict:
+    """Time each file is done; every lane takes a file whenever it is free."""
+    done = {}
+    free = [(0.0, i) for i in range(len(lanes))]
+    while free:
+        now, lane = heapq.heappop(free)
+        name = queue.take(lanes[lane])
+        if name is None:
+            continue
+        done[name] = now + sizes[name] / bandwidth
+        heapq.heappush(free, (done[name], lane))
+    return done
+
+
+def main() -> None:
+    """Run the simulation and print the times."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--huge", type=int, default=4, help="8 GiB files")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--small-lanes", type=int, default=2)
+    parser.add_argument("--bandwidth", type=float, default=50e6, help="bytes/s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = {f"f{i}": int(rng.lognormvariate(14, 2)) for i in range(args.files)}
+    for i in range(args.huge):
+        sizes[f"huge{i}"] = 8 * 1024 * _MIB
+    names = sorted(sizes)
+    small = [n for n in names if sizes[n] <= schedule.SMALL_FILE_SIZE]
+    # SizeQueue reads the sizes from the files; here they are simulated.
+    schedule.file_size = sizes.__getitem__
+
+    print(
+        f"{len(names)} files, {sum(sizes.values()) / 1e9:.1f} GB, "
+        f"{len(small)} small, {args.workers} workers at {args.bandwidth / 1e6:.0f} MB/s"
+    )
+    print(f"  {'order':15s} {'total':>10s} {'small p50':>10s}")
+    cases = [
+        ("glob", _Listed(names), schedule.lanes(args.workers, 0)),
+        ("largest-first", schedule.SizeQueue(names), schedule.lanes(args.workers, 0)),
+        (
+            "small-lanes",
+            schedule.SizeQueue(names),
+            schedule.lanes(args.workers, args.small_lanes),
+        ),
+    ]
+    for label, queue, lanes in cases:
+        done = _simulate(queue, lanes, sizes, args.bandwidth)
+        p50 = statistics.median(done[n] for n in small) if small else 0.0
+        print(f"  {label:15s} {max(done.values()):9.1f}s {p50:9.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark the startup cost of the dataportaltools CLI.
+
+Runs fresh interpreters with ``python -X importtime`` and reports the best
+and median cumulative import time of ``dataportaltools.main`` (the lazy
+imports of the current layout), next to importing it together with every
+command module (what the previous eager imports loaded up front), plus the
+wall time of a ``--help`` invocation. The slowest imports of the current
+layout are listed. tests/test_startup.py enforces a budget on the first
+number.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--top N]
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+_CURRENT = "import dataportaltools.main"
+_EAGER = (
+    "import dataportaltools.main; "
+    "from dataportaltools.local_utils import catalog, headtail, logscan, upload, verify"
+)
+_HELP = "from dataportaltools.main import main; main(['--help'])"
+
+_LINE = re.compile(r"import time:\s*(\d+) \|\s*(\d+) \| (\s*)(\S+)")
+
+
+def _importtime(code: str) -> list:
+    """Return ``(cumulative_us, depth, module)`` for each import of ``code``."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    return [
+        (int(m.group(2)), len(m.group(3)), m.group(4)) for m in _LINE.finditer(stderr)
+    ]
+
+
+def _total_us(code: str) -> int:
+    """Cumulative import time of the package imports of ``code``.
+
+    Interpreter startup (``site`` and what its ``.pth`` files load) is left
+    out; it is the same with or without this package.
+    """
+    return sum(
+        us
+        for us, depth, module in _importtime(code)
+        if depth == 0 and module.startswith("dataportaltools")
+    )
+
+
+def _wall_s(code: str) -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], capture_output=True, check=False)
+    return time.perf_counter() - t0
+
+
+def _report(label: str, samples: list, unit: str) -> None:
+    print(
+        f"{label:34s} best {min(samples):9.1f} {unit}"
+        f"   median {statistics.median(samples):9.1f} {unit}"
+    )
+
+
+def main() -> None:
+    """Run the measurements and print them."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # The first run warms the bytecode and file system caches.
+    _importtime(_EAGER)
+    current = [_total_us(_CURRENT) / 1000 for _ in range(args.runs)]
+    eager = [_total_us(_EAGER) / 1000 for _ in range(args.runs)]
+    help_wall = [_wall_s(_HELP) * 1000 for _ in range(args.runs)]
+
+    print(f"{args.runs} runs each")
+    _report("import dataportaltools.main", current, "ms")
+    _report("  + all command modules (eager)", eager, "ms")
+    _report("wall time of --help", help_wall, "ms")
+
+    print("\nslowest imports of dataportaltools.main (cumulative, one run):")
+    # importtime lists the imports an import triggers before the import.
+    block, entries = [], []
+    for entry in _importtime(_CURRENT):
+        block.append(entry)
+        if entry[1] == 0:
+            if entry[2] == "dataportaltools.main":
+                entries = block
+            block = []
+    entries = sorted(entries, reverse=True)[: args.top]
+    for us, depth, module in entries:
+        print(f"  {us / 1000:8.1f} ms  {' ' * depth}{module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Benchmark suite of the client against a local fake portal.
+
+Runs against ``fake_portal.FakePortal`` (no staging portal or token needed):
+
+* ``upload``: wall time, MB/s and peak RSS for every file size and
+  concurrency in the matrix (concurrent uploads each on their own
+  connection);
+* ``listing``: ``/dataset/{id}/files`` of datasets with N files;
+* ``hashing``: the content hash of a file (the upload idempotency key);
+* ``parsing``: ``utils.parse_filename`` of convention file names.
+
+Each case runs ``--runs`` times in a fresh interpreter, so its peak RSS is
+its own; the median time and the largest peak are kept. The fake portal's
+latency, bandwidth and error rate are configurable. Results are written as
+JSON (``--out``) for comparison with a later run.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1,16,128] [--concurrency 1,4]
+        [--listing 10000,100000] [--names N] [--runs N] [--latency S]
+        [--bandwidth B] [--error-rate F] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from fake_portal import FakePortal
+
+_MIB = 1024 * 1024
+
+_DATA = {
+    "datatype": "",
+    "dataflag": "",
+    "start": "",
+    "stop": "",
+    "count": 0,
+    "size": "",
+}
+
+
+def _rss_mib() -> float:
+    """Peak RSS of this process so far, in MiB.
+
+    On Linux this is VmHWM: ru_maxrss carries the RSS of the parent at the
+    fork over the exec, so it would include the suite's own memory.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (_MIB if sys.platform == "darwin" else 1024)
+
+
+def _file_name(index: int) -> str:
+    return f"bench_float_2024-01-01T00:00:00Z_2024-01-02T00:00:00Z_{index + 1}_raw.csv"
+
+
+def _make_file(path: str, size: int) -> None:
+    block = os.urandom(min(size, _MIB))
+    with open(path, "wb") as fh:
+        for offset in range(0, size, len(block) or 1):
+            fh.write(block[: size - offset])
+
+
+# -- cases, run in a child interpreter -----------------------------------------
+
+
+def _upload(spec: dict) -> dict:
+    from dataportaltools.local_utils.upload import WCIBConnection
+
+    paths = spec["paths"]
+    connections = [WCIBConnection(spec["api"], token="bench") for _ in paths]
+    for wc in connections:
+        wc.connect()
+    failures = []
+    start = threading.Barrier(len(paths) + 1)
+
+    def upload(wc: WCIBConnection, path: str) -> None:
+        start.wait()
+        ret, _ = wc.upload_files(1, [path], dict(_DATA), "", "", False)
+        failures.append(ret)
+
+    threads = [
+        threading.Thread(target=upload, args=(wc, path))
+        for wc, path in zip(connections, paths)
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - t0
+    size = sum(os.path.getsize(p) for p in paths)
+    return {
+        "seconds": seconds,
+        "MBps": size / seconds / 1e6,
+        "failures": sum(failures),
+    }
+
+
+def _listing(spec: dict) -> dict:
+    from dataportaltools.local_utils.upload import WCIBConnection
+
+    wc = WCIBConnection(spec["api"], token="bench")
+    wc.connect()
+    t0 = time.perf_counter()
+    files = wc._list_files(1, False, False)  # pylint: disable=protected-access
+    seconds = time.perf_counter() - t0
+    return {"seconds": seconds, "files_per_s": len(files or ()) / seconds}
+
+
+def _hashing(spec: dict) -> dict:
+    from dataportaltools.local_utils import catalog
+
+    t0 = time.perf_counter()
+    catalog.content_hash(spec["paths"][0])
+    seconds = time.perf_counter() - t0
+    return {
+        "seconds": seconds,
+        "MBps": os.path.getsize(spec["paths"][0]) / seconds / 1e6,
+    }
+
+
+def _parsing(spec: dict) -> dict:
+    from dataportaltools.local_utils import utils
+
+    names = [_file_name(i) for i in range(spec["names"])]
+    t0 = time.perf_counter()
+    for name in names:
+        utils.parse_filename(name)
+    seconds = time.perf_counter() - t0
+    return {"seconds": seconds, "names_per_s": len(names) / seconds}
+
+
+_CASES = {
+    "upload": _upload,
+    "listing": _listing,
+    "hashing": _hashing,
+    "parsing": _parsing,
+}
+
+
+def _child(spec: dict) -> None:
+    result = _CASES[spec["case"]](spec)
+    print(json.dumps(result | {"peak_rss_mib": _rss_mib()}))
+
+
+# -- the suite -------------------------------------------------------------------
+
+
+def _run(name: str, spec: dict, runs: int) -> dict:
+    """Run a case ``runs`` times; median of the timings, largest peak RSS."""
+    outs = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", json.dumps(spec)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        outs.append(json.loads(proc.stdout.splitlines()[-1]))
+    result = {"name": name, "case": spec["case"], "params": spec["params"]}
+    for key in outs[0]:
+        values = [out[key] for out in outs]
+        result[key] = (
+            max(values) if key == "peak_rss_mib" else statistics.median(values)
+        )
+    result["seconds_runs"] = [out["seconds"] for out in outs]
+    print(
+        f"  {name:40s} {result['seconds']:9.3f} s  "
+        f"{result['peak_rss_mib']:8.1f} MiB RSS"
+    )
+    return result
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _ints(text: str) -> list:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main() -> None:
+    """Run the suite, print the results and write them as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=_ints, default=[1, 16, 128], help="MiB")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 4])
+    parser.add_argument("--listing", type=_ints, default=[10_000, 100_000])
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="bytes/s")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(json.loads(args.child))
+        return
+
+    knobs = {
+        "latency": args.latency,
+        "bandwidth": args.bandwidth,
+        "error_rate": args.error_rate,
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        print("upload")
+        for size in args.sizes:
+            paths = []
+            for i in range(max(args.concurrency)):
+                paths.append(os.path.join(tmp, f"{size}-{i}", _file_name(i)))
+                os.makedirs(os.path.dirname(paths[-1]))
+                _make_file(paths[-1], size * _MIB)
+            for concurrency in args.concurrency:
+                with FakePortal(**knobs) as portal:
+                    spec = {
+                        "case": "upload",
+                        "api": portal.url,
+                        "paths": paths[:concurrency],
+                        "params": {"size_mib": size, "concurrency": concurrency},
+                    }
+                    name = f"upload[size={size}MiB,concurrency={concurrency}]"
+                    results.append(_run(name, spec, args.runs))
+
+        print("listing")
+        for files in args.listing:
+            with FakePortal(**knobs, files=files) as portal:
+                spec = {
+                    "case": "listing",
+                    "api": portal.url,
+                    "params": {"files": files},
+                }
+                results.append(_run(f"listing[files={files}]", spec, args.runs))
+
+        print("hashing, parsing")
+        size = max(args.sizes)
+        spec = {
+            "case": "hashing",
+            "paths": [os.path.join(tmp, f"{size}-0", _file_name(0))],
+            "params": {"size_mib": size},
+        }
+        results.append(_run(f"hashing[size={size}MiB]", spec, args.runs))
+        spec = {"case": "parsing", "names": args.names, "params": {"names": args.names}}
+        results.append(_run(f"parsing[names={args.names}]", spec, args.runs))
+
+    report = {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "portal": knobs,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
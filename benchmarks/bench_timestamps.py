@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Benchmark timestamp detection + parsing against format-less ``pd.to_datetime``.
+
+Times, per column layout, the original ``pd.to_datetime(values,
+errors="coerce", utc=True)`` call of ``rename_from_data`` and the current
+``timestamps.detect`` (sampled format inference) plus ``timestamps.parse``.
+Layouts: int64 epoch milliseconds, ISO-8601 strings and day-first strings.
+
+The full-size run uses 100M rows (``--rows 100000000``); string layouts need
+several GB of memory at that size, so run ``--cases epoch`` alone if short.
+
+Usage:
+    python benchmarks/bench_timestamps.py [--rows N] [--cases epoch,iso,dayfirst]
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dataportaltools.local_utils import timestamps
+
+_START_MS = 1_704_067_200_000
+
+
+def _make_column(case: str, rows: int) -> pd.Series:
+    epoch_ms = _START_MS + np.arange(rows, dtype="int64") * 1000
+    if case == "epoch":
+        return pd.Series(epoch_ms)
+    times = pd.Series(pd.to_datetime(epoch_ms, unit="ms", utc=True))
+    if case == "iso":
+        return times.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return times.dt.strftime("%d/%m/%Y %H:%M:%S")
+
+
+def _legacy(values: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        # The per-element fallback warning is part of what is being measured.
+        warnings.simplefilter("ignore", UserWarning)
+        return pd.to_datetime(values, errors="coerce", utc=True)
+
+
+def _current(values: pd.Series) -> pd.Series:
+    col, fmt = timestamps.detect(values.to_frame("t"))
+    return timestamps.parse(values, fmt) if col == "t" else None
+
+
+def _time(fn, values) -> tuple[float, pd.Series]:
+    t0 = time.perf_counter()
+    out = fn(values)
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    """Run the comparison and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cases", default="epoch,iso,dayfirst")
+    args = parser.parse_args()
+
+    print(f"column: {args.rows} rows")
+    for case in args.cases.split(","):
+        values = _make_column(case, args.rows)
+        legacy_s, legacy = _time(_legacy, values)
+        new_s, new = _time(_current, values)
+        # Format-less parsing reads int64 epochs as nanoseconds, so only the
+        # text layouts can be compared value for value.
+        if case != "epoch":
+            assert (legacy == new).all(), f"{case}: parsed values differ"
+        print(f"{case:9s} legacy {legacy_s:8.3f} s   current {new_s:8.3f} s", end="")
+        print(f"  ({legacy_s / new_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""A local stand-in for the portal API, for benchmarks and manual runs.
+
+Implements the endpoints the client uses, keeping datasets and file
+metadata (not content) in memory:
+
+* ``GET /test``;
+* ``GET``/``POST /dataset`` and ``DELETE /dataset/{id}``;
+* ``GET``/``POST /dataset/{id}/files`` and ``POST /dataset/{id}/extrafiles``
+  (multipart uploads, with a ``Content-Length`` or chunked);
+* ``PUT /dataset/{id}/files/{fileid}`` (annotations).
+
+Every response is delayed by ``latency`` seconds, request bodies are read
+at most at ``bandwidth`` bytes/s per connection, and a ``error_rate``
+fraction of the requests (after ``/test``) is answered with a 503.
+
+In a benchmark::
+
+    with FakePortal(latency=0.01) as portal:
+        wc = WCIBConnection(portal.url, token="x")
+
+or for the CLI, in another shell::
+
+    python benchmarks/fake_portal.py --port 3001 --files 100000
+    dataportaltools -a http://127.0.0.1:3001/v1 -t <any token file> -l 1
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Bytes read from a request body at a time.
+_CHUNK = 256 * 1024
+
+_FILENAME = re.compile(rb'name="filename"\r\n\r\n([^\r]*)\r\n')
+_ROUTE = re.compile(r"^/v1/dataset(?:/(\d+)(?:/(files|extrafiles)(?:/(\d+))?)?)?$")
+
+
+def listing_entry(fileid: int, name: Optional[str] = None, size: int = 0) -> dict:
+    """A ``/dataset/{id}/files`` entry as the portal lists it."""
+    return {
+        "FileID": fileid,
+        "MFileName": name
+        or f"bench_float_2024-01-01T00:00:00Z_2024-01-02T00:00:00Z_{fileid}_raw.csv",
+        "FileSize": size,
+        "StartDate": "2024-01-01T00:00:00Z",
+        "StopDate": "2024-01-02T00:00:00Z",
+        "MetricEntries": fileid,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakePortal"
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        """Read the body at the server's bandwidth; returns its first bytes."""
+        first = b""
+        length = self.headers.get("Content-Length")
+        chunked = self.headers.get("Transfer-Encoding", "").lower() == "chunked"
+        remaining = int(length or 0)
+        t0 = time.perf_counter()
+        received = 0
+        while True:
+            if chunked:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                data = self.rfile.read(size)
+                self.rfile.readline()
+            else:
+                if remaining <= 0:
+                    break
+                data = self.rfile.read(min(_CHUNK, remaining))
+                remaining -= len(data)
+                if not data:
+                    break
+            if len(first) < _CHUNK:
+                first += data[: _CHUNK - len(first)]
+            received += len(data)
+            if self.server.bandwidth:
+                ahead = received / self.server.bandwidth - (time.perf_counter() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+        self.server.count(received)
+        return first
+
+    def _reply(self, status: int, body: object) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        first = self._read_body()
+        if url.path == "/v1/test":
+            self._reply(200, {"status": "ok"})
+            return
+        if self.server.inject_error():
+            self._reply(503, {"error": "injected failure"})
+            return
+        m = _ROUTE.match(url.path)
+        if m is None:
+            self._reply(404, {"error": f"no route {url.path}"})
+            return
+        dataset, kind, fileid = m.groups()
+        self._reply(*self.server.dispatch(method, dataset, kind, fileid, url, first))
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+
+class FakePortal(ThreadingHTTPServer):
+    """
+    The fake portal, serving on 127.0.0.1 from a thread while in a ``with``
+
+    Parameters
+    ----------
+    latency : float
+        Seconds every response is delayed
+    bandwidth : float
+        Bytes/s a request body is read at, per connection (0: unlimited)
+    error_rate : float
+        Fraction of the requests answered with a 503
+    files : int
+        Files listed in dataset 1 from the start
+    port : int
+        Port to listen on (0: any free port)
+    seed : int
+        Seed of the error injection
+    """
+
+    daemon_threads = True
+
+    # parameters are the knobs of the fake
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        error_rate: float = 0.0,
+        files: int = 0,
+        port: int = 0,
+        seed: int = 0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.requests = 0
+        self.received_bytes = 0
+        self.errors = 0
+        self.datasets = {1: [listing_entry(i + 1) for i in range(files)]}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The API URL of the fake."""
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def __enter__(self) -> "FakePortal":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def count(self, received: int) -> None:
+        """Count a request and its body bytes."""
+        with self._lock:
+            self.requests += 1
+            self.received_bytes += received
+
+    def inject_error(self) -> bool:
+        """Whether to fail this request."""
+        with self._lock:
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    # parameters are the parts of the route
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-return-statements
+    def dispatch(
+        self,
+        method: str,
+        dataset: Optional[str],
+        kind: Optional[str],
+        fileid: Optional[str],
+        url: object,
+        first: bytes,
+    ) -> tuple[int, dict]:
+        """Status and JSON body of a request on a ``/dataset`` route."""
+        with self._lock:
+            if dataset is None:
+                if method == "POST":
+                    new = max(self.datasets, default=0) + 1
+                    self.datasets[new] = []
+                    return 200, {"DatasetID": new, "ContainerName": f"bench-{new}"}
+                return 200, {"Datasets": [self._dataset(d) for d in self.datasets]}
+            files = self.datasets.get(int(dataset))
+            if files is None:
+                return 404, {"error": f"no dataset {dataset}"}
+            if kind is None and method == "DELETE":
+                del self.datasets[int(dataset)]
+                return 200, {"deleted": int(dataset)}
+            if fileid is not None and method == "PUT":
+                return 200, {"fileId": int(fileid), "status": "READY"}
+            if method == "GET":
+                limit = int(parse_qs(url.query).get("limit", ["0"])[0])
+                return 200, {"data": files[:limit] if limit else files}
+            if method == "POST" and kind is not None:
+                m = _FILENAME.search(first)
+                name = m.group(1).decode() if m else f"file-{len(files) + 1}"
+                entry = listing_entry(len(files) + 1, name)
+                files.append(entry)
+                path = f"{dataset}/{kind}/{name}"
+                return 200, {"fileId": entry["FileID"], "status": "READY", "path": path}
+        return 405, {"error": f"{method} not allowed"}
+
+    @staticmethod
+    def _dataset(datasetid: int) -> dict:
+        return {
+            "DatasetID": datasetid,
+            "DatasetName": f"bench-{datasetid}",
+            "CreateDate": "2024-01-01T00:00:00Z",
+            "Category": "metric",
+            "Organization": "bench",
+        }
+
+
+def main() -> None:
+    """Serve the fake portal until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="bytes/s")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--files", type=int, default=0, help="files in dataset 1")
+    args = parser.parse_args()
+    portal = FakePortal(
+        args.latency, args.bandwidth, args.error_rate, args.files, args.port
+    )
+    print(f"serving {portal.url}")
+    try:
+        portal.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.server_close()
+
+
+if __name__ == "__main__":
+    main()
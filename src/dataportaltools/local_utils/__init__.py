@@ -1,8 +1,24 @@
 """Helper modules for the dataportaltools CLI."""
 
 __all__ = [
+    "batch",
+    "catalog",
+    "compression",
+    "concurrency",
     "config",
+    "daemon",
+    "health",
+    "filenames",
+    "headtail",
+    "logjson",
+    "logscan",
+    "partition",
+    "profiling",
+    "schedule",
+    "timestamps",
+    "tracing",
     "upload",
     "utils",
+    "verify",
     "wcib_format",
 ]
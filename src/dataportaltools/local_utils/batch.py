@@ -0,0 +1,256 @@
+"""Batch mode: many dataportal operations over one connection.
+
+Each CLI invocation pays for interpreter startup, reading the token, a new
+HTTP session and the ``/test`` probe of :meth:`WCIBConnection.connect`.
+:func:`run` reads operations as JSON lines and runs them all over one
+connected :class:`WCIBConnection`, writing one JSON result line per
+operation as soon as it completes::
+
+    {"op": "create", "info": "info.txt", "user": "alice"}
+    {"op": "upload", "dataset": 7, "src": ["data/*.parquet"], "tags": ["raw"]}
+    {"op": "upload", "dataset": 7, "src": "notes.txt", "extra": true}
+    {"op": "setmeta", "dataset": 7, "file": 42, "tags": ["checked"]}
+    {"op": "list"}
+    {"op": "list", "dataset": 7}
+    {"op": "delete", "dataset": 7, "force": true}
+
+Blank lines and lines starting with ``#`` are skipped. A failed operation is
+reported (``"ok": false`` with an ``"error"``) and the batch goes on.
+"""
+
+import json
+import logging
+from typing import Callable, Iterable, Optional, TextIO
+
+from . import upload
+from . import utils
+
+# Reports failures through the client's own rendering of server errors.
+# pylint: disable=protected-access
+
+_logger = logging.getLogger("toolslib.batch")
+
+# Upload fields mapped to the keys of the data dict of WCIBConnection.upload.
+_UPLOAD_DATA = {
+    "dtype": ("datatype", ""),
+    "flag": ("dataflag", ""),
+    "start": ("start", ""),
+    "stop": ("stop", ""),
+    "count": ("count", 0),
+    "size": ("size", ""),
+}
+
+
+class BatchError(Exception):
+    """Raised for an operation line that cannot be run as given."""
+
+
+class _ErrorLog(logging.Handler):
+    """
+    Collects the errors logged under ``toolslib`` while it is attached
+
+    A failed operation reports them as its error: the client of a daemon
+    never sees the daemon's log.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+def _field(op: dict, key: str) -> object:
+    """Return the required field ``key`` of ``op``."""
+    if key not in op:
+        raise BatchError(f"'{op['op']}' needs '{key}'")
+    return op[key]
+
+
+def _dataset(op: dict) -> int:
+    """Return the dataset id of ``op``."""
+    value = _field(op, "dataset")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BatchError(f"invalid dataset id '{value}'") from None
+
+
+def _tags(op: dict) -> Optional[list]:
+    """Return the tags of ``op``; ``None`` when not given, ``[]`` clears them."""
+    tags = op.get("tags")
+    if tags is not None and not isinstance(tags, list):
+        raise BatchError("'tags' must be a list")
+    return tags
+
+
+def _pois(op: dict) -> Optional[list]:
+    """
+    Return the points of interest of ``op`` in API form
+
+    Each is a ``{"start", "stop", "text"}`` dict or a ``"start,stop,text"``
+    string as given to ``--poi``; start/stop are normalized like upload
+    timestamps.
+    """
+    pois = op.get("poi")
+    if pois is None:
+        return None
+    if not isinstance(pois, list):
+        raise BatchError("'poi' must be a list")
+    out = []
+    for poi in pois:
+        if isinstance(poi, str):
+            # text may contain commas, so split on the first two only
+            parts = poi.split(",", 2)
+            if len(parts) != 3:
+                raise BatchError(f"invalid poi '{poi}', expected 'start,stop,text'")
+            poi = dict(zip(("start", "stop", "text"), parts))
+        if not isinstance(poi, dict) or not {"start", "stop"} <= poi.keys():
+            raise BatchError(f"invalid poi {poi!r}")
+        start_ok, start = utils.normalize_timestamp(str(poi["start"]))
+        stop_ok, stop = utils.normalize_timestamp(str(poi["stop"]))
+        if not start_ok or not stop_ok:
+            raise BatchError(
+                f"invalid poi {poi!r}: start/stop must be valid timestamps "
+                "(ISO-8601 or epoch)"
+            )
+        out.append({"start": start, "stop": stop, "text": poi.get("text", "")})
+    return out
+
+
+def _create(wc: object, op: dict, dryrun: bool) -> tuple[bool, object]:
+    return True, wc.new_dataset(_field(op, "info"), op.get("user"), dryrun)
+
+
+def _upload(wc: object, op: dict, dryrun: bool) -> tuple[bool, object]:
+    src = _field(op, "src")
+    src_list = [src] if isinstance(src, str) else list(src)
+    pois = _pois(op)
+    # POIs are time ranges of one file, as with --poi.
+    if pois is not None and len(utils.get_all_src_files(src_list)) > 1:
+        raise BatchError("'poi' cannot be applied to a multi-file upload")
+    data = {
+        key: op.get(field, default) for field, (key, default) in _UPLOAD_DATA.items()
+    }
+    ret, files = wc.upload_files(
+        _dataset(op),
+        src_list,
+        data,
+        op.get("prefix", ""),
+        op.get("kind", ""),
+        dryrun,
+        _tags(op),
+        pois,
+        bool(op.get("extra", False)),
+    )
+    return ret == 0, {"files": files}
+
+
+def _setmeta(wc: object, op: dict, dryrun: bool) -> tuple[bool, object]:
+    tags, pois = _tags(op), _pois(op)
+    if tags is None and pois is None:
+        raise BatchError("'setmeta' needs 'tags' and/or 'poi'")
+    fileid = _field(op, "file")
+    return True, wc.set_file_metadata(_dataset(op), int(fileid), tags, pois, dryrun)
+
+
+def _list(wc: object, op: dict, dryrun: bool) -> tuple[bool, object]:
+    if "dataset" not in op:
+        datasets = wc.datasets(dryrun)
+        return datasets is not None, {"datasets": datasets}
+    datasetid = _dataset(op)
+    # The listings WCIBConnection.list_files prints.
+    data_files = wc._list_files(datasetid, False, dryrun)
+    extra_files = wc._list_files(datasetid, True, dryrun)
+    ok = data_files is not None and extra_files is not None
+    return ok, {"data": data_files, "extra": extra_files}
+
+
+def _delete(wc: object, op: dict, dryrun: bool) -> tuple[bool, object]:
+    return wc.delete(_dataset(op), bool(op.get("force", False)), dryrun) == 0, None
+
+
+_OPERATIONS: dict[str, Callable[[object, dict, bool], tuple[bool, object]]] = {
+    "create": _create,
+    "upload": _upload,
+    "setmeta": _setmeta,
+    "list": _list,
+    "delete": _delete,
+}
+
+
+def run_operation(wc: object, op: dict, dryrun: bool = False) -> dict:
+    """
+    Runs one batch operation and returns its result record
+
+    Parameters
+    ----------
+    wc : WCIBConnection
+        Connected client
+    op : dict
+        Operation, ``{"op": "create" | "upload" | "setmeta" | "list" |
+        "delete", ...}``; an ``"id"`` is echoed in the result and a
+        ``"dryrun"`` overrides ``dryrun``
+    dryrun : bool
+        Indicate dryrun or not
+
+    Returns
+    -------
+    dict
+        ``{"op", "ok", "result", "error"}`` (and ``"id"`` when given);
+        ``error`` is ``None`` on success, else the exception or the errors
+        logged by the operation.
+    """
+    record = {"op": op.get("op")} if isinstance(op, dict) else {"op": None}
+    if isinstance(op, dict) and "id" in op:
+        record["id"] = op["id"]
+    ok, result, error = False, None, None
+    errors = _ErrorLog()
+    logging.getLogger("toolslib").addHandler(errors)
+    try:
+        if not isinstance(op, dict) or op.get("op") not in _OPERATIONS:
+            raise BatchError(
+                f"unknown operation, expected one of {', '.join(_OPERATIONS)}"
+            )
+        ok, result = _OPERATIONS[op["op"]](wc, op, bool(op.get("dryrun", dryrun)))
+        if not ok:
+            error = "; ".join(errors.messages) or "operation failed"
+    # Batch boundary: one failed operation must not end the batch.
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        error = upload.WCIBConnection._error_detail(e)
+    finally:
+        logging.getLogger("toolslib").removeHandler(errors)
+    return record | {"ok": ok, "result": result, "error": error}
+
+
+def run(wc: object, lines: Iterable[str], out: TextIO, dryrun: bool = False) -> int:
+    """
+    Runs the JSON-lines batch ``lines`` over the connected client ``wc``
+
+    Writes one JSON result line to ``out`` per operation, flushed as soon as
+    the operation completes, with the 1-based ``"line"`` number of the
+    operation added to its :func:`run_operation` record.
+
+    Returns
+    -------
+    int
+        0 when every operation succeeded, else 1
+    """
+    ret = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {"op": None, "ok": False, "result": None, "error": f"{e}"}
+        else:
+            record = run_operation(wc, op, dryrun)
+        _logger.debug("line %d, %s", number, record)
+        if not record["ok"]:
+            ret = 1
+        out.write(json.dumps({"line": number} | record) + "\n")
+        out.flush()
+    return ret
@@ -0,0 +1,382 @@
+"""Local SQLite catalog of the files uploaded to (or listed in) datasets.
+
+Answering "did this file already go to dataset N, and as which FileID?"
+otherwise means listing the remote dataset again. :class:`Catalog` keeps one
+row per file and dataset of a portal (its API URL), recorded from upload
+responses (FileID, remote path, status) and from dataset listings. Rows
+carry the xxh128 content hash that is also sent as the upload
+``Idempotency-Key``, so an upload can skip content the dataset is known to
+have without any request. Lookups by dataset, name,
+hash and time range are indexed.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+import xxhash
+
+from . import utils
+
+# Uses utils' package-internal _parse_time rather than duplicating it.
+# pylint: disable=protected-access
+
+_logger = logging.getLogger("toolslib.catalog")
+
+# Bytes hashed per read; files are never loaded fully into memory.
+_HASH_CHUNK = 1024 * 1024
+
+# Dataset IDs are only unique within one portal, so its API URL is part of
+# the key. Catalogs written before it was are migrated by _migrate.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    api TEXT NOT NULL DEFAULT '',
+    dataset INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    file_id INTEGER,
+    remote_path TEXT,
+    local_path TEXT,
+    hash TEXT,
+    size INTEGER,
+    start TEXT,
+    stop TEXT,
+    count INTEGER,
+    status TEXT,
+    extra INTEGER NOT NULL DEFAULT 0,
+    recorded TEXT NOT NULL,
+    UNIQUE (api, dataset, extra, name)
+);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash, dataset);
+CREATE INDEX IF NOT EXISTS files_time ON files (dataset, start, stop);
+"""
+
+# Columns in the order they are returned by queries.
+COLUMNS = (
+    "api",
+    "dataset",
+    "name",
+    "file_id",
+    "remote_path",
+    "local_path",
+    "hash",
+    "size",
+    "start",
+    "stop",
+    "count",
+    "status",
+    "extra",
+    "recorded",
+)
+
+# Columns identifying a file.
+_KEY = ("api", "dataset", "extra", "name")
+
+# Later records fill in what an earlier one lacked; a listing carries no hash
+# or local path, so those of a previous upload are kept.
+_UPSERT = f"""
+INSERT INTO files ({", ".join(COLUMNS)})
+VALUES ({", ".join(f":{c}" for c in COLUMNS)})
+ON CONFLICT ({", ".join(_KEY)}) DO UPDATE SET
+    {", ".join(f"{c} = COALESCE(excluded.{c}, {c})" for c in COLUMNS if c not in _KEY)}
+"""
+
+# Rebuilds a catalog keyed without the API URL. Its rows keep an empty URL,
+# so no upload is skipped because of them.
+_MIGRATE_V0 = f"""
+BEGIN;
+ALTER TABLE files RENAME TO files_v0;
+DROP INDEX IF EXISTS files_name;
+DROP INDEX IF EXISTS files_hash;
+DROP INDEX IF EXISTS files_time;
+{_SCHEMA}
+INSERT INTO files ({", ".join(COLUMNS[1:])}) SELECT {", ".join(COLUMNS[1:])} FROM files_v0;
+DROP TABLE files_v0;
+COMMIT;
+"""
+
+
+def _migrate(db: sqlite3.Connection) -> None:
+    """Bring a catalog written by an older version to the current schema."""
+    columns = [row[1] for row in db.execute("PRAGMA table_info(files)")]
+    if columns and "api" not in columns:
+        _logger.info("Migrating the catalog to key files by API URL")
+        db.executescript(_MIGRATE_V0)
+
+
+def _sortable(timestamp: Optional[str]) -> Optional[str]:
+    """Return ``timestamp`` as ``YYYY-MM-DDThh:mm:ss.uuuZ``, which sorts as text.
+
+    The API form drops a zero fraction (``...:18Z`` vs ``...:18.500Z``), and
+    listings always carry one, so neither compares correctly as text.
+    Unparseable values are kept as they are.
+    """
+    if timestamp is None:
+        return None
+    time_o = utils._parse_time(str(timestamp))[0]
+    if time_o is None:
+        return str(timestamp)
+    return f"{time_o:%Y-%m-%dT%H:%M:%S}.{time_o.microsecond // 1000:03d}Z"
+
+
+def content_hash(path: str) -> str:
+    """Return the xxh128 hex digest of the contents of ``path``."""
+    h = xxhash.xxh128()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Catalog:
+    """
+    The SQLite catalog file, opened (and created if needed) on construction.
+
+    Attributes
+    ----------
+    path : str
+        Catalog database file
+
+    Methods
+    -------
+    record_upload(datasetid, local_path, name, digest, size, form, response, extra, api):
+        Records a file uploaded to a dataset
+    record_listing(datasetid, entries, extra, api):
+        Records the files of a dataset listing
+    forget(datasetid, api):
+        Forgets all files of a dataset
+    find_upload(datasetid, digest, api, extra):
+        Returns the upload response of a dataset's file with that content
+    query(datasetid, name, digest, start, stop, api, extra):
+        Returns the recorded files matching all given filters
+    close():
+        Closes the database
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Concurrent uploads record from their worker threads; the lock
+        # serialises the use of the one connection.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        _migrate(self._db)
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def _upsert(self, rows: list) -> None:
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock, self._db:
+            self._db.executemany(
+                _UPSERT,
+                [
+                    {c: row.get(c) for c in COLUMNS}
+                    | {
+                        "start": _sortable(row.get("start")),
+                        "stop": _sortable(row.get("stop")),
+                        "recorded": now,
+                    }
+                    for row in rows
+                ],
+            )
+
+    # parameters mirror the fields of one upload request and its response
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def record_upload(
+        self,
+        datasetid: int,
+        local_path: str,
+        name: str,
+        digest: str,
+        size: int,
+        form: dict,
+        response: dict,
+        extra: bool = False,
+        api: str = "",
+    ) -> None:
+        """
+        Records a file uploaded to a dataset
+
+        Parameters
+        ----------
+        datasetid : int
+            Dataset ID
+        local_path : str
+            Uploaded file
+        name : str
+            Name of the file in the dataset
+        digest : str
+            xxh128 hex digest of the contents (the Idempotency-Key)
+        size : int
+            Byte size of the file
+        form : dict
+            Upload form fields (``start``/``stop``/``count`` of data files)
+        response : dict
+            API response (``fileId``, ``path``, ``status``)
+        extra : bool
+            Whether it was uploaded as an extra file
+        api : str
+            API URL of the portal the dataset is on
+        """
+        self._upsert(
+            [
+                {
+                    "api": api,
+                    "dataset": datasetid,
+                    "name": name,
+                    "file_id": response.get("fileId"),
+                    "remote_path": response.get("path"),
+                    "local_path": os.path.abspath(local_path),
+                    "hash": digest,
+                    "size": size,
+                    "start": form.get("start"),
+                    "stop": form.get("stop"),
+                    "count": form.get("count"),
+                    "status": response.get("status"),
+                    "extra": int(extra),
+                }
+            ]
+        )
+
+    def record_listing(
+        self, datasetid: int, entries: list, extra: bool, api: str = ""
+    ) -> None:
+        """
+        Records the files of a complete dataset listing
+
+        The listing replaces what was known about the dataset's data (or,
+        with ``extra``, extra) files: files no longer listed are forgotten,
+        so their content is uploaded again.
+
+        Parameters
+        ----------
+        datasetid : int
+            Dataset ID
+        entries : list[dict]
+            File entries as returned by the API (``FileID``, ``MFileName``,
+            ``StartDate``, ``StopDate``, ``MetricEntries``, ``FileSize``)
+        extra : bool
+            Whether these are the extra files of the dataset
+        api : str
+            API URL of the portal the dataset is on
+        """
+        names = [entry["MFileName"] for entry in entries]
+        rows = [
+            {
+                "api": api,
+                "dataset": datasetid,
+                "name": entry["MFileName"],
+                "file_id": entry.get("FileID"),
+                "size": entry.get("FileSize"),
+                "start": entry.get("StartDate"),
+                "stop": entry.get("StopDate"),
+                "count": entry.get("MetricEntries"),
+                "extra": int(extra),
+            }
+            for entry in entries
+        ]
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM files WHERE api = ? AND dataset = ? AND extra = ? "
+                    "AND name NOT IN (SELECT value FROM json_each(?))",
+                    (api, datasetid, int(extra), json.dumps(names)),
+                )
+            self._upsert(rows)
+        _logger.debug("record_listing, dataset %d, %d files", datasetid, len(entries))
+
+    def forget(self, datasetid: int, api: str = "") -> None:
+        """Forget all files of dataset ``datasetid`` (e.g. once it is deleted)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM files WHERE api = ? AND dataset = ?", (api, datasetid)
+            )
+
+    def find_upload(
+        self, datasetid: int, digest: str, api: str = "", extra: bool = False
+    ) -> Optional[dict]:
+        """
+        Returns the upload response of the dataset's file with that content
+
+        ``{"fileId", "path", "status"}`` as recorded, or ``None`` when dataset
+        ``datasetid`` of the portal at ``api`` is not known to have a data
+        (or, with ``extra``, extra) file with content ``digest``.
+        """
+        rows = self.query(datasetid=datasetid, digest=digest, api=api, extra=extra)
+        if not rows:
+            return None
+        return {
+            "fileId": rows[0]["file_id"],
+            "path": rows[0]["remote_path"] or rows[0]["name"],
+            "status": rows[0]["status"],
+        }
+
+    # each parameter is an independent, optional filter
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def query(
+        self,
+        datasetid: Optional[int] = None,
+        name: Optional[str] = None,
+        digest: Optional[str] = None,
+        start: Optional[str] = None,
+        stop: Optional[str] = None,
+        api: Optional[str] = None,
+        extra: Optional[bool] = None,
+    ) -> list[dict]:
+        """
+        Returns the recorded files matching all given filters
+
+        Parameters
+        ----------
+        datasetid : int | None
+            Dataset ID
+        name : str | None
+            Substring of the file name
+        digest : str | None
+            xxh128 hex digest of the contents
+        start, stop : str | None
+            Only files whose time range overlaps ``[start, stop]`` (ISO-8601
+            or epoch timestamps)
+        api : str | None
+            API URL of the portal
+        extra : bool | None
+            Only extra files (``True``) or only data files (``False``)
+
+        Returns
+        -------
+        list[dict]
+            One dict per file (keys as :data:`COLUMNS`), by dataset and name.
+        """
+        where, args = [], []
+        for clause, value in (
+            ("dataset = ?", datasetid),
+            ("instr(name, ?) > 0", name),
+            ("hash = ?", digest),
+            ("stop >= ?", _sortable(start)),
+            ("start <= ?", _sortable(stop)),
+            ("api = ?", api),
+            ("extra = ?", None if extra is None else int(extra)),
+        ):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM files"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            cursor = self._db.execute(sql + " ORDER BY api, dataset, name, extra", args)
+            return [dict(row) for row in cursor]
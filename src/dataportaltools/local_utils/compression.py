@@ -0,0 +1,213 @@
+"""Compression of data files while they upload, without a compressed copy.
+
+Collectors often deliver plain ``.csv`` or ``.json`` files. Writing a
+``.zst`` copy before the upload doubles the disk space and I/O, so
+``--compress zstd`` compresses each file as a stream while it is sent
+instead.
+
+The upload announces the size of the file and its Idempotency-Key (the
+xxh128 of its bytes) before the body, and both must be those of the
+compressed bytes. :func:`size_and_key` therefore compresses the file once
+and keeps only its size and hash. :class:`MultipartBody` then compresses it
+again while the request body is read. zstd gives the same bytes for the
+same input and parameters, so the two passes agree; the body checks that
+they do.
+
+Only plain files are compressed: a metric or log name whose convention
+fields (see :func:`filenames.parse`) have a plain extension (``.csv``,
+``.json``, ...) and no compression part, or any other name ending in such an
+extension. Archives (``.zip``), compressed files and formats that compress
+internally (``.parquet``) are sent as they are.
+
+Compression is multi-threaded (one zstd worker per CPU). ``zstandard`` is
+imported lazily.
+"""
+
+import os
+import uuid
+from collections.abc import Iterator
+from typing import Optional
+
+import xxhash
+from urllib3.fields import RequestField
+
+from . import filenames
+
+# Compression methods and the suffix they add to a file name.
+METHODS = {"zstd": ".zst"}
+
+# zstd level of the uploads, zstd's own default.
+LEVEL = 3
+
+# Extensions of the plain text formats worth compressing.
+_PLAIN = frozenset({"csv", "tsv", "txt", "json", "jsonl", "ndjson", "log"})
+
+# Bytes of compressed output read at a time.
+_CHUNK = 1024 * 1024
+
+
+def needs_compression(name: str) -> bool:
+    """Whether ``name`` is a plain file, going by its name (see the module doc)."""
+    base = os.path.basename(name)
+    kind, fields = filenames.parse(base)
+    if kind == "metric":
+        ext, packed = fields["ext"], fields.get("compression")
+    elif kind == "log":
+        # A log name without a compression part parses its type as one.
+        ext, packed = fields["compression"], fields.get("type")
+    else:
+        ext, packed = os.path.splitext(base)[1][1:], None
+    return packed is None and ext.lower() in _PLAIN
+
+
+def compressed_name(name: str, method: str) -> str:
+    """``name`` with the suffix of ``method``, e.g. ``x.csv`` -> ``x.csv.zst``."""
+    return name + METHODS[method]
+
+
+def _chunks(path: str, method: str, level: int) -> Iterator[bytes]:
+    """The bytes of ``path`` compressed with ``method``, in chunks."""
+    if method not in METHODS:
+        raise ValueError(f"unknown compression '{method}'")
+    import zstandard  # pylint: disable=import-outside-toplevel
+
+    cctx = zstandard.ZstdCompressor(level=level, threads=-1)
+    with open(path, "rb") as fh:
+        reader = cctx.stream_reader(fh, size=os.fstat(fh.fileno()).st_size)
+        yield from iter(lambda: reader.read(_CHUNK), b"")
+
+
+def size_and_key(path: str, method: str, level: int = LEVEL) -> tuple[int, str]:
+    """
+    Byte size and xxh128 hex digest of ``path`` compressed with ``method``
+
+    The compressed bytes are hashed as they are produced, never stored.
+    """
+    h = xxhash.xxh128()
+    size = 0
+    for chunk in _chunks(path, method, level):
+        h.update(chunk)
+        size += len(chunk)
+    return size, h.hexdigest()
+
+
+def _part_header(boundary: str, name: str, filename: Optional[str] = None) -> bytes:
+    field = RequestField(name, b"", filename=filename)
+    field.make_multipart()
+    return f"--{boundary}\r\n{field.render_headers()}".encode()
+
+
+# The parts of the body plus the position of its reader.
+class MultipartBody:  # pylint: disable=too-many-instance-attributes
+    """
+    A multipart/form-data request body whose file is compressed as it is read
+
+    Sent with ``data=body`` and a ``Content-Type`` of :attr:`content_type`,
+    requests streams it with an exact ``Content-Length``.
+
+    Parameters
+    ----------
+    fields : dict
+        Form fields, sent before the file
+    name : str
+        Form field of the file
+    filename : str
+        File name of the file part
+    path : str
+        File to compress
+    method : str
+        Compression method (a key of :data:`METHODS`)
+    size : int
+        Compressed size of the file, from :func:`size_and_key`
+    level : int
+        Compression level
+    expected_key : str | None
+        xxh128 hex digest of the compressed file, from :func:`size_and_key`
+        (the Idempotency-Key); checked when given
+    """
+
+    # parameters are the form fields and the file part
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        fields: dict,
+        name: str,
+        filename: str,
+        path: str,
+        method: str,
+        size: int,
+        level: int = LEVEL,
+        expected_key: Optional[str] = None,
+    ):
+        self.boundary = uuid.uuid4().hex
+        head = [
+            _part_header(self.boundary, key) + str(value).encode() + b"\r\n"
+            for key, value in fields.items()
+        ]
+        head.append(_part_header(self.boundary, name, filename))
+        self._head = b"".join(head)
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._file = (path, method, level)
+        self._size = size
+        self._expected_key = expected_key
+        self.seek(0)
+
+    @property
+    def content_type(self) -> str:
+        """The Content-Type header of the body."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self._size + len(self._tail)
+
+    def _pieces(self) -> Iterator[bytes]:
+        yield self._head
+        h = xxhash.xxh128()
+        compressed = 0
+        for chunk in _chunks(*self._file):
+            h.update(chunk)
+            compressed += len(chunk)
+            yield chunk
+        # The file changed since size_and_key, or zstd gave other bytes: the
+        # request must fail rather than store them under the announced key.
+        if compressed != self._size:
+            raise ValueError(
+                f"{self._file[0]} compressed to {compressed} bytes, "
+                f"not the {self._size} announced"
+            )
+        if self._expected_key is not None and h.hexdigest() != self._expected_key:
+            raise ValueError(
+                f"{self._file[0]} compressed to bytes other than those of its "
+                f"Idempotency-Key {self._expected_key}"
+            )
+        yield self._tail
+
+    def read(self, size: int = -1) -> bytes:
+        """Up to ``size`` bytes of the body (all that is left when negative)."""
+        out = []
+        wanted = size if size >= 0 else len(self)
+        while wanted > 0:
+            if self._offset == len(self._buffer):
+                self._buffer, self._offset = next(self._iter, b""), 0
+                if not self._buffer:
+                    break
+            out.append(self._buffer[self._offset : self._offset + wanted])
+            self._offset += len(out[-1])
+            wanted -= len(out[-1])
+        data = b"".join(out)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Rewind to the start of the body (the only position supported)."""
+        if offset != 0 or whence != os.SEEK_SET:
+            raise OSError("a compressed body can only be rewound to its start")
+        self._iter = self._pieces()
+        self._buffer = b""
+        self._offset = 0
+        self._position = 0
+        return 0
+
+    def tell(self) -> int:
+        """Bytes of the body read so far."""
+        return self._position
@@ -0,0 +1,191 @@
+"""Adaptive limit on the portal requests in flight (AIMD).
+
+A fixed number of concurrent uploads is too timid on a quiet portal and
+overloads it during peak ingest. :class:`AdaptiveLimit` adapts the number
+of requests in flight the way TCP adapts its window:
+
+* it starts at the maximum, so the workers asked for run at once, and
+  only backs off when the portal shows congestion. Started lower
+  (``initial``), it doubles after every window of completed requests (slow
+  start) until the first sign of congestion; after one, or without slow
+  start, it grows by one per window (additive increase). The upload client
+  starts it at the workers asked for and lets it grow up to a ceiling
+  (:data:`CEILING_FACTOR` times the workers by default);
+* a 429 or 503 answer, a window whose p95 latency is more than
+  ``latency_factor`` times the lowest p95 seen, or a window whose
+  throughput dropped after the limit grew, multiply it by ``decrease``
+  (multiplicative decrease). Requests sent before a decrease do not
+  decrease it again.
+
+A window is as many completed requests as the limit (at least
+:data:`MIN_WINDOW`). Request latencies are taken per MiB of request body,
+so uploads of different sizes compare.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+_logger = logging.getLogger("toolslib.concurrency")
+
+# Answers asking the client to slow down.
+BACKOFF_STATUSES = frozenset({429, 503})
+
+# Fewest completed requests evaluated at once.
+MIN_WINDOW = 3
+
+# Default ceiling of the limit, in multiples of the workers asked for.
+CEILING_FACTOR = 4
+
+_MIB = 1024 * 1024
+
+
+def _p95(values: list) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+
+# State of the limit plus the window being measured.
+class AdaptiveLimit:  # pylint: disable=too-many-instance-attributes
+    """
+    The number of requests allowed in flight, adapted to the answers
+
+    Parameters
+    ----------
+    maximum : int
+        Highest limit (the number of workers)
+    initial : int | None
+        Limit to start at (default ``maximum``)
+    decrease : float
+        Factor the limit is multiplied by on congestion
+    latency_factor : float
+        A window p95 above this times the lowest p95 seen is congestion
+    throughput_drop : float
+        A window throughput this fraction below the previous one, after the
+        limit grew, is congestion
+    slow_start : bool
+        Double the limit after every window until the first congestion;
+        else it grows by one per window from the start
+
+    Attributes
+    ----------
+    limit : float
+        The current limit; :attr:`concurrency` requests may be in flight
+    in_flight : int
+        Requests in flight
+    """
+
+    # parameters are the limits and the tuning of the AIMD steps
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        maximum: int,
+        initial: Optional[int] = None,
+        decrease: float = 0.5,
+        latency_factor: float = 2.0,
+        throughput_drop: float = 0.2,
+        slow_start: bool = True,
+    ):
+        self.maximum = max(1, maximum)
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.throughput_drop = throughput_drop
+        start = self.maximum if initial is None else initial
+        self.limit = float(min(self.maximum, max(1, start)))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._epoch = 0
+        self._slow_start = slow_start
+        self._best_p95 = None
+        self._rate = None
+        self._grew = False
+        self._start_window()
+
+    @property
+    def concurrency(self) -> int:
+        """Requests allowed in flight now."""
+        return max(1, int(self.limit))
+
+    def _start_window(self) -> None:
+        self._latencies = []
+        self._bytes = 0
+        self._window_start = time.monotonic()
+
+    def acquire(self) -> int:
+        """Wait for a free slot and take it; returns the ticket to release."""
+        with self._cond:
+            while self.in_flight >= self.concurrency:
+                self._cond.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    def release(
+        self, ticket: int, status: Optional[int], seconds: float, size: int = 0
+    ) -> None:
+        """
+        Free the slot of a completed request and adapt the limit
+
+        Parameters
+        ----------
+        ticket : int
+            What :meth:`acquire` returned
+        status : int | None
+            Response status, ``None`` when there was no response
+        seconds : float
+            Time from sending the request to its response
+        size : int
+            Bytes of the request body
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+            if status in BACKOFF_STATUSES:
+                if ticket == self._epoch:
+                    self._congested(f"HTTP {status}")
+                return
+            if not isinstance(status, int) or status >= 500:
+                return
+            self._latencies.append(seconds / max(1.0, size / _MIB))
+            self._bytes += size
+            if len(self._latencies) >= max(MIN_WINDOW, self.concurrency):
+                self._end_window()
+
+    def _end_window(self) -> None:
+        elapsed = max(time.monotonic() - self._window_start, 1e-9)
+        p95 = _p95(self._latencies)
+        # Bytes per second of uploads, else requests per second.
+        unit = "bytes" if self._bytes else "requests"
+        rate = (unit, (self._bytes or len(self._latencies)) / elapsed)
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        if p95 > self.latency_factor * self._best_p95:
+            self._congested(f"p95 {p95:.3f}s")
+            return
+        previous, self._rate = self._rate, rate
+        if (
+            self._grew
+            and previous is not None
+            and previous[0] == unit
+            and rate[1] < previous[1] * (1 - self.throughput_drop)
+        ):
+            self._congested("throughput dropped")
+            return
+        old = self.limit
+        grown = self.limit * 2 if self._slow_start else self.limit + 1
+        self.limit = min(float(self.maximum), grown)
+        self._grew = self.limit > old
+        if self.concurrency != int(old):
+            _logger.info("concurrency %d -> %d", int(old), self.concurrency)
+            self._cond.notify_all()
+        self._start_window()
+
+    def _congested(self, reason: str) -> None:
+        old = self.concurrency
+        self.limit = max(1.0, self.limit * self.decrease)
+        self._slow_start = False
+        self._epoch += 1
+        self._rate = None
+        self._grew = False
+        _logger.info("concurrency %d -> %d, %s", old, self.concurrency, reason)
+        self._start_window()
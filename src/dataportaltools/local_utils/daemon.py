@@ -0,0 +1,362 @@
+"""Resident client daemon serving batch operations over a Unix socket.
+
+Even with ``--batch``, every cron job or shell loop pays for interpreter
+startup, the token read, a new HTTP session and the ``/test`` probe.
+``--daemon`` connects once and serves the operations of :mod:`batch` on a
+Unix socket: a client sends JSON operation lines and receives one JSON
+result line per operation, exactly as ``--batch`` prints them. The
+session's HTTP connections stay open between requests, and dataset listings
+are cached (see :class:`CachedConnection`).
+
+The client side (:func:`forward`, :func:`call`) only needs the standard
+library, so a CLI that forwards its operation never imports the HTTP client.
+The socket is created user-only, since whoever can connect acts with the
+daemon's token.
+
+The daemon runs every operation with its own settings (API URL, token,
+catalog, workers, compression, retries, small-file lanes, health TTL and
+lazy connection). A client may open with a settings line,
+``{"settings": {...}}``, holding those it was given; the daemon refuses the
+connection when one of them differs from its own, rather than run the
+operations against another portal or without the requested options.
+"""
+
+import io
+import itertools
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional, TextIO
+
+_logger = logging.getLogger("toolslib.daemon")
+
+# Seconds a cached listing is served before it is fetched again. Changes made
+# through the daemon drop the affected listings right away; this bounds how
+# long changes made elsewhere (the web portal, other clients) go unseen.
+LISTING_TTL = 60.0
+
+# Operation fields holding local paths (see local_utils.batch).
+_PATH_FIELDS = ("info", "src")
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot be started or answered nothing."""
+
+
+class CachedConnection:
+    """
+    A connected WCIBConnection whose dataset listings are cached
+
+    Listings are served from the cache for ``ttl`` seconds. Creating or
+    deleting a dataset drops the dataset listing, and uploading to,
+    annotating or deleting a dataset drops its file listings. Dryruns are
+    neither cached nor served from the cache. Everything else is passed
+    through to the wrapped connection.
+    """
+
+    def __init__(self, wc: object, ttl: float = LISTING_TTL):
+        self._wc = wc
+        self._ttl = ttl
+        self._cache = {}
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._wc, name)
+
+    def _cached(self, key: tuple, dryrun: bool, fetch: Callable[[], object]) -> object:
+        if dryrun:
+            return fetch()
+        hit = self._cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < self._ttl:
+            _logger.debug("listing %s from the cache", key)
+            return hit[1]
+        value = fetch()
+        # A failed listing (None) is not cached.
+        if value is not None:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def _forget(self, datasetid: Optional[int] = None) -> None:
+        if datasetid is None:
+            self._cache.pop(("datasets",), None)
+        else:
+            self._cache.pop(("files", datasetid, False), None)
+            self._cache.pop(("files", datasetid, True), None)
+
+    def datasets(self, dryrun: bool) -> Optional[list]:
+        """Cached :meth:`WCIBConnection.datasets`."""
+        return self._cached(("datasets",), dryrun, lambda: self._wc.datasets(dryrun))
+
+    # Caches the listing WCIBConnection.list_files is built on.
+    # pylint: disable=protected-access
+    def _list_files(
+        self, datasetid: int, extrafiles: bool, dryrun: bool, limit: int = 0
+    ) -> Optional[list]:
+        def fetch() -> Optional[list]:
+            return self._wc._list_files(datasetid, extrafiles, dryrun, limit)
+
+        if limit:
+            return fetch()
+        return self._cached(("files", datasetid, extrafiles), dryrun, fetch)
+
+    # pylint: enable=protected-access
+
+    def new_dataset(self, *args: object, **kwargs: object) -> dict:
+        """:meth:`WCIBConnection.new_dataset`, dropping the dataset listing."""
+        self._forget()
+        return self._wc.new_dataset(*args, **kwargs)
+
+    def upload_files(
+        self, datasetid: int, *args: object, **kwargs: object
+    ) -> tuple[int, dict]:
+        """:meth:`WCIBConnection.upload_files`, dropping the file listings."""
+        self._forget(datasetid)
+        return self._wc.upload_files(datasetid, *args, **kwargs)
+
+    def set_file_metadata(
+        self, datasetid: int, *args: object, **kwargs: object
+    ) -> dict:
+        """:meth:`WCIBConnection.set_file_metadata`, dropping the file listings."""
+        self._forget(datasetid)
+        return self._wc.set_file_metadata(datasetid, *args, **kwargs)
+
+    def delete(self, datasetid: int, *args: object, **kwargs: object) -> int:
+        """:meth:`WCIBConnection.delete`, dropping the dataset's listings."""
+        self._forget()
+        self._forget(datasetid)
+        return self._wc.delete(datasetid, *args, **kwargs)
+
+
+def _client_settings(line: str) -> Optional[dict]:
+    """The settings of a client's settings line, ``None`` for other lines."""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(record, dict) and list(record) == ["settings"]:
+        return record["settings"]
+    return None
+
+
+def mismatches(ours: dict, theirs: dict) -> list[str]:
+    """
+    The settings of a client (``theirs``) that differ from the daemon's
+
+    Settings the daemon does not know are not compared.
+    """
+    return [
+        f"--{key} {value} (the daemon runs with {ours[key]})"
+        for key, value in theirs.items()
+        if key in ours and ours[key] != value
+    ]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Runs the operation lines of one client connection as a batch."""
+
+    def handle(self) -> None:
+        # The HTTP client is loaded by the daemon only, never by clients.
+        from . import batch  # pylint: disable=import-outside-toplevel
+
+        lines = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        out = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+        first = lines.readline()
+        settings = _client_settings(first)
+        differ = mismatches(self.server.settings, settings or {})
+        if differ:
+            error = "the daemon cannot run with " + "; ".join(differ)
+            _logger.warning("refused a client, %s", error)
+            record = {"op": None, "ok": False, "result": None, "error": error}
+            out.write(json.dumps(record) + "\n")
+        else:
+            if settings is None:
+                lines = itertools.chain([first], lines)
+            batch.run(self.server.connection, lines, out, self.server.dryrun)
+        out.detach()
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    The daemon's socket server; handles one client connection at a time
+
+    Requests are served one after the other, so the shared session is never
+    used concurrently. ``path`` is claimed on construction (see
+    :func:`claim`) and removed by :meth:`server_close`. Clients whose
+    settings differ from ``settings`` are refused (see :func:`mismatches`).
+    """
+
+    # parameters are the socket, the connection and how it is served
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        path: str,
+        wc: object,
+        dryrun: bool = False,
+        ttl: float = LISTING_TTL,
+        settings: Optional[dict] = None,
+    ):
+        claim(path)
+        self.connection = CachedConnection(wc, ttl)
+        self.dryrun = dryrun
+        self.settings = settings or {}
+        # Only the user may connect: requests run with the daemon's token.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def listening(path: str) -> bool:
+    """Whether a daemon listens on ``path``."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+def claim(path: str) -> None:
+    """
+    Make ``path`` free for a new daemon socket
+
+    A stale socket left by a daemon that was killed is removed.
+
+    Raises
+    ------
+    DaemonError
+        If a daemon is already listening on ``path`` or it is not a socket.
+    """
+    if not os.path.lexists(path):
+        return
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise DaemonError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            _logger.info("removing stale socket %s", path)
+            os.unlink(path)
+            return
+    raise DaemonError(f"a daemon is already running on {path}")
+
+
+def serve(
+    wc: object, path: str, dryrun: bool = False, settings: Optional[dict] = None
+) -> None:
+    """Serve operations over the connected ``wc`` on ``path`` until interrupted."""
+    with Server(path, wc, dryrun, settings=settings) as server:
+        _logger.info("serving on %s", path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            _logger.info("stopped")
+
+
+def absolute_paths(lines: Iterable[str]) -> Iterator[str]:
+    """
+    The batch ``lines`` with the local paths of each operation made absolute
+
+    The daemon resolves paths from its own working directory. Lines that
+    are not operations are passed on as they are, so the line numbers of the
+    results still match.
+    """
+    for line in lines:
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError:
+            yield line
+            continue
+        if not isinstance(op, dict) or not any(f in op for f in _PATH_FIELDS):
+            yield line
+            continue
+        for field in _PATH_FIELDS:
+            value = op.get(field)
+            if isinstance(value, str):
+                op[field] = os.path.abspath(value)
+            elif isinstance(value, list):
+                op[field] = [
+                    os.path.abspath(v) if isinstance(v, str) else v for v in value
+                ]
+        yield json.dumps(op)
+
+
+def forward(
+    path: str, lines: Iterable[str], out: TextIO, settings: Optional[dict] = None
+) -> Optional[int]:
+    """
+    Runs the batch ``lines`` on the daemon listening on ``path``
+
+    The daemon's result lines are written to ``out`` as they arrive. The
+    ``settings`` the client was given are sent first; the daemon refuses to
+    run anything when they differ from its own.
+
+    Returns
+    -------
+    int | None
+        0 when every operation succeeded, else 1; ``None`` (with nothing
+        read from ``lines``) when no daemon is listening on ``path``.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+
+    def send() -> None:
+        # Sent from a thread: a long script must not block on results
+        # waiting to be read.
+        try:
+            with sock.makefile("w", encoding="utf-8") as wfile:
+                if settings:
+                    wfile.write(json.dumps({"settings": settings}) + "\n")
+                for line in lines:
+                    wfile.write(line if line.endswith("\n") else f"{line}\n")
+            sock.shutdown(socket.SHUT_WR)
+        except OSError as e:
+            _logger.error("sending to the daemon failed, %s", e)
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    ret = 0
+    with sock, sock.makefile("r", encoding="utf-8") as rfile:
+        for line in rfile:
+            out.write(line)
+            out.flush()
+            if not json.loads(line).get("ok"):
+                ret = 1
+    sender.join()
+    return ret
+
+
+def call(path: str, op: dict, settings: Optional[dict] = None) -> Optional[dict]:
+    """
+    Runs the single operation ``op`` on the daemon listening on ``path``
+
+    Returns its result record (see :func:`batch.run_operation`), or ``None``
+    when no daemon is listening on ``path``. ``settings`` are as for
+    :func:`forward`.
+
+    Raises
+    ------
+    DaemonError
+        If the daemon answered nothing.
+    """
+    out = io.StringIO()
+    if forward(path, [json.dumps(op)], out, settings) is None:
+        return None
+    lines = out.getvalue().splitlines()
+    if not lines:
+        raise DaemonError("no response from the daemon")
+    return json.loads(lines[0])
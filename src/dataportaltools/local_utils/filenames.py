@@ -0,0 +1,248 @@
+"""Linear-time parsing of naming-convention file names.
+
+:func:`utils.parse_filename` used to run up to four unanchored ``re.search``
+calls per name. An unanchored ``([^_]+)_`` retried from every start position
+backtracks quadratically on long names without enough underscores, and
+listings parse every name of a dataset. :func:`parse` gives exactly the same
+results from one split of the name into ``_``-separated tokens and a single
+left-to-right scan for the first window of tokens that fits, so its cost is
+linear in the name length. Names of the usual shape are recognised up front
+by one anchored match. :func:`parse_many` is the bulk, columnar form, and
+:func:`parse_time` reads start/stop timestamps of the convention's shape.
+
+The old regular expressions define the behaviour being reproduced:
+
+* metric: ``([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)`` -- the first
+  six consecutive non-empty tokens; the sixth is then split on ``.`` into
+  ``flag.ext[.compression]``, again taking the first non-empty parts;
+* log: ``([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^.]+)\\.(.*)`` -- the first
+  five consecutive non-empty tokens followed by a ``.``-free, non-empty
+  ``flag`` (which may contain ``_``) and the rest up to a newline.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+# Timestamp shape searched for in the start/stop fields; the optional
+# fraction and ``Z`` of the convention never change whether it is found.
+_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}")
+
+# The canonical shape: exactly six non-empty tokens, the last one being
+# ``a.b`` or ``a.b.c``. Anchored and without overlapping classes, so it never
+# backtracks; names of this shape skip the general scan.
+_CANONICAL = re.compile(
+    r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_.\n]+)\.([^_.\n]+)(?:\.([^_.\n]+))?"
+)
+
+# The ``YYYY-MM-DDThh:mm:ss[.uuu][Z]`` start/stop shape of convention names.
+# Years below 1000 are left to the generic parse in utils, whose strftime does
+# not zero-pad them.
+TIME_SHAPE = re.compile(
+    r"([1-9][0-9]{3})-([0-9]{2})-([0-9]{2})T([0-9]{2}):([0-9]{2}):([0-9]{2})"
+    r"(\.[0-9]{3})?(Z)?"
+)
+
+# Columns returned by parse_many, in order.
+COLUMNS = (
+    "kind",
+    "name",
+    "type",
+    "start",
+    "stop",
+    "count",
+    "size",
+    "flag",
+    "ext",
+    "compression",
+    "prefix",
+)
+
+
+def has_date(s: str) -> bool:
+    """Whether ``s`` contains a ``YYYY-MM-DDThh:mm:ss`` timestamp."""
+    return _DATE.search(s) is not None
+
+
+def parse_time(s: str) -> Optional[tuple[datetime, str]]:
+    """Parse a :data:`TIME_SHAPE` timestamp without a generic parser.
+
+    Returns the same ``(datetime, normalized)`` pair as
+    :func:`utils.normalize_timestamp`'s generic parse (naive, or UTC with
+    ``Z``), or ``None`` when ``s`` has another shape or is not a valid time.
+    """
+    m = TIME_SHAPE.fullmatch(s)
+    if m is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zulu = m.groups()
+    try:
+        time_o = datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            int(fraction[1:]) * 1000 if fraction else 0,
+            timezone.utc if zulu else None,
+        )
+    except ValueError:
+        return None
+    if fraction == ".000":
+        fraction = None
+    return time_o, f"{s[:19]}{fraction or ''}Z"
+
+
+def _first_window(tokens: list, width: int, start: int = 0) -> int:
+    """Index of the first ``width`` consecutive non-empty tokens, or -1."""
+    run = 0
+    for idx in range(start, len(tokens)):
+        run = run + 1 if tokens[idx] else 0
+        if run == width:
+            return idx - width + 1
+    return -1
+
+
+def _metric(fname: str) -> Optional[dict]:
+    """Metric fields of ``fname``, or ``None`` to fall through to logs."""
+    tokens = fname.split("_")
+    i = _first_window(tokens, 6)
+    if i < 0 or not (has_date(tokens[i + 2]) and has_date(tokens[i + 3])):
+        return None
+
+    fields = {
+        "name": tokens[i],
+        "type": tokens[i + 1],
+        "start": tokens[i + 2],
+        "stop": tokens[i + 3],
+        "count": tokens[i + 4],
+    }
+    parts = tokens[i + 5].split(".")
+    j = _first_window(parts, 3)
+    if j >= 0:
+        fields.update(flag=parts[j], ext=parts[j + 1], compression=parts[j + 2])
+    else:
+        j = _first_window(parts, 2)
+        if j < 0:
+            return None
+        fields.update(flag=parts[j], ext=parts[j + 1])
+    fields["prefix"] = tokens[i + 2][0:4]
+    return fields
+
+
+def _log(fname: str) -> Optional[dict]:
+    """Log fields of ``fname``, or ``None`` when it is not a log name."""
+    tokens = fname.split("_")
+    # Offset of every token, to find the flag/tail text after a window.
+    offsets = [0] * len(tokens)
+    for idx in range(1, len(tokens)):
+        offsets[idx] = offsets[idx - 1] + len(tokens[idx - 1]) + 1
+
+    i = _first_window(tokens, 5)
+    dot = -1
+    while 0 <= i and i + 5 < len(tokens):
+        rest = offsets[i + 5]
+        if dot < rest:
+            dot = fname.find(".", rest)
+        if dot > rest:
+            break
+        if dot < 0:
+            return None
+        i = _first_window(tokens, 5, i + 1)
+    else:
+        return None
+
+    if not (has_date(tokens[i + 1]) and has_date(tokens[i + 2])):
+        return None
+
+    tail = fname[dot + 1 :].split("\n", 1)[0]
+    fields = {
+        "name": tokens[i],
+        "start": tokens[i + 1],
+        "stop": tokens[i + 2],
+        "count": tokens[i + 3],
+        "size": tokens[i + 4],
+        "flag": fname[offsets[i + 5] : dot],
+    }
+    parts = tail.split(".")
+    j = _first_window(parts, 2)
+    if j >= 0:
+        fields.update(type=parts[j], compression=parts[j + 1])
+    else:
+        fields["compression"] = tail
+    # Kept as it always was: a log's prefix is taken from ``stop``.
+    fields["prefix"] = tokens[i + 2][0:4]
+    return fields
+
+
+def _canonical(m: re.Match) -> tuple[str, dict]:
+    """Parse a name matching :data:`_CANONICAL` (same results as the scan)."""
+    g = m.groups()
+    if has_date(g[2]) and has_date(g[3]):
+        fields = {
+            "name": g[0],
+            "type": g[1],
+            "start": g[2],
+            "stop": g[3],
+            "count": g[4],
+            "flag": g[5],
+            "ext": g[6],
+        }
+        if g[7] is not None:
+            fields["compression"] = g[7]
+        fields["prefix"] = g[2][0:4]
+        return "metric", fields
+    if has_date(g[1]) and has_date(g[2]):
+        fields = {
+            "name": g[0],
+            "start": g[1],
+            "stop": g[2],
+            "count": g[3],
+            "size": g[4],
+            "flag": g[5],
+        }
+        if g[7] is not None:
+            fields.update(type=g[6], compression=g[7])
+        else:
+            fields["compression"] = g[6]
+        fields["prefix"] = g[2][0:4]
+        return "log", fields
+    return "extra", {}
+
+
+def parse(fname: str) -> tuple[str, dict]:
+    """Parse ``fname`` exactly like :func:`utils.parse_filename`.
+
+    Returns ``("metric" | "log", fields)`` or ``("extra", {})``.
+    """
+    m = _CANONICAL.fullmatch(fname)
+    if m is not None:
+        return _canonical(m)
+    fields = _metric(fname)
+    if fields is not None:
+        return "metric", fields
+    fields = _log(fname)
+    if fields is not None:
+        return "log", fields
+    return "extra", {}
+
+
+def parse_many(names: Iterable[str]) -> dict:
+    """Parse many names into columns.
+
+    Returns
+    -------
+    dict[str, list]
+        One list per entry of :data:`COLUMNS`, aligned with ``names``;
+        ``kind`` is ``"metric"``/``"log"``/``"extra"`` and fields a name
+        does not have are ``None``.
+    """
+    columns = {key: [] for key in COLUMNS}
+    fields_columns = [(key, columns[key]) for key in COLUMNS[1:]]
+    kinds = columns["kind"]
+    for fname in names:
+        kind, fields = parse(fname)
+        kinds.append(kind)
+        for key, column in fields_columns:
+            column.append(fields.get(key))
+    return columns
@@ -0,0 +1,304 @@
+"""Name time-ordered data files from their first and last rows only.
+
+Most CSV exports are written in time order, so ``start``/``stop`` are simply
+the first and last timestamps and parsing every row (as
+:func:`utils.rename_from_data` does) is wasted work. :func:`summarize` reads
+a head sample and the tail of the file instead: uncompressed CSV is read
+backwards from the end with a seek, compressed CSV is streamed once without
+parsing, and the row count comes from a count of the non-blank lines. Parquet needs no data
+pass at all: the count is in the footer metadata and, for timestamp or epoch
+columns, the row-group statistics give the exact min/max.
+
+Sortedness is either trusted (``--sorted``) or checked on a sample of head,
+interior and tail rows (``--check-sorted``); when the check fails, or the
+shortcut does not apply, naming falls back to the full scan.
+"""
+
+import io
+import logging
+import os
+from typing import Optional
+
+from . import logscan, timestamps, utils
+
+# Reuses utils' package-internal _format_stem and logscan's blank-line
+# pattern rather than duplicating them.
+# pylint: disable=protected-access
+
+_logger = logging.getLogger("toolslib.headtail")
+
+# Rows parsed from the start of the file for detection and the sorted check.
+_HEAD_ROWS = 1024
+# Bytes read from the end of an uncompressed CSV (and its start, for quotes).
+_BLOCK_BYTES = 64 * 1024
+# Interior rows (or parquet row groups) sampled by the sorted check.
+_PROBES = 16
+_COUNT_CHUNK = 4 * 1024 * 1024
+
+
+def _count_lines(path: str) -> int:
+    """Count the non-blank lines of an uncompressed file without parsing it.
+
+    Blank lines are not rows, as in :func:`logscan.scan_lines`.
+    """
+    count = 0
+    carry = b""
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_COUNT_CHUNK), b""):
+            data = carry + chunk
+            end = data.rfind(b"\n")
+            if end < 0:
+                carry = data
+                continue
+            complete, carry = data[:end], data[end + 1 :]
+            blank = sum(1 for _ in logscan._BLANK_LINE.finditer(complete))
+            count += complete.count(b"\n") + 1 - blank
+    return count + (1 if carry.strip(logscan._SPACE) else 0)
+
+
+def _parse_lines(header: bytes, lines: list, col: str, fmt: Optional[str]) -> object:
+    """Parse the timestamps of raw CSV ``lines`` read apart from the file."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if not lines:
+        return pd.Series([], dtype="datetime64[ns, UTC]")
+    frame = pd.read_csv(io.BytesIO(header + b"\n" + b"\n".join(lines)))
+    return timestamps.parse(frame[col], fmt)
+
+
+def _read_tail(path: str, check: bool) -> tuple[list, list]:
+    """Seek to the end of an uncompressed CSV and read its last rows.
+
+    Returns ``(tail_lines, probe_lines)``; probes are one row from each of
+    ``_PROBES`` evenly spaced offsets, read when ``check``.
+    """
+    size = os.path.getsize(path)
+    probes = []
+    with open(path, "rb") as fh:
+        offset = max(0, size - _BLOCK_BYTES)
+        fh.seek(offset)
+        block = fh.read()
+        if check:
+            for k in range(1, _PROBES + 1):
+                fh.seek(size * k // (_PROBES + 1))
+                fh.readline()  # skip the partial row at the offset
+                line = fh.readline().rstrip(b"\r\n")
+                if line:
+                    probes.append(line)
+
+    # The first piece is the header (block at offset 0) or a partial row.
+    return block.rstrip(b"\r\n").split(b"\n")[1:], probes
+
+
+def _tail_and_count(path: str, check: bool) -> tuple[list, list, int]:
+    """Return ``(tail_lines, probe_lines, row_count)`` of a CSV file.
+
+    Uncompressed files are read from the end and their lines counted;
+    compressed ones are streamed once, keeping only the last line. Blank
+    lines are not counted either way, and the header is not a row.
+    """
+    if utils._format_stem(path) == path.lower():
+        tail_lines, probe_lines = _read_tail(path, check)
+        return tail_lines, probe_lines, _count_lines(path) - 1
+
+    lines, _, _, last_line = logscan.scan_lines(path)
+    if not last_line.strip():
+        return [], [], 0
+    return [last_line], [], lines - 1
+
+
+def _csv_summary(
+    path: str,
+    timestamp_col: Optional[str],
+    timestamp_format: Optional[str],
+    check: bool,
+) -> Optional[dict]:
+    """Head/tail summary of a CSV file, or ``None`` if it cannot be used."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    with logscan.open_decompressed(path) as stream:
+        head_bytes = stream.read(_BLOCK_BYTES)
+    if b'"' in head_bytes:
+        # Quoted fields may hold newlines, which breaks the newline count.
+        _logger.info("headtail, quoted CSV fields in %s, full scan", path)
+        return None
+    header = head_bytes.split(b"\n", 1)[0].rstrip(b"\r")
+
+    head = pd.read_csv(path, nrows=_HEAD_ROWS)
+    if head.empty:
+        return None
+    col, fmt = timestamps.detect(head, timestamp_col, timestamp_format=timestamp_format)
+
+    tail_lines, probe_lines, count = _tail_and_count(path, check)
+    if not tail_lines:
+        return None
+    return _ordered_summary(
+        timestamps.parse(head[col], fmt),
+        _parse_lines(header, probe_lines, col, fmt),
+        _parse_lines(header, tail_lines, col, fmt),
+        count,
+        check,
+    )
+
+
+def _ordered_summary(
+    head: object, probes: object, tail: object, count: int, check: bool
+) -> Optional[dict]:
+    """Summary from the head and tail of sorted rows; verified when ``check``."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if head.empty or tail.empty or pd.isna(head.iloc[0]) or pd.isna(tail.iloc[-1]):
+        return None
+    if check:
+        # Segments may overlap in small files, so each must be in order and
+        # the probes must lie between the first and the last timestamp.
+        in_order = (
+            all(
+                s.notna().all() and s.is_monotonic_increasing
+                for s in (head, probes, tail)
+            )
+            and head.iloc[0] <= tail.iloc[-1]
+            and (probes.empty or head.iloc[0] <= probes.min())
+            and (probes.empty or probes.max() <= tail.iloc[-1])
+        )
+        if not in_order:
+            _logger.info("headtail, timestamps not sorted, full scan")
+            return None
+    return {"count": count, "start": head.iloc[0], "stop": tail.iloc[-1]}
+
+
+def _parquet_summary(
+    path: str,
+    timestamp_col: Optional[str],
+    timestamp_format: Optional[str],
+    check: bool,
+) -> Optional[dict]:
+    """Metadata (and, if needed, head/tail) summary of a parquet file."""
+    # pylint: disable=too-many-locals
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    if meta.num_rows == 0:
+        return None
+    head = next(pf.iter_batches(batch_size=_HEAD_ROWS)).to_pandas()
+    col, fmt = timestamps.detect(head, timestamp_col, timestamp_format=timestamp_format)
+
+    # Timestamp and integer epoch statistics order like time: exact min/max.
+    col_type = pf.schema_arrow.field(col).type
+    if pa.types.is_timestamp(col_type) or (
+        pa.types.is_integer(col_type) and fmt in timestamps.EPOCH_UNITS
+    ):
+        leaf = [
+            meta.row_group(0).column(j).path_in_schema for j in range(meta.num_columns)
+        ]
+        stats = [
+            meta.row_group(i).column(leaf.index(col)).statistics
+            for i in range(meta.num_row_groups)
+        ]
+        if all(s is not None and s.has_min_max for s in stats):
+            bounds = timestamps.parse(
+                pd.Series([min(s.min for s in stats), max(s.max for s in stats)]), fmt
+            )
+            return {
+                "count": meta.num_rows,
+                "start": bounds.iloc[0],
+                "stop": bounds.iloc[1],
+            }
+
+    groups = meta.num_row_groups
+
+    def _column(i: int) -> object:
+        values = pf.read_row_group(i, columns=[col]).column(0).to_pandas()
+        return timestamps.parse(values, fmt)
+
+    probes = []
+    if check:
+        step = max(1, groups // _PROBES)
+        probes = [_column(i).iloc[:1] for i in range(0, groups, step)]
+    return _ordered_summary(
+        timestamps.parse(head[col], fmt),
+        pd.concat(probes) if probes else pd.Series([], dtype="datetime64[ns, UTC]"),
+        _column(groups - 1),
+        meta.num_rows,
+        check,
+    )
+
+
+def summarize(
+    path: str,
+    timestamp_col: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
+    check: bool = True,
+) -> Optional[dict]:
+    """Derive ``count``/``start``/``stop`` without parsing every row.
+
+    Applies to CSV (optionally compressed) and parquet files. With ``check``
+    the rows must pass a sampled monotonic check, otherwise they are trusted
+    to be in time order.
+
+    Returns
+    -------
+    dict | None
+        ``{"count": int, "start": Timestamp, "stop": Timestamp}``, or
+        ``None`` when the shortcut does not apply (other format, quoted CSV,
+        unsorted sample, missing first/last timestamp) and a full scan is
+        needed.
+    """
+    stem = utils._format_stem(path)
+    if stem.endswith(".parquet"):
+        return _parquet_summary(path, timestamp_col, timestamp_format, check)
+    if stem.endswith(".csv"):
+        return _csv_summary(path, timestamp_col, timestamp_format, check)
+    return None
+
+
+def rename_sorted(
+    path: str,
+    name: str,
+    kind: str,
+    dtype: str = "",
+    flag: str = "raw",
+    size: str = "",
+    timestamp_col: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
+    check: bool = True,
+) -> tuple[bool, str]:
+    # Same naming-convention fields as utils.rename_from_data, plus ``check``.
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Like :func:`utils.rename_from_data`, using :func:`summarize` when it can.
+
+    Falls back to :func:`utils.rename_from_data` (a full scan) when the
+    shortcut does not apply.
+
+    Returns
+    -------
+    tuple[bool, str]
+        ``(True, new_name)`` on success, otherwise ``(False, "")``.
+    """
+    summary = None
+    if "_" not in name:
+        summary = summarize(path, timestamp_col, timestamp_format, check)
+    if summary is None:
+        return utils.rename_from_data(
+            path,
+            name=name,
+            kind=kind,
+            dtype=dtype,
+            flag=flag,
+            size=size,
+            timestamp_col=timestamp_col,
+            timestamp_format=timestamp_format,
+        )
+
+    data = {
+        "datatype": dtype,
+        "dataflag": flag,
+        "start": summary["start"].isoformat(),
+        "stop": summary["stop"].isoformat(),
+        "count": summary["count"],
+        "size": size,
+    }
+    return utils.create_filename(data, utils.synthetic_name(path, name), kind)
@@ -0,0 +1,76 @@
+"""Health-state cache of portal APIs, shared across processes.
+
+:meth:`WCIBConnection.connect` probes ``/test`` before any operation, one
+extra round trip per command. A successful probe (or first request) is
+recorded here with its time, per API URL, in a small JSON state file; a
+later process within the TTL skips the probe. The state file is only a
+cache: it is rewritten atomically, and a missing, unreadable or unwritable
+file just means probing as before.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+_logger = logging.getLogger("toolslib.health")
+
+# Seconds a recorded healthy state is trusted.
+TTL = 300.0
+
+
+def state_file() -> str:
+    """Return the state file, under ``$XDG_CACHE_HOME`` (or ``~/.cache``)."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache, "dataportaltools", "health.json")
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _store(path: str, state: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except OSError as e:
+        _logger.debug("health state not saved to %s, %s", path, e)
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, path)
+    except OSError as e:
+        # Leave no temporary files behind in the cache directory.
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        _logger.debug("health state not saved to %s, %s", path, e)
+
+
+def is_healthy(url: str, ttl: float = TTL, path: Optional[str] = None) -> bool:
+    """Whether ``url`` was recorded healthy less than ``ttl`` seconds ago."""
+    checked = _load(path or state_file()).get(url)
+    return isinstance(checked, (int, float)) and 0 <= time.time() - checked < ttl
+
+
+def record(url: str, path: Optional[str] = None) -> None:
+    """Record ``url`` as healthy now."""
+    path = path or state_file()
+    state = _load(path)
+    state[url] = time.time()
+    _store(path, state)
+
+
+def forget(url: str, path: Optional[str] = None) -> None:
+    """Drop the recorded state of ``url``, so the next process probes it."""
+    path = path or state_file()
+    state = _load(path)
+    if state.pop(url, None) is not None:
+        _store(path, state)
@@ -0,0 +1,78 @@
+"""Lazy JSON log arguments and a JSON-lines log formatter.
+
+Request and response bodies are logged as JSON on the upload and listing
+paths. Serialising them eagerly costs as much as the request handling
+itself on a large listing, and is thrown away unless DEBUG is enabled.
+Wrapping the body in :class:`LazyJSON` defers ``json.dumps`` to the moment
+a handler formats the record, which never happens below the logger's level::
+
+    _logger.debug("response %s", LazyJSON(j, indent=4))
+
+:class:`JSONFormatter` writes each record as one JSON object, with the
+objects of its ``LazyJSON`` arguments embedded as data instead of text.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+# Attributes of every LogRecord; anything else was passed as ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+# A log argument; str() is its whole interface.
+class LazyJSON:  # pylint: disable=too-few-public-methods
+    """``obj`` as JSON, serialised only when converted to a string"""
+
+    __slots__ = ("obj", "indent")
+
+    def __init__(self, obj: object, indent: Optional[int] = None):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, indent=self.indent, default=str)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object
+
+    ``time`` (UTC), ``level``, ``logger`` and ``message`` are always present.
+    The objects of ``LazyJSON`` arguments go to a ``data`` list, and the
+    message refers to them as ``<data[i]>``. Fields passed as ``extra`` are
+    added as they are, and an exception or stack as ``exc``/``stack`` text.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = []
+        args = record.args
+        if isinstance(args, tuple) and any(isinstance(a, LazyJSON) for a in args):
+            shown = []
+            for arg in args:
+                if isinstance(arg, LazyJSON):
+                    shown.append(f"<data[{len(data)}]>")
+                    data.append(arg.obj)
+                else:
+                    shown.append(arg)
+            message = str(record.msg) % tuple(shown)
+        else:
+            message = record.getMessage()
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        entry = {
+            "time": created.isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+        }
+        if data:
+            entry["data"] = data
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,277 @@
+"""Single-pass scan of (compressed) log files for the naming-convention fields.
+
+A log file name carries the entry count, the uncompressed size and the first
+and last timestamps (see ``src/namingconvention.md``). :func:`scan_log`
+derives all of them while stream-decompressing the file once, so multi-GB
+``.json.zstd`` logs never have to be unpacked to disk.
+"""
+
+import bz2
+import gzip
+import json
+import logging
+import queue
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from . import utils
+
+_logger = logging.getLogger("toolslib.logscan")
+
+# Decompressed bytes handed from the reader thread to the line counter.
+_CHUNK_SIZE = 4 * 1024 * 1024
+# Chunks buffered ahead of the counter; bounds memory to ~depth * chunk size.
+_READAHEAD_DEPTH = 4
+
+# JSON keys tried, in order, when no timestamp key is given.
+_TIME_KEYS = ("@timestamp", "timestamp", "time", "ts", "datetime", "date")
+
+# Fallback for plain-text lines that start with an ISO-8601 timestamp.
+_LEADING_TS = re.compile(
+    r"\s*\[?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?)"
+)
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+# A blank line (only whitespace) inside a chunk of complete lines.
+_BLANK_LINE = re.compile(rb"^[ \t\r]*$", re.MULTILINE)
+
+# Whitespace around the lines of a chunk, blank lines included.
+_SPACE = b" \t\r\n"
+
+
+def human_size(num_bytes: int) -> str:
+    """Format a byte count the way log names carry it, e.g. ``8.168GB``.
+
+    Uses decimal (SI) units with up to three decimals, trailing zeros dropped.
+    """
+    value = float(num_bytes)
+    unit = _SIZE_UNITS[0]
+    for unit in _SIZE_UNITS:
+        if value < 1000 or unit == _SIZE_UNITS[-1]:
+            break
+        value /= 1000
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return f"{text}{unit}"
+
+
+def open_decompressed(path: str) -> object:
+    """Open ``path`` for binary reading, decompressing by its suffix.
+
+    ``.zst``/``.zstd`` use ``zstandard`` (imported lazily), ``.gz`` and
+    ``.bz2`` the standard library; anything else is read as-is.
+    """
+    lower = path.lower()
+    if lower.endswith((".zst", ".zstd")):
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        # The stream reader owns the file object and closes it with itself.
+        # pylint: disable-next=consider-using-with
+        fh = open(path, "rb")
+        return zstandard.ZstdDecompressor().stream_reader(
+            fh, read_size=_CHUNK_SIZE, closefd=True
+        )
+    if lower.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if lower.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")  # pylint: disable=consider-using-with
+
+
+def _readahead(stream: object) -> Iterator[bytes]:
+    """Yield decompressed chunks produced by a background reader thread.
+
+    Decompression (which releases the GIL) overlaps with the line counting
+    done by the consumer; the bounded queue keeps memory use flat.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=_READAHEAD_DEPTH)
+    errors: list = []
+    stop = threading.Event()
+
+    def _produce() -> None:
+        try:
+            while not stop.is_set():
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunks.put(chunk)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Re-raised in the consumer so the caller sees the real failure.
+            errors.append(e)
+        finally:
+            chunks.put(b"")
+
+    reader = threading.Thread(target=_produce, daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue, then let it finish.
+        while reader.is_alive():
+            try:
+                chunks.get_nowait()
+            except queue.Empty:
+                reader.join(timeout=0.01)
+    if errors:
+        raise errors[0]
+
+
+def _epoch_to_iso(value: float) -> str:
+    """Convert an epoch number in s/ms/us/ns (guessed by magnitude) to ISO."""
+    magnitude = abs(value)
+    if magnitude >= 1e17:
+        value /= 1e9
+    elif magnitude >= 1e14:
+        value /= 1e6
+    elif magnitude >= 1e11:
+        value /= 1e3
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+def line_timestamp(line: bytes, timestamp_key: Optional[str] = None) -> str:
+    """Extract the timestamp of one log line as a string, or ``""``.
+
+    JSON lines are looked up by ``timestamp_key`` (or the first of the common
+    keys that is present); epoch numbers are converted to ISO-8601. Other lines
+    fall back to a leading ISO-8601 timestamp.
+    """
+    text = line.decode("utf-8", errors="replace").strip()
+    if text.startswith("{"):
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            keys = (timestamp_key,) if timestamp_key else _TIME_KEYS
+            for key in keys:
+                value = record.get(key)
+                if isinstance(value, bool) or value is None:
+                    continue
+                if isinstance(value, (int, float)):
+                    return _epoch_to_iso(float(value))
+                return str(value)
+            return ""
+
+    m = _LEADING_TS.match(text)
+    return m.group(1).replace(" ", "T") if m is not None else ""
+
+
+def scan_lines(path: str) -> tuple[int, int, bytes, bytes]:
+    """Stream ``path`` once, counting lines and keeping the first and last.
+
+    Blank lines (e.g. a trailing ``"\\n\\n"``) are not entries: they are
+    neither counted nor kept as the first or last line.
+
+    Returns
+    -------
+    tuple[int, int, bytes, bytes]
+        ``(count, size, first_line, last_line)``: the number of non-blank
+        lines, the uncompressed byte count and the first/last non-blank line
+        without surrounding whitespace (``b""`` when there is none).
+    """
+    count = 0
+    size = 0
+    first_line = None
+    last_line = b""
+    carry = b""
+
+    with open_decompressed(path) as stream:
+        for chunk in _readahead(stream):
+            size += len(chunk)
+            data = carry + chunk
+            end = data.rfind(b"\n")
+            if end < 0:
+                carry = data
+                continue
+            complete, carry = data[:end], data[end + 1 :]
+            lines = complete.strip(_SPACE)
+            if not lines:
+                continue
+            blank = sum(1 for _ in _BLANK_LINE.finditer(lines))
+            count += lines.count(b"\n") + 1 - blank
+            if first_line is None:
+                first_line = lines.split(b"\n", 1)[0].strip(_SPACE)
+            last_line = lines[lines.rfind(b"\n") + 1 :].strip(_SPACE)
+
+    carry = carry.strip(_SPACE)
+    if carry:
+        # Final line without a trailing newline.
+        count += 1
+        if first_line is None:
+            first_line = carry
+        last_line = carry
+
+    return count, size, first_line or b"", last_line
+
+
+def scan_log(path: str, timestamp_key: Optional[str] = None) -> dict:
+    """Stream ``path`` once and derive the log naming-convention fields.
+
+    Returns
+    -------
+    dict
+        ``{"count": int, "size": int, "human_size": str, "start": str,
+        "stop": str}`` where ``count`` is the number of lines,
+        ``size`` the uncompressed byte count and ``start``/``stop`` the
+        timestamps of the first and last line (``""`` when not found).
+    """
+    count, size, first_line, last_line = scan_lines(path)
+
+    _logger.debug("scan_log %s, count %d, size %d", path, count, size)
+
+    return {
+        "count": count,
+        "size": size,
+        "human_size": human_size(size),
+        "start": line_timestamp(first_line, timestamp_key) if count else "",
+        "stop": line_timestamp(last_line, timestamp_key) if count else "",
+    }
+
+
+def rename_log(
+    path: str,
+    name: str,
+    dtype: str = "",
+    flag: str = "raw",
+    size: str = "",
+    timestamp_key: Optional[str] = None,
+) -> tuple[bool, str]:
+    # Same naming-convention fields as utils.rename_from_data.
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Build a log convention name for ``path`` by streaming it once.
+
+    :func:`scan_log` supplies the line count, the uncompressed size (used
+    unless ``size`` is given) and the first/last timestamps; the name keeps
+    the source suffixes (e.g. ``.json.zstd``) with ``name`` as the base.
+
+    Returns
+    -------
+    tuple[bool, str]
+        ``(True, new_name)`` on success, otherwise ``(False, "")``.
+    """
+    scan = scan_log(path, timestamp_key)
+    if scan["count"] <= 0:
+        _logger.error("rename_log, '%s' has no lines", path)
+        return False, ""
+    if not scan["start"] or not scan["stop"]:
+        _logger.error("rename_log, no timestamps found in '%s'", path)
+        return False, ""
+
+    data = {
+        # create_filename keeps the format extension (e.g. ".json") in a log
+        # name only when a data type is set, so always set one.
+        "datatype": dtype or "log",
+        "dataflag": flag,
+        "start": scan["start"],
+        "stop": scan["stop"],
+        "count": scan["count"],
+        "size": size or scan["human_size"],
+    }
+    return utils.create_filename(data, utils.synthetic_name(path, name), "log")
@@ -0,0 +1,485 @@
+"""Split and merge data files along time windows of the naming convention.
+
+:func:`split_file` streams a large dump (e.g. a daily or weekly export) in
+chunks, buckets the rows by a fixed time window and writes each bucket as a
+``.parquet.zst`` file named with :func:`utils.create_filename`. Only one chunk
+is held in memory at a time; the per-bucket parquet writers stay open until
+the end so unsorted input is handled too, and the buckets touched by a chunk
+are written in parallel.
+
+:func:`merge_files` does the opposite for collectors that emit thousands of
+tiny files: contiguous files of one series (no overlap, and no gap longer
+than ``max_gap``) are merged up to a target size, cutting the number of
+uploads (each a full HTTP round trip, hash and ingest).
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone
+from typing import Iterator, Optional
+
+from . import timestamps, utils
+
+# The splitter reuses utils' package-internal readers (_read_dataframe,
+# _format_stem, ...) rather than duplicating them.
+# pylint: disable=protected-access
+
+_logger = logging.getLogger("toolslib.partition")
+
+# Supported --window values and the matching pandas offset aliases.
+WINDOWS = {"hour": "h", "day": "D"}
+
+# Rows read per chunk; bounds the memory used by a split.
+_CHUNK_ROWS = 500_000
+
+
+def _iter_frames(path: str, chunk_rows: int) -> Iterator[object]:
+    """Yield ``path`` as a sequence of DataFrames of at most ``chunk_rows`` rows.
+
+    Parquet and CSV are streamed; pickles cannot be and are loaded whole.
+    """
+    stem = utils._format_stem(path)
+    if stem.endswith(".parquet"):
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif stem.endswith(".csv"):
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+    else:
+        yield utils._read_dataframe(path)
+
+
+def _widen_type(old: object, new: object) -> object:
+    """The arrow type holding the values of both ``old`` and ``new``.
+
+    Integers and floats widen to float64, anything else that differs to
+    string; a column that was all null takes the other type.
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    if old == new or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(t(old) for t in numeric) and any(t(new) for t in numeric):
+        if pa.types.is_integer(old) and pa.types.is_integer(new):
+            return pa.int64()
+        return pa.float64()
+    return pa.string()
+
+
+def _widen_schema(schema: object, other: object) -> object:
+    """``schema`` with each column widened to hold ``other``'s (same columns)."""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    types = [_widen_type(f.type, other.field(f.name).type) for f in schema]
+    if all(t == f.type for t, f in zip(types, schema)):
+        return schema
+    # The pandas metadata would describe the old dtypes: dropped.
+    return pa.schema([f.with_type(t) for t, f in zip(types, schema)])
+
+
+class _Bucket:
+    """One output time window: an open parquet writer plus its metadata."""
+
+    def __init__(self, tmp_path: str, schema: object):
+        self.tmp_path = tmp_path
+        self.schema = schema
+        self.writer = None
+        self.count = 0
+        self.start = None
+        self.stop = None
+
+    def write(self, table: object, times: object) -> None:
+        """Append ``table`` (in :attr:`schema`; its parsed timestamps are ``times``)."""
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(
+                self.tmp_path, self.schema, compression="zstd"
+            )
+        self.writer.write_table(table)
+
+        self.count += len(table)
+        lo, hi = times.min(), times.max()
+        self.start = lo if self.start is None else min(self.start, lo)
+        self.stop = hi if self.stop is None else max(self.stop, hi)
+
+    def widen(self, schema: object) -> None:
+        """Switch to the wider ``schema``, rewriting the rows written so far."""
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        self.schema = schema
+        if self.writer is None:
+            return
+        self.close()
+        os.replace(self.tmp_path, self.old_path)
+        self.writer = pq.ParquetWriter(self.tmp_path, schema, compression="zstd")
+        for batch in pq.ParquetFile(self.old_path).iter_batches():
+            self.writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        os.remove(self.old_path)
+
+    @property
+    def old_path(self) -> str:
+        """Where :meth:`widen` moves the rows written so far."""
+        return self.tmp_path + ".old"
+
+    def close(self) -> None:
+        """Close the parquet writer (if one was opened)."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _settle_schema(
+    schema: Optional[object], chunk: object, buckets: dict, pool: object
+) -> object:
+    """The schema holding ``schema`` and ``chunk``; open ``buckets`` are widened to it."""
+    if schema is None:
+        return chunk
+    wider = _widen_schema(schema, chunk)
+    if wider is not schema:
+        _logger.info("split_file, widening columns to %s", wider)
+        list(pool.map(lambda bucket: bucket.widen(wider), buckets.values()))
+    return wider
+
+
+# The parameters mirror the naming-convention fields plus the split knobs.
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def split_file(
+    path: str,
+    name: str,
+    dtype: str,
+    flag: str = "raw",
+    window: str = "hour",
+    timestamp_col: Optional[str] = None,
+    out_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    timestamp_format: Optional[str] = None,
+) -> tuple[bool, list]:
+    # pylint: disable=too-many-locals
+    """Split ``path`` into ``window``-sized metric files named per the convention.
+
+    Rows are bucketed by their timestamp (``timestamp_col``, auto-detected when
+    ``None``, parsed per ``timestamp_format`` or the format inferred from
+    the first chunk) floored to the window; rows whose timestamp cannot be parsed are
+    dropped with a warning. A column whose type widens in a later chunk (e.g.
+    integers, then ``1.5`` or text) is widened in the buckets written so
+    far. Each bucket's ``count``/``start``/``stop`` come from exactly the
+    rows written to it. Output goes to ``out_dir`` (default:
+    next to ``path``); ``workers`` threads write the buckets of each chunk.
+
+    Returns
+    -------
+    tuple[bool, list[str]]
+        ``(ok, out_paths)``: the files written, and whether every bucket
+        could be named (``(False, [])`` when nothing could be split).
+    """
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    if "_" in name:
+        _logger.error("split_file, name must not contain '_': '%s'", name)
+        return False, []
+    if window not in WINDOWS:
+        _logger.error("split_file, unknown window '%s'", window)
+        return False, []
+
+    target_dir = out_dir if out_dir is not None else os.path.dirname(path)
+    buckets = {}
+    col = fmt = None
+    schema = None
+    dropped = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for frame in _iter_frames(path, _CHUNK_ROWS):
+                if col is None:
+                    col, fmt = timestamps.detect(
+                        frame, timestamp_col, timestamp_format=timestamp_format
+                    )
+                times = timestamps.parse(frame[col], fmt)
+                valid = times.notna()
+                dropped += int((~valid).sum())
+                frame, times = frame[valid.to_numpy()], times[valid]
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                schema = _settle_schema(schema, table.schema, buckets, pool)
+                table = table.cast(schema)
+
+                tasks = []
+                keys = times.dt.floor(WINDOWS[window])
+                for key, idx in keys.groupby(keys.to_numpy()).indices.items():
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        tmp = os.path.join(
+                            target_dir, f".{name}-{len(buckets)}.parquet.zst.part"
+                        )
+                        bucket = buckets[key] = _Bucket(tmp, schema)
+                    tasks.append((bucket, table.take(idx), times.iloc[idx]))
+
+                # Each bucket appears once per chunk, so writers never share.
+                list(pool.map(lambda task: task[0].write(task[1], task[2]), tasks))
+    except Exception:
+        for bucket in buckets.values():
+            bucket.close()
+            for part in (bucket.tmp_path, bucket.old_path):
+                if os.path.exists(part):
+                    os.remove(part)
+        raise
+
+    if dropped:
+        _logger.warning(
+            "split_file, dropped %d row(s) without a valid timestamp", dropped
+        )
+
+    return _finish(buckets, name, dtype, flag, target_dir)
+
+
+def _finish(
+    buckets: dict, name: str, dtype: str, flag: str, target_dir: str
+) -> tuple[bool, list]:
+    """Close every bucket and move it to its convention name."""
+    ok = True
+    out_paths = []
+    for key in sorted(buckets):
+        bucket = buckets[key]
+        bucket.close()
+        data = {
+            "datatype": dtype,
+            "dataflag": flag,
+            "start": bucket.start.isoformat(),
+            "stop": bucket.stop.isoformat(),
+            "count": bucket.count,
+        }
+        named, new_name = utils.create_filename(data, f"{name}.parquet.zst", "metric")
+        if not named:
+            os.remove(bucket.tmp_path)
+            ok = False
+            continue
+        out_path = os.path.join(target_dir, new_name)
+        os.replace(bucket.tmp_path, out_path)
+        out_paths.append(out_path)
+
+    if not buckets:
+        _logger.error("split_file, no rows with a valid timestamp")
+        ok = False
+    return ok, out_paths
+
+
+_SIZE_SUFFIXES = {"": 1, "K": 10**3, "M": 10**6, "G": 10**9, "T": 10**12}
+
+_DURATION_SUFFIXES = {"": 1, "S": 1, "MIN": 60, "H": 3600, "D": 86400}
+
+# Longest gap in time between two files merged into one, by default.
+MAX_GAP = timedelta(minutes=5)
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte size such as ``1048576``, ``64MB`` or ``1.5G`` (SI units)."""
+    m = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?)B?\s*", text.upper())
+    if m is None:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 1048576, 64MB, 1.5G")
+    return int(float(m.group(1)) * _SIZE_SUFFIXES[m.group(2)])
+
+
+def parse_duration(text: str) -> timedelta:
+    """Parse a duration such as ``90``/``90s`` (seconds), ``5min``, ``1h`` or ``2d``."""
+    m = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*(S|MIN|H|D)?\s*", text.upper())
+    if m is None:
+        raise ValueError(f"Invalid duration '{text}', expected e.g. 90s, 5min, 1h")
+    return timedelta(seconds=float(m.group(1)) * _DURATION_SUFFIXES[m.group(2) or ""])
+
+
+def _group_series(paths: list) -> dict:
+    """Index metric convention files by ``(name, type, flag)``.
+
+    Each entry is a list of ``(start, stop, bytes, path)`` tuples; non-metric
+    files are skipped.
+    """
+    groups = {}
+    for path in paths:
+        kind, meta = utils.parse_filename(os.path.basename(path))
+        if kind != "metric":
+            _logger.info("plan_merges, skipping non-metric file %s", path)
+            continue
+        start_o, _ = utils._parse_time(meta["start"])
+        stop_o, _ = utils._parse_time(meta["stop"])
+        key = (meta["name"], meta["type"], meta["flag"])
+        groups.setdefault(key, []).append(
+            (_utc(start_o), _utc(stop_o), os.path.getsize(path), path)
+        )
+    return groups
+
+
+def _utc(time_o: object) -> object:
+    """Make a parsed filename time comparable (names without ``Z`` are UTC)."""
+    return time_o if time_o.tzinfo is not None else time_o.replace(tzinfo=timezone.utc)
+
+
+def plan_merges(paths: list, target_bytes: int, max_gap: timedelta = MAX_GAP) -> list:
+    """Group convention metric files into runs to merge.
+
+    Files are grouped by the ``name``/``type``/``flag`` parsed from their
+    names, ordered by start time, and cut into runs whose summed on-disk size
+    stays within ``target_bytes``. A run also ends where the next file's time
+    range overlaps it, or starts more than ``max_gap`` after it stops, so
+    every merged file covers a contiguous span. Files that are not metric
+    convention names are left out.
+
+    Returns
+    -------
+    list[list[str]]
+        Runs of two or more paths; single files need no merge.
+    """
+    groups = _group_series(paths)
+    runs = []
+    for key in sorted(groups):
+        run, run_bytes, run_stop = [], 0, None
+        for start, stop, size, path in sorted(groups[key]):
+            if run and (
+                start < run_stop
+                or start - run_stop > max_gap
+                or run_bytes + size > target_bytes
+            ):
+                runs.append(run)
+                run, run_bytes, run_stop = [], 0, None
+            run.append(path)
+            run_bytes += size
+            run_stop = stop if run_stop is None else max(run_stop, stop)
+        runs.append(run)
+    return [run for run in runs if len(run) > 1]
+
+
+def _valid_first(frame: object, times: object, source: str) -> object:
+    """``frame`` with the rows whose timestamp is invalid moved last (and logged)."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    valid = times.notna().to_numpy()
+    if valid.all():
+        return frame
+    _logger.warning(
+        "merge_files, %d row(s) of %s and following without a valid "
+        "timestamp, kept at the end",
+        int((~valid).sum()),
+        source,
+    )
+    return pd.concat([frame[valid], frame[~valid]])
+
+
+def _merge_run(
+    run: list, timestamp_col: Optional[str], timestamp_format: Optional[str]
+) -> tuple[str, int]:
+    """Concatenate one run into a single parquet+zstd file next to its sources.
+
+    The sources are concatenated in memory (a run is bounded by the target
+    size) so differing per-file column types are unified by pandas. Rows
+    whose timestamp cannot be parsed are kept, after the others; start/stop
+    come from the valid timestamps. Returns the merged file and the number
+    of source rows.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+
+    meta = utils.parse_filename(os.path.basename(run[0]))[1]
+    out_dir = os.path.dirname(run[0])
+    frame = pd.concat([utils._read_dataframe(p) for p in run], ignore_index=True)
+    col, fmt = timestamps.detect(
+        frame, timestamp_col, timestamp_format=timestamp_format
+    )
+    times = timestamps.parse(frame[col], fmt)
+    if times.isna().all():
+        raise ValueError(f"no valid timestamps in {run[0]} and following")
+
+    table = pa.Table.from_pandas(
+        _valid_first(frame, times, run[0]), preserve_index=False
+    )
+    bucket = _Bucket(
+        os.path.join(out_dir, f".{os.path.basename(run[0])}.merge.part"),
+        table.schema,
+    )
+    try:
+        bucket.write(table, times.dropna())
+    except Exception:
+        bucket.close()
+        os.remove(bucket.tmp_path)
+        raise
+    ok, out_paths = _finish(
+        {0: bucket}, meta["name"], meta["type"], meta["flag"], out_dir
+    )
+    if not ok:  # pragma: no cover - fields come from valid convention names
+        raise ValueError(f"cannot build a name for the merge of {run[0]}")
+    return out_paths[0], len(frame)
+
+
+def merge_files(
+    paths: list,
+    target_bytes: int,
+    timestamp_col: Optional[str] = None,
+    remove_sources: bool = False,
+    workers: Optional[int] = None,
+    timestamp_format: Optional[str] = None,
+    max_gap: timedelta = MAX_GAP,
+) -> tuple[bool, dict]:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
+    """Compact many small convention files into fewer large ones.
+
+    Runs planned by :func:`plan_merges` (with ``max_gap``) are each read, concatenated and
+    written as one ``.parquet.zst`` file next to the first source, with
+    count/start/stop recomputed from the merged rows and the ``type``/``flag``
+    of the sources. Runs are merged in parallel on ``workers`` threads. With
+    ``remove_sources`` the merged inputs are deleted afterwards, once the
+    merged file is read back with as many rows as its sources;
+    ``timestamp_col``/``timestamp_format`` are as for :func:`split_file`.
+
+    Returns
+    -------
+    tuple[bool, dict]
+        ``(ok, {out_path: [source paths]})``; ``ok`` is False when any run
+        failed (the failure is logged and its sources are kept).
+    """
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    runs = plan_merges(paths, target_bytes, max_gap)
+
+    ok = True
+    merged = {}
+    rows = {}
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(_merge_run, run, timestamp_col, timestamp_format)
+            for run in runs
+        ]
+        for run, future in zip(runs, futures):
+            try:
+                out_path, rows[out_path] = future.result()
+                merged[out_path] = run
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # Per-run failures are logged so the other runs are still merged.
+                _logger.error("merge_files, %s", e)
+                ok = False
+
+    if remove_sources:
+        for out_path, run in merged.items():
+            written = pq.read_metadata(out_path).num_rows
+            if written != rows[out_path]:
+                _logger.error(
+                    "merge_files, %s has %d rows, its sources %d: sources kept",
+                    out_path,
+                    written,
+                    rows[out_path],
+                )
+                ok = False
+                continue
+            for path in run:
+                if os.path.abspath(path) != os.path.abspath(out_path):
+                    os.remove(path)
+
+    return ok, merged
@@ -0,0 +1,183 @@
+"""Built-in CPU and memory profiling of a CLI run.
+
+Production hosts rarely allow attaching an external profiler. :func:`start`
+profiles the rest of the process until the returned function is called:
+
+* ``cpu``: cProfile; the stats are saved as a pstats file (load it with
+  ``python -m pstats`` or snakeviz) and the top functions by cumulative time
+  are printed;
+* ``mem``: tracemalloc; the peak of traced memory is reported along with
+  the top allocation sites near that peak, and that snapshot is saved
+  (``tracemalloc.Snapshot.load``). Buffers of pyarrow's memory pool are
+  not traced by Python; the pool's own peak and the process's max RSS are
+  reported next to it.
+
+Threads started while profiling (e.g. the upload workers) are CPU-profiled
+along with the calling thread, in one set of stats. Worker processes (e.g.
+of ``--verify-content``) are profiled by neither mode.
+"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import tracemalloc
+from typing import Callable, Optional, TextIO
+
+# Modes and the file their profile is saved to by default.
+DEFAULT_FILES = {"cpu": "dataportaltools.pstats", "mem": "dataportaltools.tracemalloc"}
+
+# Functions or allocation sites listed in the summary.
+TOP = 20
+
+# Seconds between checks of traced memory for a new peak.
+_PEAK_INTERVAL = 0.1
+
+# Frames of the profiler itself, left out of the allocation sites.
+_OWN_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def _mib(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+def _start_cpu(path: str, top: int, stream: TextIO) -> Callable[[], None]:
+    profiler = cProfile.Profile()
+    threads = []
+    if sys.version_info < (3, 12):
+        # cProfile hooks only the thread enabling it (from 3.12 it hooks every
+        # thread): each new thread enables a profiler of its own on its first
+        # event, and the stats of all are merged.
+        def profile_thread(*_: object) -> None:
+            thread_profiler = cProfile.Profile()
+            threads.append(thread_profiler)
+            thread_profiler.enable()
+
+        threading.setprofile(profile_thread)
+    profiler.enable()
+
+    def stop() -> None:
+        profiler.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiler, stream=stream)
+        if threads:
+            stats.add(*threads)
+        stats.dump_stats(path)
+        stream.write(f"cpu profile written to {path}\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    return stop
+
+
+class _PeakSnapshots(threading.Thread):
+    """Keeps a snapshot of the traced allocations near their peak."""
+
+    def __init__(self):
+        super().__init__(name="profile-mem", daemon=True)
+        self.snapshot = None
+        self._size = -1
+        self._done = threading.Event()
+
+    def take(self) -> None:
+        """Snapshot the allocations if they are larger than the kept ones."""
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self._size:
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_FRAMES)
+            # The snapshot itself allocates; measure after taking it.
+            self._size = tracemalloc.get_traced_memory()[0]
+
+    def run(self) -> None:
+        while not self._done.wait(_PEAK_INTERVAL):
+            self.take()
+
+    def stop(self) -> None:
+        """Stop checking, taking a last snapshot."""
+        self._done.set()
+        self.join()
+        self.take()
+
+
+def _native_peaks() -> list[str]:
+    """Peaks Python's allocator does not see: pyarrow's pool and max RSS."""
+    lines = []
+    pyarrow = sys.modules.get("pyarrow")
+    if pyarrow is not None:
+        peak = pyarrow.default_memory_pool().max_memory()
+        if peak is not None and peak >= 0:
+            lines.append(f"pyarrow memory pool peak: {_mib(peak)} (not traced)")
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:  # pragma: no cover - not on Windows
+        return lines
+    # ru_maxrss is in KiB on Linux (bytes on macOS).
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1 if sys.platform == "darwin" else 1024
+    lines.append(f"max RSS: {_mib(maxrss * scale)}")
+    return lines
+
+
+def _start_mem(path: str, top: int, stream: TextIO) -> Callable[[], None]:
+    tracemalloc.start()
+    peaks = _PeakSnapshots()
+    peaks.start()
+
+    def stop() -> None:
+        peaks.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.snapshot.dump(path)
+        out = [
+            f"memory profile written to {path}",
+            f"traced memory: peak {_mib(peak)}, at exit {_mib(current)}",
+            *_native_peaks(),
+            f"top {top} allocation sites near the peak:",
+        ]
+        for stat in peaks.snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            out.append(
+                f"  {_mib(stat.size):>12} {stat.count:>9} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+        stream.write("\n".join(out) + "\n")
+
+    return stop
+
+
+def start(
+    mode: str,
+    path: Optional[str] = None,
+    top: int = TOP,
+    stream: Optional[TextIO] = None,
+) -> Callable[[], None]:
+    """
+    Starts profiling the process
+
+    Parameters
+    ----------
+    mode : str
+        ``"cpu"`` or ``"mem"``
+    path : str | None
+        File the profile is saved to (:data:`DEFAULT_FILES` by default)
+    top : int
+        Functions or allocation sites listed in the summary
+    stream : TextIO | None
+        Where the summary is written (stderr by default, so it never mixes
+        with a command's output)
+
+    Returns
+    -------
+    Callable[[], None]
+        Stops profiling, saves the profile and writes the summary
+    """
+    if mode not in DEFAULT_FILES:
+        raise ValueError(f"unknown profile mode '{mode}'")
+    path = path or DEFAULT_FILES[mode]
+    stream = stream or sys.stderr
+    if mode == "cpu":
+        return _start_cpu(path, top, stream)
+    return _start_mem(path, top, stream)
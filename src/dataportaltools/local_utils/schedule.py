@@ -0,0 +1,83 @@
+"""Size-aware order of a concurrent upload batch.
+
+Uploaded in glob order, one huge file that starts last keeps a batch
+running long after the other lanes went idle. :class:`SizeQueue` hands out
+the files largest first instead (LPT, longest processing time first),
+which keeps the batch within 4/3 of the shortest possible time. The small
+files come last and fill the gaps the large ones leave.
+
+Lanes reserved for small files take the smallest file left, as long as it
+is at most ``small_size`` bytes. Small files then keep moving while all the
+other lanes are busy with huge ones.
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Optional
+
+# Largest file, in bytes, a lane reserved for small files uploads.
+SMALL_FILE_SIZE = 16 * 1024 * 1024
+
+
+def file_size(path: str) -> int:
+    """Bytes of ``path``, 0 when it cannot be read."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def lanes(workers: int, small_lanes: int) -> list[bool]:
+    """
+    The lanes of ``workers`` threads, ``True`` for those reserved for small files
+
+    At least one lane takes any file, so at most ``workers - 1`` are reserved.
+    """
+    reserved = max(0, min(small_lanes, workers - 1))
+    return [False] * (workers - reserved) + [True] * reserved
+
+
+class SizeQueue:
+    """
+    The files of a batch, taken largest first by any lane
+
+    Parameters
+    ----------
+    files : list[str]
+        The files to upload
+    small_size : int | None
+        Largest file, in bytes, a lane reserved for small files takes
+        (default :data:`SMALL_FILE_SIZE`)
+    """
+
+    def __init__(self, files: list[str], small_size: Optional[int] = None):
+        sized = [(file_size(f), f) for f in files]
+        # Largest first; equal sizes keep their order.
+        self._queue = deque(sorted(sized, key=lambda sf: sf[0], reverse=True))
+        self.small_size = SMALL_FILE_SIZE if small_size is None else small_size
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def take(self, small: bool = False) -> Optional[str]:
+        """
+        The next file of a lane, ``None`` when there is none for it
+
+        A lane reserved for small files (``small``) takes the smallest file
+        left if it is small enough; other lanes take the largest.
+        """
+        with self._lock:
+            if not self._queue:
+                return None
+            if not small:
+                return self._queue.popleft()[1]
+            if self._queue[-1][0] > self.small_size:
+                return None
+            return self._queue.pop()[1]
+
+    def clear(self) -> None:
+        """Drop the files not taken yet."""
+        with self._lock:
+            self._queue.clear()
@@ -0,0 +1,207 @@
+"""Timestamp column detection and parsing for data files.
+
+Picking the timestamp column by name alone misfires on columns such as
+``hostname_ts_bucket``, and a format-less ``pd.to_datetime`` over the wrong
+column is the most expensive step of a rename. :func:`detect` instead scores
+a small sample of every column for how well it parses as ISO-8601 text or as
+epoch seconds/milliseconds/microseconds/nanoseconds, and returns the winning
+column together with its format. Text in other layouts gets an explicit
+``strftime`` format inferred from the sample. :func:`parse` then converts the
+full column once, with that explicit format; integer epoch columns are
+reinterpreted in place instead of being parsed at all.
+"""
+
+import logging
+import re
+import warnings
+from typing import Optional
+
+_logger = logging.getLogger("toolslib.timestamps")
+
+# Epoch units, and how many of them make up a second.
+EPOCH_UNITS = {"s": 1, "ms": 10**3, "us": 10**6, "ns": 10**9}
+
+# Epoch seconds accepted as plausible data timestamps (1990-01-01..2100-01-01).
+# The unit ranges do not overlap, so the magnitude identifies the unit.
+_EPOCH_MIN = 631_152_000
+_EPOCH_MAX = 4_102_444_800
+
+# Format of timestamp strings parsed by pandas' fast ISO-8601 path.
+ISO_FORMAT = "ISO8601"
+
+# Non-null values sampled per candidate column.
+_SAMPLE_SIZE = 2048
+
+# Minimum parseable fraction of the sample for a column to be chosen.
+_MIN_SCORE = 0.5
+
+_NAME_HINT = re.compile(r"time|date|ts|timestamp", re.IGNORECASE)
+
+
+def _sample(values: object, sample_size: int) -> object:
+    """Return up to ``sample_size`` non-null values spread evenly over ``values``."""
+    values = values.dropna()
+    if len(values) > sample_size:
+        values = values.iloc[:: len(values) // sample_size][:sample_size]
+    return values
+
+
+def _epoch_score(numbers: object) -> tuple[float, Optional[str]]:
+    """Score numbers as epoch timestamps; return ``(fraction, unit)``."""
+    best = (0.0, None)
+    for unit, per_second in EPOCH_UNITS.items():
+        hits = numbers.between(_EPOCH_MIN * per_second, _EPOCH_MAX * per_second)
+        score = float(hits.mean())
+        if score > best[0]:
+            best = (score, unit)
+    return best
+
+
+def score_column(
+    values: object, sample_size: int = _SAMPLE_SIZE
+) -> tuple[float, Optional[str]]:
+    """Score how well ``values`` parse as timestamps, from a sample.
+
+    Returns
+    -------
+    tuple[float, str | None]
+        ``(fraction, fmt)``: the parseable fraction of the sampled non-null
+        values and the format to pass to :func:`parse` (an epoch unit from
+        :data:`EPOCH_UNITS`, :data:`ISO_FORMAT` or an inferred ``strftime``
+        format; ``None`` for values that already are datetimes or that did
+        not parse at all).
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 1.0, None
+    if pd.api.types.is_bool_dtype(values):
+        return 0.0, None
+
+    sample = _sample(values, sample_size)
+    if sample.empty:
+        return 0.0, None
+    if pd.api.types.is_numeric_dtype(sample):
+        return _epoch_score(sample)
+
+    numbers = pd.to_numeric(sample, errors="coerce")
+    if numbers.notna().all():
+        # Epoch numbers stored as text (e.g. read from JSON).
+        return _epoch_score(numbers)
+
+    text = sample.astype(str)
+    best = _format_score(text, ISO_FORMAT)
+    if best[0] < 1.0:
+        for fmt in _guess_formats(text.iloc[0]):
+            candidate = _format_score(text, fmt)
+            if candidate[0] > best[0]:
+                best = candidate
+    return best
+
+
+def _format_score(text: object, fmt: str) -> tuple[float, Optional[str]]:
+    """Return the fraction of ``text`` parsed by ``fmt``, and ``fmt`` if any."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    parsed = pd.to_datetime(text, format=fmt, errors="coerce", utc=True)
+    score = float(parsed.notna().mean())
+    return score, (fmt if score > 0 else None)
+
+
+def _guess_formats(value: str) -> list:
+    """Return the ``strftime`` formats pandas guesses for ``value``.
+
+    Both the month-first and the day-first reading are tried, since a single
+    value such as ``01/02/2024`` cannot tell them apart; scoring the sample
+    picks the right one.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from pandas.tseries.api import guess_datetime_format
+
+    formats = []
+    for dayfirst in (False, True):
+        with warnings.catch_warnings():
+            # pandas warns when dayfirst does not apply to the value's layout.
+            warnings.simplefilter("ignore", UserWarning)
+            fmt = guess_datetime_format(value, dayfirst=dayfirst)
+        if fmt is not None and fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+def detect(
+    frame: object,
+    timestamp_col: Optional[str] = None,
+    sample_size: int = _SAMPLE_SIZE,
+    timestamp_format: Optional[str] = None,
+) -> tuple[str, Optional[str]]:
+    """Pick the timestamp column of ``frame`` and its parse format.
+
+    A given ``timestamp_format`` (epoch unit, :data:`ISO_FORMAT` or
+    ``strftime`` format) is used as-is instead of the sampled one.
+    With ``timestamp_col`` only that column is checked (and must exist).
+    Otherwise every column is scored by :func:`score_column`; the best one
+    scoring at least ``0.5`` wins, ties going to a time-like name and then to
+    the leftmost column. When no column scores, the first column with a
+    time-like name (else the first column) is returned, as before content
+    detection existed.
+
+    Returns
+    -------
+    tuple[str, str | None]
+        ``(column, fmt)`` where ``fmt`` is to be passed to :func:`parse`.
+
+    Raises
+    ------
+    ValueError
+        If ``timestamp_col`` is missing or ``frame`` has no columns.
+    """
+    columns = list(frame.columns)
+    if timestamp_col is not None:
+        if timestamp_col not in columns:
+            raise ValueError(
+                f"Timestamp column '{timestamp_col}' not found; columns: {columns}"
+            )
+        if timestamp_format is not None:
+            return timestamp_col, timestamp_format
+        return timestamp_col, score_column(frame[timestamp_col], sample_size)[1]
+    if not columns:
+        raise ValueError("File has no columns to derive timestamps from")
+
+    scored = []
+    for idx, col in enumerate(columns):
+        score, fmt = score_column(frame[col], sample_size)
+        _logger.debug("detect, column %s score %.3f format %s", col, score, fmt)
+        scored.append(((score, bool(_NAME_HINT.search(str(col))), -idx), col, fmt))
+    key, col, fmt = max(scored, key=lambda item: item[0])
+    if key[0] < _MIN_SCORE:
+        col = next((c for c in columns if _NAME_HINT.search(str(c))), columns[0])
+        fmt = None
+    return col, (timestamp_format if timestamp_format is not None else fmt)
+
+
+def parse(values: object, fmt: Optional[str]) -> object:
+    """Convert ``values`` to UTC datetimes using the format from :func:`detect`.
+
+    Integer epoch columns are reinterpreted as datetimes of that unit without
+    any copy or string round trip; other epoch values are converted
+    numerically. :data:`ISO_FORMAT` or a ``strftime`` format uses the
+    vectorized parser, and ``None`` leaves format inference to pandas.
+    Unparseable values become ``NaT``.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if fmt in EPOCH_UNITS:
+        numbers = values
+        if not pd.api.types.is_numeric_dtype(numbers):
+            numbers = pd.to_numeric(numbers, errors="coerce")
+        if str(numbers.dtype) == "int64":
+            # int64 epochs are datetime64 values of their unit already; the
+            # int64 minimum maps to NaT as in numpy.
+            return pd.Series(
+                numbers.to_numpy().view(f"M8[{fmt}]"),
+                index=values.index,
+                dtype=f"datetime64[{fmt}, UTC]",
+            )
+        return pd.to_datetime(numbers, unit=fmt, errors="coerce", utc=True)
+    return pd.to_datetime(values, format=fmt, errors="coerce", utc=True)
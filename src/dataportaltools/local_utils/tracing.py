@@ -0,0 +1,377 @@
+"""Per-request timing of the portal API client, exported as a trace.
+
+When uploads are slow, ``-vv`` shows the JSON bodies but not whether the
+time goes to connecting, sending the body or waiting for the server. A
+:class:`Tracer` installed on the client's session times every request at
+the transport level. Its urllib3 connections record the phases of each
+request:
+
+* ``tcp_s``: name resolution plus TCP connect (0 on a reused connection);
+* ``tls_s``: the TLS handshake of an ``https`` connection;
+* ``send_s``: writing the request line, headers and body;
+* ``wait_s``: from the end of the body to the response headers;
+* ``ttfb_s``: from the start of the request to the response headers;
+* ``receive_s``: reading the response body.
+
+:meth:`Tracer.gauge` adds sampled values to every record, such as the
+client's current concurrency limit. :meth:`Tracer.write` saves one JSON
+line per request followed by aggregates per route (latency percentiles,
+bytes and MB/s, the highest concurrency), or the same aggregates as an
+OpenMetrics text exposition.
+"""
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Phase timings of the request being sent on this thread, None when untraced.
+_local = threading.local()
+
+# Path segments that are ids, grouped as one route.
+_ID = re.compile(r"/[0-9]+(?=/|$)")
+
+# Quantiles of the aggregates.
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Trace files written as OpenMetrics text; anything else is JSON lines.
+OPENMETRICS_SUFFIXES = (".prom", ".om")
+
+
+def _add(phase: str, t0: float) -> None:
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - t0
+
+
+class _Timed:
+    """Mixed into urllib3's connections to time the phases of a request."""
+
+    # super() is the urllib3 connection class this is mixed into.
+    # pylint: disable=no-member
+
+    def _new_conn(self) -> object:
+        t0 = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _add("tcp", t0)
+
+    def connect(self) -> None:
+        """Connect, timing it (``tcp`` is part of it)."""
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add("connect", t0)
+
+    def request(self, *args: object, **kwargs: object) -> None:
+        """Send the request, timing it apart from any connect."""
+        timings = getattr(_local, "timings", None) or {}
+        connected = timings.get("connect", 0.0)
+        t0 = time.perf_counter()
+        try:
+            super().request(*args, **kwargs)
+        finally:
+            # A plain HTTP connection connects lazily, within the request.
+            _add("send", t0 + timings.get("connect", 0.0) - connected)
+
+    def getresponse(self, *args: object, **kwargs: object) -> object:
+        """Wait for the response headers, timing it."""
+        t0 = time.perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            _add("wait", t0)
+            timings = getattr(_local, "timings", None)
+            if timings is not None:
+                timings["headers_at"] = time.perf_counter()
+
+
+class _HTTPConnection(_Timed, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_Timed, HTTPSConnection):
+    pass
+
+
+class _HTTPPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class _TracingAdapter(HTTPAdapter):
+    """Sends requests on timed connections and reports them to a tracer."""
+
+    def __init__(self, tracer: "Tracer", pool_size: int):
+        self._tracer = tracer
+        super().__init__(pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args: object, **kwargs: object) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPPool,
+            "https": _HTTPSPool,
+        }
+
+    # parameters are those of HTTPAdapter.send, locals the measurements
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
+    def send(
+        self,
+        request: object,
+        stream: bool = False,
+        timeout: object = None,
+        verify: object = True,
+        cert: object = None,
+        proxies: Optional[dict] = None,
+    ) -> object:
+        _local.timings = timings = {}
+        started = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        status, received, error = None, 0, None
+        try:
+            response = super().send(request, stream, timeout, verify, cert, proxies)
+            status = response.status_code
+            if not stream:
+                r0 = time.perf_counter()
+                received = len(response.content)
+                timings["receive"] = time.perf_counter() - r0
+            return response
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _local.timings = None
+            total = time.perf_counter() - t0
+            self._tracer.add(
+                request, started, total, t0, timings, status, received, error
+            )
+
+
+def _quantile(values: list, q: float) -> Optional[float]:
+    """Linearly interpolated quantile ``q`` of the sorted ``values``."""
+    if not values:
+        return None
+    pos = (len(values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 6)
+
+
+def _mbps(size: int, seconds: float) -> Optional[float]:
+    return _round(size / seconds / 1e6) if size and seconds > 0 else None
+
+
+def _aggregate(method: str, route: str, records: list) -> dict:
+    """The aggregate of ``records`` (see :meth:`Tracer.aggregates`)."""
+    total = sorted(r["total_s"] for r in records)
+    ttfb = sorted(r["ttfb_s"] for r in records if r["ttfb_s"] is not None)
+    sent = sum(r["sent_bytes"] for r in records)
+    received = sum(r["received_bytes"] for r in records)
+    aggregate = {
+        "method": method,
+        "route": route,
+        "requests": len(records),
+        "errors": sum(r["error"] is not None for r in records),
+        "connections": sum(not r["reused"] for r in records),
+    }
+    for q in QUANTILES:
+        aggregate[f"p{round(q * 100)}_s"] = _round(_quantile(total, q))
+    for q in QUANTILES:
+        aggregate[f"ttfb_p{round(q * 100)}_s"] = _round(_quantile(ttfb, q))
+    aggregate |= {
+        "total_s": _round(sum(total)),
+        "sent_bytes": sent,
+        "received_bytes": received,
+        "send_MBps": _mbps(sent, sum(r["send_s"] or 0.0 for r in records)),
+        "MBps": _mbps(sent + received, sum(total)),
+    }
+    concurrency = [r["concurrency"] for r in records if "concurrency" in r]
+    if concurrency:
+        aggregate["concurrency_max"] = max(concurrency)
+    return aggregate
+
+
+class Tracer:
+    """
+    Collects the timings of every request sent on the sessions it is
+    installed on
+
+    Attributes
+    ----------
+    records : list[dict]
+        One dict per request, in the order they completed
+    gauges : dict[str, Callable[[], object]]
+        Values sampled into every record when its request completes
+    """
+
+    def __init__(self):
+        self.records = []
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def install(self, session: object, pool_size: int = 10) -> None:
+        """Send the requests of ``session`` through timed connections."""
+        adapter = _TracingAdapter(self, pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    def gauge(self, name: str, sample: Callable[[], object]) -> None:
+        """Record ``sample()`` as ``name`` in every request record."""
+        self.gauges[name] = sample
+
+    # parameters and locals are the measurements of one request
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-locals
+    def add(
+        self,
+        request: object,
+        started: datetime,
+        total: float,
+        t0: float,
+        timings: dict,
+        status: Optional[int],
+        received: int,
+        error: Optional[str],
+    ) -> None:
+        """Record a request sent (starting at ``t0``) on a traced session."""
+        url = urlsplit(request.url)
+        sent = int(request.headers.get("Content-Length") or 0)
+        tcp = timings.get("tcp", 0.0)
+        tls = timings.get("connect", 0.0) - tcp if url.scheme == "https" else 0.0
+        send = timings.get("send")
+        headers_at = timings.get("headers_at")
+        record = {
+            "time": started.isoformat(timespec="milliseconds"),
+            "method": request.method,
+            "route": _ID.sub("/{id}", url.path),
+            "url": request.url,
+            "status": status,
+            "error": error,
+            "reused": "connect" not in timings,
+            "tcp_s": _round(tcp),
+            "tls_s": _round(tls),
+            "send_s": _round(send),
+            "wait_s": _round(timings.get("wait")),
+            "ttfb_s": _round(None if headers_at is None else headers_at - t0),
+            "receive_s": _round(timings.get("receive")),
+            "total_s": _round(total),
+            "sent_bytes": sent,
+            "received_bytes": received,
+            "send_MBps": _mbps(sent, send or 0.0),
+        } | {name: sample() for name, sample in self.gauges.items()}
+        with self._lock:
+            self.records.append(record)
+
+    def aggregates(self) -> list[dict]:
+        """
+        Returns the aggregates of the requests per method and route
+
+        One dict per ``(method, route)``, plus a last one over all requests
+        (method and route ``"*"``), with the request and error counts, the
+        p50/p95/p99 of ``total_s`` and ``ttfb_s``, new connections, bytes
+        and MB/s (sent bytes over send time, and all bytes over total time).
+        """
+        groups = {}
+        for record in self.records:
+            groups.setdefault((record["method"], record["route"]), []).append(record)
+        out = [_aggregate(*key, groups[key]) for key in sorted(groups)]
+        if self.records:
+            out.append(_aggregate("*", "*", self.records))
+        return out
+
+    def write(self, path: str) -> None:
+        """
+        Writes the trace to ``path``
+
+        OpenMetrics text when ``path`` ends with one of
+        :data:`OPENMETRICS_SUFFIXES`, otherwise JSON lines: one
+        ``{"type": "request", ...}`` line per request and one
+        ``{"type": "aggregate", ...}`` line per :meth:`aggregates` entry.
+        """
+        with open(path, "w", encoding="utf-8") as fh:
+            if path.endswith(OPENMETRICS_SUFFIXES):
+                fh.write(self.openmetrics())
+                return
+            for record in self.records:
+                fh.write(json.dumps({"type": "request"} | record) + "\n")
+            for aggregate in self.aggregates():
+                fh.write(json.dumps({"type": "aggregate"} | aggregate) + "\n")
+
+    def openmetrics(self) -> str:
+        """Returns the aggregates per route as OpenMetrics text."""
+        aggregates = [a for a in self.aggregates() if a["method"] != "*"]
+        lines = []
+
+        def family(name: str, kind: str, unit: str, help_text: str) -> str:
+            lines.append(f"# TYPE {name} {kind}")
+            if unit:
+                lines.append(f"# UNIT {name} {unit}")
+            lines.append(f"# HELP {name} {help_text}")
+            return name
+
+        def labels(a: dict, **extra: str) -> str:
+            pairs = {"method": a["method"], "route": a["route"]} | extra
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs.items()) + "}"
+
+        for name, key, help_text in (
+            ("dataportal_request_duration_seconds", "p", "Request duration."),
+            ("dataportal_request_ttfb_seconds", "ttfb_p", "Time to first byte."),
+        ):
+            family(name, "summary", "seconds", help_text)
+            for a in aggregates:
+                for q in QUANTILES:
+                    value = a[f"{key}{round(q * 100)}_s"]
+                    if value is not None:
+                        lines.append(f"{name}{labels(a, quantile=str(q))} {value}")
+                if key == "p":
+                    lines.append(f"{name}_sum{labels(a)} {a['total_s']}")
+                    lines.append(f"{name}_count{labels(a)} {a['requests']}")
+        for name, key, help_text in (
+            ("dataportal_requests", "requests", "Requests sent."),
+            ("dataportal_request_errors", "errors", "Requests without a response."),
+            ("dataportal_connections", "connections", "New connections."),
+            ("dataportal_sent_bytes", "sent_bytes", "Request body bytes."),
+            ("dataportal_received_bytes", "received_bytes", "Response body bytes."),
+        ):
+            unit = "bytes" if key.endswith("bytes") else ""
+            family(name, "counter", unit, help_text)
+            for a in aggregates:
+                lines.append(f"{name}_total{labels(a)} {a[key]}")
+        name = family(
+            "dataportal_send_throughput_bytes_per_second",
+            "gauge",
+            "",
+            "Request body bytes over the time spent sending them.",
+        )
+        for a in aggregates:
+            if a["send_MBps"] is not None:
+                lines.append(f"{name}{labels(a)} {a['send_MBps'] * 1e6:.0f}")
+        if any("concurrency_max" in a for a in aggregates):
+            name = family(
+                "dataportal_concurrency_max",
+                "gauge",
+                "",
+                "Most requests allowed in flight by the adaptive limit.",
+            )
+            for a in aggregates:
+                if "concurrency_max" in a:
+                    lines.append(f"{name}{labels(a)} {a['concurrency_max']}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
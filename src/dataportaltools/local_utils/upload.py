@@ -1,25 +1,78 @@
 """HTTP client (WCIBConnection) for the WARA-Ops dataportal API."""
 
-import json
+# WCIBConnection is the one client class of the whole API; splitting the
+# module would split the class.
+# pylint: disable=too-many-lines
+
 import logging
 import os
+import random
 import re
-from typing import Optional, Union
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Union
 
 import requests
-import xxhash
 
+from . import catalog as catalog_db
+from . import compression
+from . import concurrency
+from . import health
+from . import logjson
+from . import schedule
 from . import utils
 from . import wcib_format
 
 _logger = logging.getLogger("toolslib.upload")
 
+# Connections requests keeps per host by default.
+_POOL_SIZE = 10
+
+# Seconds before the first retry of a 429/503 answer (doubling per retry, with
+# jitter) unless the answer has a Retry-After, and the most waited.
+_BACKOFF = 1.0
+_BACKOFF_MAX = 60.0
+
+
+def _body_size(response: Optional[object]) -> int:
+    """Bytes of the request body of ``response`` (0 when unknown)."""
+    try:
+        return int(response.request.headers.get("Content-Length") or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def _retry_delay(response: object, attempt: int) -> float:
+    """Seconds to wait before retry ``attempt`` (from 0) of ``response``."""
+    try:
+        delay = float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        delay = _BACKOFF * 2**attempt * random.uniform(0.5, 1.0)
+    return min(max(delay, 0.0), _BACKOFF_MAX)
+
+
+def _rewind(kwargs: dict) -> None:
+    """Seek the ``data=`` body and ``files=`` objects of a request to their start."""
+    if hasattr(kwargs.get("data"), "seek"):
+        kwargs["data"].seek(0)
+    files = kwargs.get("files")
+    pairs = files.items() if isinstance(files, dict) else files or ()
+    for _, value in pairs:
+        handle = value[1] if isinstance(value, tuple) else value
+        if hasattr(handle, "seek"):
+            handle.seek(0)
+
 
 class WCIBError(Exception):
     """Raised when a dataportal API operation cannot be completed."""
 
 
-class WCIBConnection:
+class WCIBConnectError(WCIBError):
+    """Raised when the portal API cannot be reached."""
+
+
+# The connection settings plus the session and its checked state.
+class WCIBConnection:  # pylint: disable=too-many-instance-attributes
     """
     A class to maintain the attributes for the HTTP requests
 
@@ -34,10 +87,40 @@ class WCIBConnection:
         User token
     timeout : int
         HTTP timeout
+    catalog : Catalog | None
+        Local catalog recording uploads and listings; content it knows a
+        dataset has is not uploaded again
+    health_ttl : float
+        Seconds a successful check of the API, recorded in the shared health
+        state file, saves the ``/test`` probe of later connects (0: always
+        probe)
+    tracer : Tracer | None
+        Times every request of the session (installed on connect)
+    workers : int
+        Requests in flight to start with; above 1, files are uploaded
+        concurrently
+    max_workers : int
+        Files uploaded at once, at most (default
+        :data:`concurrency.CEILING_FACTOR` times ``workers``); the requests
+        in flight are limited by :attr:`limiter`
+    retries : int
+        Times a request answered with 429 or 503 is sent again
+    small_lanes : int
+        Of the ``workers``, those that upload only small files (at most
+        :data:`schedule.SMALL_FILE_SIZE` bytes), so these never wait behind
+        huge ones
+    compress : str | None
+        Compress data files (those not compressed already) with this method
+        of :mod:`compression` while they upload
+    compress_level : int | None
+        Compression level of ``compress`` (default :data:`compression.LEVEL`)
+    limiter : concurrency.AdaptiveLimit
+        Adapts the requests in flight to the answers, from ``workers`` up to
+        ``max_workers``
 
     Methods
     -------
-    connect():
+    connect(session, lazy):
         Reads token and checks if API is available
     create_dataset(infofile, user, dryrun):
         Creates a new dataset
@@ -51,8 +134,22 @@ class WCIBConnection:
         List files in dataset
     """
 
+    # the connection settings, all but the URL optional
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     def __init__(
-        self, api_url: str, tokenfile: Optional[str] = "", token: Optional[str] = ""
+        self,
+        api_url: str,
+        tokenfile: Optional[str] = "",
+        token: Optional[str] = "",
+        catalog: Optional[catalog_db.Catalog] = None,
+        health_ttl: float = 0.0,
+        tracer: Optional[object] = None,
+        workers: int = 1,
+        retries: int = 0,
+        small_lanes: int = 0,
+        compress: Optional[str] = None,
+        compress_level: Optional[int] = None,
+        max_workers: Optional[int] = None,
     ):
         """
         Initiates object
@@ -70,14 +167,43 @@ class WCIBConnection:
         self.token_file = tokenfile
         self.token_data = token
         self.timeout = (600, 1200)
+        self.catalog = catalog
+        self.health_ttl = health_ttl
+        self.tracer = tracer
+        self.workers = max(1, workers)
+        self.max_workers = max(
+            self.workers,
+            concurrency.CEILING_FACTOR * self.workers
+            if max_workers is None
+            else max_workers,
+        )
+        self.retries = retries
+        self.small_lanes = small_lanes
+        self.compress = compress
+        self.compress_level = (
+            compression.LEVEL if compress_level is None else compress_level
+        )
+        self.limiter = concurrency.AdaptiveLimit(
+            self.max_workers, initial=self.workers, slow_start=False
+        )
         self._s = None
+        self._checked = False
 
-    def connect(self, session: Optional[object] = None) -> None:
+    def connect(self, session: Optional[object] = None, lazy: bool = False) -> None:
         """
         Reads token and checks if API is available
 
+        The ``/test`` probe is skipped when the API was recorded healthy less
+        than ``health_ttl`` seconds ago, or with ``lazy``. The first request
+        then checks the connection instead: when it cannot reach the API it
+        raises :class:`WCIBConnectError`, as the probe would.
+
         Parameters
         ----------
+        session : requests.Session | None
+            Session to use (a new one by default)
+        lazy : bool
+            Never probe; let the first request check the connection
 
         Returns
         -------
@@ -95,10 +221,81 @@ class WCIBConnection:
                 self.token_data = tok.strip()
 
         self._s = requests.Session() if session is None else session
+        self._checked = False
+        pool_size = max(_POOL_SIZE, self.max_workers)
+        if self.tracer is not None:
+            self.tracer.install(self._s, pool_size)
+            self.tracer.gauge("concurrency", lambda: self.limiter.concurrency)
+        elif pool_size > _POOL_SIZE:
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+            self._s.mount("http://", adapter)
+            self._s.mount("https://", adapter)
+
+        if lazy or (
+            self.health_ttl > 0 and health.is_healthy(self.url, self.health_ttl)
+        ):
+            _logger.debug("Skipping the API test of %s", self.url)
+            return
 
-        response = self._s.get(f"{self.url}/test", timeout=self.timeout)
+        try:
+            response = self._s.get(f"{self.url}/test", timeout=self.timeout)
+        except requests.exceptions.ConnectionError as err:
+            raise WCIBConnectError(f"Failed to reach api, {err}") from err
         if response.status_code >= 300:
-            raise WCIBError("Failed to test api")
+            raise WCIBConnectError("Failed to test api")
+        self._checked_ok()
+
+    def _checked_ok(self) -> None:
+        self._checked = True
+        if self.health_ttl > 0:
+            health.record(self.url)
+
+    def _request(self, method: str, url: str, **kwargs: object) -> object:
+        """
+        Sends a request on the session (``method`` is "get", "post", ...)
+
+        The request waits for a slot of :attr:`limiter`. An answer of 429 or
+        503 is retried up to :attr:`retries` times, after its Retry-After
+        or an exponential backoff; files being sent are rewound first.
+
+        Until the API has been checked, a request that cannot reach it
+        raises :class:`WCIBConnectError` (and drops its recorded health), and
+        one answered without a server error checks it.
+        """
+        attempt = 0
+        while True:
+            ticket = self.limiter.acquire()
+            t0 = time.perf_counter()
+            response = None
+            try:
+                response = self._send(method, url, **kwargs)
+            finally:
+                status = None if response is None else response.status_code
+                self.limiter.release(
+                    ticket, status, time.perf_counter() - t0, _body_size(response)
+                )
+            if status not in concurrency.BACKOFF_STATUSES or attempt >= self.retries:
+                return response
+            delay = _retry_delay(response, attempt)
+            _logger.info(
+                "%s %s: HTTP %s, retrying in %.1fs", method, url, status, delay
+            )
+            time.sleep(delay)
+            _rewind(kwargs)
+            attempt += 1
+
+    def _send(self, method: str, url: str, **kwargs: object) -> object:
+        send = getattr(self._s, method)
+        if self._checked:
+            return send(url, **kwargs)
+        try:
+            response = send(url, **kwargs)
+        except requests.exceptions.ConnectionError as err:
+            health.forget(self.url)
+            raise WCIBConnectError(f"Failed to reach api, {err}") from err
+        if response.status_code < 500:
+            self._checked_ok()
+        return response
 
     def create_dataset(self, infofile: str, user: str, dryrun: bool) -> int:
         """
@@ -124,6 +321,24 @@ class WCIBConnection:
         ------
         Exception if info file is invalid
         """
+        try:
+            j = self.new_dataset(infofile, user, dryrun)
+        except requests.exceptions.HTTPError as err:
+            _logger.error("%s", self._error_detail(err))
+            return 1
+
+        wcib_format.print_created_dataset(j)
+
+        return 0
+
+    def new_dataset(self, infofile: str, user: str, dryrun: bool) -> dict:
+        """
+        Creates a new dataset and returns the API response
+
+        The non-printing form of :meth:`create_dataset`: returns the response
+        (``DatasetID``, ``ContainerName``; empty on a dryrun) and raises
+        ``requests.exceptions.HTTPError`` when the request fails.
+        """
         data = utils.parse_info(infofile)
         if not utils.validate_info(data):
             raise WCIBError("Invalid info file")
@@ -149,33 +364,27 @@ class WCIBConnection:
         pth = f"{self.url}/dataset"
         j = {}
 
-        try:
-            _data = {
-                "category": data["category"],
-                "tenant": data["tenant"],
-                "name": data["dataset"],
-                "owner": user,
-                "short_info": data["short info"],
-                "long_info": data["long info"],
-                "access_type": data["access"],
-                "tags": data["tags"],
-            }
-
-            if dryrun:
-                _logger.info("Create dataset, %s", json.dumps(_data, indent=4))
-            else:
-                response = self._s.post(
-                    pth, headers=headers, json=_data, timeout=self.timeout
-                )
-                response.raise_for_status()
-                j = response.json()
-        except requests.exceptions.HTTPError as err:
-            _logger.error("%s", self._error_detail(err))
-            return 1
+        _data = {
+            "category": data["category"],
+            "tenant": data["tenant"],
+            "name": data["dataset"],
+            "owner": user,
+            "short_info": data["short info"],
+            "long_info": data["long info"],
+            "access_type": data["access"],
+            "tags": data["tags"],
+        }
 
-        wcib_format.print_created_dataset(j)
+        if dryrun:
+            _logger.info("Create dataset, %s", logjson.LazyJSON(_data, indent=4))
+        else:
+            response = self._request(
+                "post", pth, headers=headers, json=_data, timeout=self.timeout
+            )
+            response.raise_for_status()
+            j = response.json()
 
-        return 0
+        return j
 
     # parameters mirror the annotation request fields
     # pylint: disable=too-many-arguments,too-many-positional-arguments
@@ -250,7 +459,9 @@ class WCIBConnection:
             )
             return {}
 
-        response = self._s.put(pth, headers=headers, json=body, timeout=self.timeout)
+        response = self._request(
+            "put", pth, headers=headers, json=body, timeout=self.timeout
+        )
         response.raise_for_status()
         return response.json()
 
@@ -264,12 +475,35 @@ class WCIBConnection:
         is the on-disk byte count. Both are sent with atomic uploads so the
         server can validate the payload and de-duplicate retries.
         """
-        size = os.path.getsize(fname)
-        h = xxhash.xxh128()
-        with open(fname, "rb") as fh:
-            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
-                h.update(chunk)
-        return size, h.hexdigest()
+        return os.path.getsize(fname), catalog_db.content_hash(fname)
+
+    def _compression_of(self, fname: str) -> Optional[str]:
+        """Method :attr:`compress` compresses ``fname`` with, if any."""
+        if self.compress and compression.needs_compression(fname):
+            return self.compress
+        return None
+
+    def _upload_name(self, fname: str) -> str:
+        """Base name ``fname`` is uploaded as (with any compression suffix)."""
+        name = os.path.basename(fname)
+        method = self._compression_of(name)
+        return compression.compressed_name(name, method) if method else name
+
+    def _known_upload(
+        self, datasetid: int, fname: str, key: str, extra: bool = False
+    ) -> Optional[dict]:
+        """Response of an earlier upload of the same content, from the catalog."""
+        known = None
+        if self.catalog is not None:
+            known = self.catalog.find_upload(datasetid, key, self.url, extra)
+        if known is not None:
+            _logger.info(
+                "Skipping %s, dataset %d has its content (FileID %s)",
+                fname,
+                datasetid,
+                known["fileId"],
+            )
+        return known
 
     @staticmethod
     def _error_detail(err: Exception) -> str:
@@ -392,12 +626,16 @@ class WCIBConnection:
             # Atomic streaming upload: send the exact byte size up front and an
             # Idempotency-Key (xxh128 hex of the bytes) so retries de-dup.
             size, idempotency_key = self._file_size_and_key(fname)
+            known = self._known_upload(datasetid, fname, idempotency_key, extra=True)
+            if known is not None:
+                return known
             body["size"] = size
             headers["Idempotency-Key"] = idempotency_key
 
             with open(fname, "rb") as data_fh:
                 payload = (("data", data_fh),)
-                response = self._s.post(
+                response = self._request(
+                    "post",
                     pth,
                     headers=headers,
                     data=body,
@@ -406,7 +644,19 @@ class WCIBConnection:
                 )
             response.raise_for_status()
             j = response.json()
-            _logger.debug("response %s", json.dumps(j))
+            _logger.debug("response %s", logjson.LazyJSON(j))
+            if self.catalog is not None:
+                self.catalog.record_upload(
+                    datasetid,
+                    fname,
+                    "/".join(segments + [body["filename"]]),
+                    idempotency_key,
+                    size,
+                    {},
+                    j,
+                    extra=True,
+                    api=self.url,
+                )
         else:
             _logger.info(
                 "_upload_extra, datasetid %d, fname %s, body %s", datasetid, fname, body
@@ -441,12 +691,19 @@ class WCIBConnection:
         Raises
         ------
         """
-        _logger.debug("_upload_data filedata %s", json.dumps(data, indent=4))
+        _logger.debug("_upload_data filedata %s", logjson.LazyJSON(data, indent=4))
 
         # Raises exception on int error
         data["count"] = int(data["count"])
 
-        size, idempotency_key = self._file_size_and_key(fname)
+        # With compression, the size and key are those of the compressed bytes.
+        method = self._compression_of(fname)
+        if method:
+            size, idempotency_key = compression.size_and_key(
+                fname, method, self.compress_level
+            )
+        else:
+            size, idempotency_key = self._file_size_and_key(fname)
 
         # The API validates start/stop as RFC3339 date-time (timezone required),
         # but filenames carry them without a zone, so normalize to the ...Z form.
@@ -459,7 +716,7 @@ class WCIBConnection:
             "start": start,
             "stop": stop,
             "count": int(data["count"]),
-            "filename": os.path.basename(fname),
+            "filename": self._upload_name(fname),
             "size": size,
         }
 
@@ -475,29 +732,61 @@ class WCIBConnection:
         if datatype != "":
             form["datatype"] = datatype
 
-        _logger.debug("_upload_data form %s", json.dumps(form, indent=4))
+        _logger.debug("_upload_data form %s", logjson.LazyJSON(form, indent=4))
 
         if not dryrun:
+            known = self._known_upload(datasetid, fname, idempotency_key)
+            if known is not None:
+                return known
             headers = {
                 "Authorization": f"Bearer {self.token_data}",
                 "Idempotency-Key": idempotency_key,
             }
             pth = f"{self.url}/dataset/{datasetid}/files"
 
-            with open(fname, "rb") as data_fh:
-                payload = (("data", (os.path.basename(fname), data_fh)),)
-                response = self._s.post(
-                    pth,
-                    headers=headers,
-                    data=form,
-                    files=payload,
-                    timeout=self.timeout,
+            if method:
+                # Streamed as it is compressed, with the exact Content-Length.
+                body = compression.MultipartBody(
+                    form,
+                    "data",
+                    form["filename"],
+                    fname,
+                    method,
+                    size,
+                    self.compress_level,
+                    expected_key=idempotency_key,
                 )
+                headers["Content-Type"] = body.content_type
+                response = self._request(
+                    "post", pth, headers=headers, data=body, timeout=self.timeout
+                )
+            else:
+                with open(fname, "rb") as data_fh:
+                    payload = (("data", (form["filename"], data_fh)),)
+                    response = self._request(
+                        "post",
+                        pth,
+                        headers=headers,
+                        data=form,
+                        files=payload,
+                        timeout=self.timeout,
+                    )
             response.raise_for_status()
             j = response.json()
-            _logger.debug("response %s", json.dumps(j, indent=4))
+            _logger.debug("response %s", logjson.LazyJSON(j, indent=4))
+            if self.catalog is not None:
+                self.catalog.record_upload(
+                    datasetid,
+                    fname,
+                    form["filename"],
+                    idempotency_key,
+                    size,
+                    form,
+                    j,
+                    api=self.url,
+                )
         else:
-            _logger.info("_upload_data %s", json.dumps(form, indent=4))
+            _logger.info("_upload_data %s", logjson.LazyJSON(form, indent=4))
 
             j = {}
 
@@ -539,36 +828,14 @@ class WCIBConnection:
         Raises
         ------
         """
-        ret = 0
-        resp = {}
-
-        for f in all_files:
-            try:
-                resp_json = self._upload_extra(datasetid, f, prefix, dryrun)
-
-                _logger.debug("resp_json %s", str(resp_json))
-
-                v = resp_json.get("path", None)
-                if v is not None:
-                    resp[f] = resp_json["path"]
-            # pylint: disable=broad-exception-caught
-            # per-file failures are logged and skipped so other files still upload
-            except Exception as e:
-                _logger.error("Upload of %s failed, %s", f, self._error_detail(e))
-                ret = 1
-                continue
-
-            # Annotate the freshly-uploaded file. Reported separately so an
-            # annotation failure is not misattributed to the upload.
-            try:
-                self._annotate_uploaded(
-                    datasetid, resp_json, tags, points_of_interest, dryrun
-                )
-            except Exception as e:  # pylint: disable=broad-exception-caught
-                _logger.error("Annotation of %s failed, %s", f, self._error_detail(e))
-                ret = 1
-
-        return ret, resp
+        return self._upload_each(
+            datasetid,
+            all_files,
+            lambda f: self._upload_extra(datasetid, f, prefix, dryrun),
+            tags,
+            points_of_interest,
+            dryrun,
+        )
 
     # parameters mirror the upload request fields
     # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
@@ -611,14 +878,12 @@ class WCIBConnection:
         ------
         """
         ret = 0  # ok
-        resp = {}
-
         send_d = {}
 
         # is a single file is uploaded, its name may be constructed from user params
         if len(all_files) == 1:
             f = all_files[0]
-            src_file = os.path.basename(f)
+            src_file = self._upload_name(f)
 
             ok, long_name = utils.create_filename(data, src_file, kind)
 
@@ -643,7 +908,7 @@ class WCIBConnection:
         # All filenames must follow naming convention
         if len(all_files) > 1:
             for f in all_files:
-                src_file = os.path.basename(f)
+                src_file = self._upload_name(f)
                 kind, filedata = utils.parse_filename(src_file)
 
                 _logger.debug(
@@ -655,38 +920,109 @@ class WCIBConnection:
                 else:
                     ret = 1
 
-        _logger.debug("send_d %s", json.dumps(send_d))
+        _logger.debug("send_d %s", logjson.LazyJSON(send_d))
 
         # Here, send_d contains valid file names and filedata
-        for fname, filedata in send_d.items():
-            try:
-                resp_json = self._upload_data(datasetid, fname, filedata, dryrun)
+        failed, resp = self._upload_each(
+            datasetid,
+            list(send_d),
+            lambda f: self._upload_data(datasetid, f, send_d[f], dryrun),
+            tags,
+            points_of_interest,
+            dryrun,
+        )
+        return max(ret, failed), resp
 
-                _logger.debug("resp_json %s", str(resp_json))
+    # parameters are those of the upload of each file
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _upload_each(
+        self,
+        datasetid: int,
+        files: list[str],
+        send: Callable[[str], dict],
+        tags: Optional[list],
+        points_of_interest: Optional[list],
+        dryrun: bool,
+    ) -> tuple[int, dict]:
+        """
+        Uploads (``send(file)``) and annotates each file
 
-                v = resp_json.get("path", None)
-                if v is not None:
-                    resp[fname] = resp_json["path"]
-            # pylint: disable=broad-exception-caught
-            # per-file failures are logged and skipped so other files still upload
-            except Exception as e:
-                _logger.error("Upload of %s failed, %s", fname, self._error_detail(e))
-                ret = 1
-                continue
+        Up to :attr:`workers` files at once, on threads, largest first
+        (:class:`schedule.SizeQueue`); :attr:`small_lanes` of the threads
+        take only small files. An unreachable API stops the uploads (files
+        not started yet are skipped).
 
-            # Annotate the freshly-uploaded file. Reported separately so an
-            # annotation failure is not misattributed to the upload.
-            try:
-                self._annotate_uploaded(
-                    datasetid, resp_json, tags, points_of_interest, dryrun
-                )
-            except Exception as e:  # pylint: disable=broad-exception-caught
-                _logger.error(
-                    "Annotation of %s failed, %s", fname, self._error_detail(e)
-                )
-                ret = 1
+        Returns
+        -------
+        ok, response : tuple[int, dict]
+            0 when all files were uploaded and annotated (else 1), and the
+            destination path of each uploaded file.
+        """
 
-        return ret, resp
+        def one(f: str) -> tuple[int, Optional[str]]:
+            return self._upload_one(
+                datasetid, f, send, tags, points_of_interest, dryrun
+            )
+
+        results = {}
+        if self.workers <= 1 or len(files) <= 1:
+            for f in files:
+                results[f] = one(f)
+        else:
+            queue = schedule.SizeQueue(files)
+
+            def lane(small: bool) -> None:
+                while (f := queue.take(small)) is not None:
+                    results[f] = one(f)
+
+            workers = min(self.max_workers, len(files))
+            with ThreadPoolExecutor(workers) as pool:
+                futures = [
+                    pool.submit(lane, small)
+                    for small in schedule.lanes(workers, self.small_lanes)
+                ]
+                wait(futures, return_when=FIRST_EXCEPTION)
+                try:
+                    for future in futures:
+                        future.result()
+                except WCIBConnectError:
+                    queue.clear()
+                    raise
+        resp = {f: results[f][1] for f in files if results[f][1] is not None}
+        return max((ret for ret, _ in results.values()), default=0), resp
+
+    # parameters are those of the upload of the file
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _upload_one(
+        self,
+        datasetid: int,
+        fname: str,
+        send: Callable[[str], dict],
+        tags: Optional[list],
+        points_of_interest: Optional[list],
+        dryrun: bool,
+    ) -> tuple[int, Optional[str]]:
+        """Uploads and annotates one file; (0 or 1, its destination path)."""
+        try:
+            resp_json = send(fname)
+            _logger.debug("resp_json %s", resp_json)
+        except WCIBConnectError:
+            raise
+        # per-file failures are logged and skipped so other files still upload
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _logger.error("Upload of %s failed, %s", fname, self._error_detail(e))
+            return 1, None
+
+        # Annotate the freshly-uploaded file. Reported separately so an
+        # annotation failure is not misattributed to the upload.
+        try:
+            self._annotate_uploaded(
+                datasetid, resp_json, tags, points_of_interest, dryrun
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            _logger.error("Annotation of %s failed, %s", fname, self._error_detail(e))
+            return 1, resp_json.get("path")
+        return 0, resp_json.get("path")
 
     def _list_files(
         self, datasetid: int, extrafiles: bool, dryrun: bool, limit: int = 0
@@ -705,18 +1041,24 @@ class WCIBConnection:
             if dryrun:
                 _logger.info("List files in dataset %d", datasetid)
             else:
-                response = self._s.get(pth, headers=headers, timeout=self.timeout)
+                response = self._request(
+                    "get", pth, headers=headers, timeout=self.timeout
+                )
                 response.raise_for_status()
                 j = response.json()
         except requests.exceptions.HTTPError as err:
             _logger.error("list files failed, %s", self._error_detail(err))
             return None
 
-        _logger.debug(json.dumps(j, indent=3))
+        _logger.debug("listing %s", logjson.LazyJSON(j, indent=3))
 
         _files = j.get("data", [])
         files.extend(_files)
 
+        # Only a complete listing tells which files the dataset (still) has.
+        if self.catalog is not None and not dryrun and limit == 0:
+            self.catalog.record_listing(datasetid, files, extrafiles, self.url)
+
         return files
 
     # parameters mirror the upload request fields
@@ -779,6 +1121,45 @@ class WCIBConnection:
         Raises
         ------
         """
+        ok, resp = self.upload_files(
+            datasetid,
+            src_list,
+            data,
+            prefix,
+            kind,
+            dryrun,
+            tags,
+            points_of_interest,
+            extra,
+        )
+
+        wcib_format.print_uploads(resp)
+
+        return ok
+
+    # parameters are those of upload
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def upload_files(
+        self,
+        datasetid: int,
+        src_list: list[str],
+        data: dict,
+        prefix: str,
+        kind: str,
+        dryrun: bool,
+        tags: Optional[list] = None,
+        points_of_interest: Optional[list] = None,
+        extra: bool = False,
+    ) -> tuple[int, dict]:
+        """
+        Uploads files to a dataset (the non-printing :meth:`upload`)
+
+        Returns
+        -------
+        ok, response : tuple[int, dict]
+            0 when all files were uploaded (else 1), and the destination
+            path of each uploaded source file.
+        """
         _all_files = utils.get_all_src_files(src_list)
         _logger.debug("src_list %s, all_files %s", src_list, _all_files)
 
@@ -787,7 +1168,7 @@ class WCIBConnection:
 
         if len(all_files) == 0:
             _logger.info("No files found")
-            return 1
+            return 1, {}
 
         # Extra files are uploaded "as is" when the caller marks them as such;
         # otherwise the files go through the datafile naming-convention path.
@@ -800,13 +1181,7 @@ class WCIBConnection:
                 datasetid, all_files, data, kind, dryrun, tags, points_of_interest
             )
 
-        fmt = "{:<50} | {:<50}"
-        print(fmt.format("Source", "Dest"))
-        print("-" * 51 + "+" + "-" * 61)
-        for src, dst in resp.items():
-            print(fmt.format(src, dst))
-
-        return ok
+        return ok, resp
 
     def delete(self, datasetid: int, force: bool, dryrun: bool) -> int:
         """
@@ -857,16 +1232,21 @@ class WCIBConnection:
         j = {}
         try:
             if dryrun:
-                _logger.info("delete file, %s", str(pth))
+                _logger.info("delete file, %s", pth)
             else:
-                response = self._s.delete(pth, headers=headers, timeout=self.timeout)
+                response = self._request(
+                    "delete", pth, headers=headers, timeout=self.timeout
+                )
                 response.raise_for_status()
                 j = response.json()
         except requests.exceptions.HTTPError as err:
             _logger.error("delete failed, %s", self._error_detail(err))
             return 1
 
-        _logger.debug("response %s", json.dumps(j, indent=4))
+        if self.catalog is not None and not dryrun:
+            self.catalog.forget(datasetid, self.url)
+
+        _logger.debug("response %s", logjson.LazyJSON(j, indent=4))
 
         return 0
 
@@ -888,6 +1268,20 @@ class WCIBConnection:
         Raises
         ------
         """
+        datasets = self.datasets(dryrun)
+        if datasets is None:
+            return 1
+
+        wcib_format.print_datasets(datasets)
+
+        return 0
+
+    def datasets(self, dryrun: bool) -> Union[list[dict], None]:
+        """
+        Returns the user's datasets (the non-printing :meth:`list_datasets`)
+
+        ``None`` when the request fails; an empty list on a dryrun.
+        """
         # headers = {"content-type": "application/json", "Authorization": self.token_data }
         headers = {"Authorization": f"Bearer {self.token_data}"}
 
@@ -901,18 +1295,16 @@ class WCIBConnection:
             if dryrun:
                 _logger.info("List datasets")
             else:
-                response = self._s.get(pth, headers=headers, timeout=self.timeout)
+                response = self._request(
+                    "get", pth, headers=headers, timeout=self.timeout
+                )
                 response.raise_for_status()
                 j = response.json()
         except requests.exceptions.HTTPError as err:
             _logger.error("list datasets failed, %s", self._error_detail(err))
-            return 1
-
-        datasets = j.get("Datasets", [])
-
-        wcib_format.print_datasets(datasets)
+            return None
 
-        return 0
+        return j.get("Datasets", [])
 
     def list_files(self, datasetid: int, dryrun: bool) -> int:
         """
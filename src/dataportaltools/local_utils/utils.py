@@ -1,13 +1,16 @@
 """Filename parsing, validation and construction helpers for the CLI."""
 
+import functools
 import glob
-import json
 import logging
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional
 
+from . import filenames, logjson, timestamps
+
 _logger = logging.getLogger("toolslib.utils")
 
 # Default to quiet; configure_logging() raises this when asked.
@@ -15,15 +18,17 @@ _LOG_ENV_VAR = "PORTAL_LOG_LEVEL"
 _DEFAULT_LEVEL = logging.WARNING
 
 
-def configure_logging(verbose: int = 0) -> None:
-    """Configure the ``toolslib`` loggers' verbosity.
+def configure_logging(verbose: int = 0, log_format: str = "text") -> None:
+    """Configure the ``toolslib`` loggers' verbosity and format.
 
     Precedence (highest first):
       * ``verbose`` count from the CLI (-v -> INFO, -vv or more -> DEBUG);
       * the ``PORTAL_LOG_LEVEL`` environment variable (e.g. DEBUG/INFO/WARNING);
       * the default (WARNING) -- only warnings and errors are shown.
 
-    Installs a basic stderr handler once so the chosen level actually prints.
+    Installs a basic stderr handler once so the chosen level actually prints;
+    with ``log_format="json"`` it writes one JSON object per record (see
+    :class:`logjson.JSONFormatter`).
     """
     if verbose >= 2:
         level = logging.DEBUG
@@ -35,7 +40,10 @@ def configure_logging(verbose: int = 0) -> None:
         if not isinstance(level, int):
             level = _DEFAULT_LEVEL
 
-    logging.basicConfig(level=level)
+    handler = logging.StreamHandler()
+    if log_format == "json":
+        handler.setFormatter(logjson.JSONFormatter())
+    logging.basicConfig(level=level, handlers=[handler])
     logging.getLogger("toolslib").setLevel(level)
 
 
@@ -188,10 +196,7 @@ def valid_date(s: str) -> bool:
     Raises
     ------
     """
-    date_pattern = r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?Z?"
-    m = re.search(date_pattern, s)
-
-    return m is not None
+    return filenames.has_date(s)
 
 
 def parse_filename(fname: str) -> tuple[str, dict]:
@@ -230,77 +235,36 @@ def parse_filename(fname: str) -> tuple[str, dict]:
     Raises
     ------
     """
-    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)"
-    m = re.search(regex_pattern, fname)
-    if m is not None:
-        if valid_date(m.group(3)) and valid_date(m.group(4)):
-            tail = m.group(6)
-            tail_pattern = r"([^.]+)\.([^.]+)\.([^.]+)"
-            t = re.search(tail_pattern, tail)
-            if t is not None:
-                return "metric", {
-                    "name": m.group(1),
-                    "type": m.group(2),
-                    "start": m.group(3),
-                    "stop": m.group(4),
-                    "count": m.group(5),
-                    "flag": t.group(1),
-                    "ext": t.group(2),
-                    "compression": t.group(3),
-                    "prefix": m.group(3)[0:4],
-                }
+    # Single linear pass; see filenames for the exact matching rules.
+    return filenames.parse(fname)
 
-            tail_pattern = r"([^.]+)\.([^.]+)"
-            t = re.search(tail_pattern, tail)
-            if t is not None:
-                return "metric", {
-                    "name": m.group(1),
-                    "type": m.group(2),
-                    "start": m.group(3),
-                    "stop": m.group(4),
-                    "count": m.group(5),
-                    "flag": t.group(1),
-                    "ext": t.group(2),
-                    "prefix": m.group(3)[0:4],
-                }
-        else:
-            # invalid date(s)
-            pass
 
-    # try log
-    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^.]+)\.(.*)"
-    m = re.search(regex_pattern, fname)
-    if m is not None:
-        if valid_date(m.group(2)) and valid_date(m.group(3)):
-            tail = m.group(7)
-            tail_pattern = r"([^.]+)\.([^.]+)"
-            t = re.search(tail_pattern, tail)
-            if t is not None:
-                return "log", {
-                    "name": m.group(1),
-                    "start": m.group(2),
-                    "stop": m.group(3),
-                    "count": m.group(4),
-                    "size": m.group(5),
-                    "flag": m.group(6),
-                    "type": t.group(1),
-                    "compression": t.group(2),
-                    "prefix": m.group(3)[0:4],
-                }
+def parse_filenames(names: list[str]) -> dict:
+    """
+    Parse many file names at once, see :func:`parse_filename`.
 
-            return "log", {
-                "name": m.group(1),
-                "start": m.group(2),
-                "stop": m.group(3),
-                "count": m.group(4),
-                "size": m.group(5),
-                "flag": m.group(6),
-                "compression": m.group(7),
-                "prefix": m.group(3)[0:4],
-            }
-        # invalid date(s)
+    Parameters
+    ----------
+    names : list[str]
+        File names
 
-    return "extra", {}
+    Returns
+    -------
+    dict[str, list]
+        Columns ``kind``, ``name``, ``type``, ``start``, ``stop``, ``count``,
+        ``size``, ``flag``, ``ext``, ``compression`` and ``prefix``, each a
+        list aligned with ``names``. ``kind`` is "metric", "log" or "extra";
+        fields missing for a name are ``None``.
+
+    Raises
+    ------
+    """
+    return filenames.parse_many(names)
+
+
+# Distinct strings remembered by _parse_time; start/stop values repeat heavily
+# across a listing or a bulk upload.
+_PARSE_CACHE_SIZE = 65536
 
 
 def normalize_timestamp(s: str) -> tuple[bool, str]:
@@ -314,19 +278,76 @@ def normalize_timestamp(s: str) -> tuple[bool, str]:
     return obj is not None, norm
 
 
+def normalize_timestamps(values: list[str]) -> list[str]:
+    """Normalize many timestamp strings at once.
+
+    The vectorized form of :func:`normalize_timestamp`: the distinct values
+    are collected once, those of the fixed ``YYYY-MM-DDThh:mm:ss[.uuu][Z]``
+    shape are validated and rewritten as a whole column, and anything else
+    goes through :func:`normalize_timestamp`.
+
+    Parameters
+    ----------
+    values : list[str]
+        Timestamp strings, e.g. the ``start`` column of
+        :func:`parse_filenames`.
+
+    Returns
+    -------
+    list[str]
+        The normalized strings, aligned with ``values``; ``""`` where a value
+        cannot be parsed.
+
+    Raises
+    ------
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    codes, distinct = pd.factorize(pd.Series(list(values), dtype="str"))
+    if len(codes) == 0:
+        return []
+    text = pd.Series(distinct, dtype="str")
+    seconds = text.str.slice(0, 19)
+    # pandas' %S accepts a leap second, which datetime (and so the generic
+    # parse) rejects.
+    fast = (
+        text.str.fullmatch(filenames.TIME_SHAPE.pattern).fillna(False)
+        & (text.str.slice(17, 19) < "60").fillna(False)
+        & pd.to_datetime(seconds, format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+        .notna()
+        .to_numpy()
+    )
+
+    fraction = text.str.slice(19, 23)
+    fraction = fraction.where(fraction.str.startswith(".") & (fraction != ".000"), "")
+    out = (seconds + fraction + "Z").where(fast, "").to_numpy(dtype=object)
+    for idx in (~fast).to_numpy().nonzero()[0]:
+        out[idx] = _parse_time(text.iat[idx])[1]
+    return out[codes].tolist()
+
+
+@functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
 def _parse_time(s: str) -> tuple[object, str]:
     """Parse an ISO-8601 or epoch timestamp into a (datetime, normalized) pair.
 
-    Returns ``(None, "")`` for empty or unparseable input. The normalized
-    string uses the ``YYYY-MM-DDThh:mm:ss[.uuu]Z`` form expected by the API.
+    Epochs may be strings or numbers. Returns ``(None, "")`` for empty or
+    unparseable input. The normalized string uses the
+    ``YYYY-MM-DDThh:mm:ss[.uuu]Z`` form expected by the API. Results are
+    cached, and the usual convention shape skips the generic parse.
     """
     if s == "":
         return None, ""
+    # Numeric epochs (e.g. from JSON metadata) only take the generic parse.
+    parsed = filenames.parse_time(s) if isinstance(s, str) else None
+    return parsed if parsed is not None else _parse_time_generic(s)
+
 
+def _parse_time_generic(s: str) -> tuple[object, str]:
+    """Epoch or any ``datetime.fromisoformat`` input; see :func:`_parse_time`."""
     try:
         time_f = float(s)
     except ValueError as e:
-        _logger.debug("Not epoch, it seems, %s", str(e))
+        _logger.debug("Not epoch, it seems, %s", e)
         time_f = -1.0
 
     time_o = None
@@ -344,14 +365,14 @@ def _parse_time(s: str) -> tuple[object, str]:
             OverflowError,
             OSError,
         ) as e:  # pragma: no cover - bounded epoch rarely overflows
-            _logger.debug("Not epoch, it seems, %s", str(e))
+            _logger.debug("Not epoch, it seems, %s", e)
             return None, ""
     else:
         # last chance for parsing the date string
         try:
             time_o = datetime.fromisoformat(s)
         except ValueError as e:
-            _logger.debug("Invalid date format '%s', %s", s, str(e))
+            _logger.debug("Invalid date format '%s', %s", s, e)
             return None, ""
 
     if time_o is None:  # pragma: no cover - defensive, should not happen
@@ -411,7 +432,7 @@ def create_filename(data: dict, fname: str, kind: str) -> tuple[bool, str]:
         return False, ""
 
     # required fields are start, stop and count
-    _logger.debug("create_filename, data %s", json.dumps(data))
+    _logger.debug("create_filename, data %s", logjson.LazyJSON(data))
 
     count = int(data.get("count", "0"))
     if count <= 0:
@@ -420,12 +441,12 @@ def create_filename(data: dict, fname: str, kind: str) -> tuple[bool, str]:
 
     start_o, start = _parse_time(data.get("start", ""))
     if start_o is None:
-        _logger.debug("create_filename, start_o %s", str(start_o))
+        _logger.debug("create_filename, start_o %s", start_o)
         return False, ""
 
     stop_o, stop = _parse_time(data.get("stop", ""))
     if stop_o is None:
-        _logger.debug("create_filename, stop_o %s", str(stop_o))
+        _logger.debug("create_filename, stop_o %s", stop_o)
         return False, ""
 
     # Sanity check
@@ -508,6 +529,16 @@ def create_filename(data: dict, fname: str, kind: str) -> tuple[bool, str]:
     return True, new_name
 
 
+def _format_stem(path: str) -> str:
+    """Return the lower-cased ``path`` without a trailing compression suffix."""
+    return re.sub(r"\.(gz|bz2|zst|zstd)$", "", path.lower())
+
+
+def is_dataframe_format(path: str) -> bool:
+    """Whether :func:`_read_dataframe` can load ``path`` (csv/parquet/pkl)."""
+    return _format_stem(path).endswith((".csv", ".parquet", ".pkl"))
+
+
 def _read_dataframe(path: str) -> object:
     """Load ``path`` into a pandas DataFrame, dispatching on the extension.
 
@@ -520,9 +551,7 @@ def _read_dataframe(path: str) -> object:
     # actually requested, not on every CLI invocation.
     import pandas as pd  # pylint: disable=import-outside-toplevel
 
-    lower = path.lower()
-    # Strip a trailing compression suffix to find the format extension.
-    stem = re.sub(r"\.(gz|bz2|zst|zstd)$", "", lower)
+    stem = _format_stem(path)
 
     if stem.endswith(".parquet"):
         return pd.read_parquet(path)
@@ -535,21 +564,7 @@ def _read_dataframe(path: str) -> object:
 
 def _detect_timestamp_column(frame: object, timestamp_col: Optional[str]) -> str:
     """Return the timestamp column name, validating or auto-detecting it."""
-    columns = list(frame.columns)
-    if timestamp_col is not None:
-        if timestamp_col not in columns:
-            raise ValueError(
-                f"Timestamp column '{timestamp_col}' not found; columns: {columns}"
-            )
-        return timestamp_col
-
-    # Auto-detect: first column whose name hints at time, else the first column.
-    for col in columns:
-        if re.search(r"time|date|ts|timestamp", str(col), re.IGNORECASE):
-            return col
-    if not columns:
-        raise ValueError("File has no columns to derive timestamps from")
-    return columns[0]
+    return timestamps.detect(frame, timestamp_col)[0]
 
 
 def rename_from_data(
@@ -560,6 +575,7 @@ def rename_from_data(
     flag: str = "raw",
     size: str = "",
     timestamp_col: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
 ) -> tuple[bool, str]:
     # The parameters mirror the naming-convention fields that pandas cannot
     # infer (name/kind/dtype/flag/size) plus the timestamp column.
@@ -588,15 +604,15 @@ def rename_from_data(
         Uncompressed size; required for log names.
     timestamp_col : str | None
         Column holding the timestamps; auto-detected when ``None``.
+    timestamp_format : str | None
+        Epoch unit (``s``/``ms``/``us``/``ns``), ``ISO8601`` or ``strftime``
+        format of the timestamps; inferred from a sample when ``None``.
 
     Returns
     -------
     tuple[bool, str]
         ``(True, new_name)`` on success, otherwise ``(False, "")``.
     """
-    # Lazy import: only pay the pandas import cost when renaming.
-    import pandas as pd  # pylint: disable=import-outside-toplevel
-
     if "_" in name:
         _logger.error("rename_from_data, name must not contain '_': '%s'", name)
         return False, ""
@@ -607,8 +623,10 @@ def rename_from_data(
         _logger.error("rename_from_data, '%s' has no rows", path)
         return False, ""
 
-    col = _detect_timestamp_column(frame, timestamp_col)
-    times = pd.to_datetime(frame[col], errors="coerce", utc=True).dropna()
+    col, fmt = timestamps.detect(
+        frame, timestamp_col, timestamp_format=timestamp_format
+    )
+    times = timestamps.parse(frame[col], fmt).dropna()
     if times.empty:
         _logger.error("rename_from_data, no valid timestamps in column '%s'", col)
         return False, ""
@@ -622,15 +640,81 @@ def rename_from_data(
         "size": size,
     }
 
-    # create_filename derives base/ext/comp from the file name, so pass the
-    # source basename but with the desired <name> as the base.
+    return create_filename(data, synthetic_name(path, name), kind)
+
+
+def synthetic_name(path: str, name: str) -> str:
+    """Return ``path``'s basename with its base replaced by ``name``.
+
+    create_filename derives base/ext/comp from the file name, so callers pass
+    the source suffixes (``.csv.zst`` etc.) with the desired <name> as base.
+    """
     base = os.path.basename(path)
-    suffix = base[len(base.split(".")[0]) :]  # ".csv.zst" etc.
-    synthetic = f"{name}{suffix}"
-    return create_filename(data, synthetic, kind)
+    suffix = base[len(base.split(".")[0]) :]
+    return f"{name}{suffix}"
+
+
+# Rows sampled (evenly spaced) from each column before the full numeric pass.
+# One value in the sample that does not parse as a number already proves the
+# column is text, so obviously textual columns skip the expensive full scan.
+_INFER_SAMPLE_SIZE = 256
+
+# Below this many candidate columns a thread pool costs more than it saves.
+_INFER_PARALLEL_MIN_COLS = 8
 
+# Largest magnitude an integral float can have and still fit in int64.
+_INT64_LIMIT = 2.0**63
 
-def normalize_dataframe(frame: object, skip_cols: Optional[list] = None) -> list:
+
+def _infer_column(values: object) -> tuple[str, object]:
+    """Decide whether one column is ``int``, ``float`` or ``text``.
+
+    A cheap sampled pre-check rejects columns with a non-numeric value in the
+    sample; the survivors get a single ``pd.to_numeric`` pass whose result
+    dtype (plus one vectorized integrality check for floats) decides the type.
+
+    Returns
+    -------
+    tuple[str, object]
+        ``("int"|"float", converted_series)`` or ``("text", None)``.
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    step = max(1, len(values) // _INFER_SAMPLE_SIZE)
+    sample = values.iloc[::step]
+    if pd.to_numeric(sample, errors="coerce").isna().any():
+        return "text", None
+
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.isna().any():
+        return "text", None
+
+    if pd.api.types.is_integer_dtype(numeric):
+        # uint64 above the int64 range would wrap negative: keep it as float.
+        fits = numeric.empty or int(numeric.max()) <= np.iinfo("int64").max
+        kind = "int" if fits else "float"
+        return kind, numeric.astype("int64" if fits else "float64")
+    if not pd.api.types.is_float_dtype(numeric):  # pragma: no cover - defensive
+        # Anything else (e.g. Python objects) is not safe to store as numbers.
+        return "text", None
+
+    arr = numeric.to_numpy(dtype="float64")
+    # Integral, finite and in range: store as int64 without a lossy cast.
+    with np.errstate(invalid="ignore"):
+        integral = bool(
+            np.all(np.isfinite(arr))
+            and np.all(np.abs(arr) < _INT64_LIMIT)
+            and np.array_equal(arr, np.trunc(arr))
+        )
+    if integral:
+        return "int", numeric.astype("int64")
+    return "float", numeric.astype("float64")
+
+
+def normalize_dataframe(
+    frame: object, skip_cols: Optional[list] = None, workers: Optional[int] = None
+) -> list:
     """Coerce non-numeric columns to a tighter dtype, in place.
 
     For each column not in ``skip_cols`` that is not already numeric, try to
@@ -638,6 +722,10 @@ def normalize_dataframe(frame: object, skip_cols: Optional[list] = None) -> list
     that could not be made numeric are returned so the caller can ask the user
     to review them (the type could not be determined automatically).
 
+    The per-column inference (:func:`_infer_column`) runs on a thread pool of
+    ``workers`` threads (default: CPU count) when the frame is wide enough to
+    benefit; the frame itself is only updated from the calling thread.
+
     Works across pandas versions where string columns may report ``object`` or
     the newer ``str``/``string`` dtype.
 
@@ -649,26 +737,182 @@ def normalize_dataframe(frame: object, skip_cols: Optional[list] = None) -> list
     import pandas as pd  # pylint: disable=import-outside-toplevel
 
     skip = set(skip_cols or [])
+    # Leave already-numeric columns as they are (int/float/etc.).
+    candidates = [
+        col
+        for col in frame.columns
+        if col not in skip and not pd.api.types.is_numeric_dtype(frame[col])
+    ]
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    columns = [frame[col] for col in candidates]
+    if workers > 1 and len(candidates) >= _INFER_PARALLEL_MIN_COLS:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_infer_column, columns))
+    else:
+        results = [_infer_column(values) for values in columns]
+
     text_cols = []
+    for col, (kind, converted) in zip(candidates, results):
+        if kind == "text":
+            # Could not be made numeric; leave as text and flag for review.
+            text_cols.append(str(col))
+        else:
+            frame[col] = converted
+
+    return text_cols
+
+
+# Text columns with at most this share of distinct values are stored as
+# categoricals, which parquet writes as dictionary-encoded columns.
+_CATEGORY_MAX_RATIO = 0.5
+
+
+def _compact_column(values: object, float_tolerance: Optional[float]) -> object:
+    # One early return per dtype family reads better than a nested decision.
+    # pylint: disable=too-many-return-statements
+    """Return a narrower representation of ``values``, or ``None`` to keep it."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    if pd.api.types.is_bool_dtype(values):
+        return None
+
+    if pd.api.types.is_integer_dtype(values):
+        # Non-negative columns (counters, status codes) fit unsigned widths.
+        downcast = "unsigned" if len(values) and values.min() >= 0 else "integer"
+        narrowed = pd.to_numeric(values, downcast=downcast)
+        return narrowed if narrowed.dtype != values.dtype else None
+
+    if pd.api.types.is_float_dtype(values):
+        if float_tolerance is None or values.dtype != "float64":
+            return None
+        narrowed = values.astype("float32")
+        with np.errstate(over="ignore", invalid="ignore"):
+            close = np.allclose(
+                narrowed.to_numpy(dtype="float64"),
+                values.to_numpy(),
+                rtol=float_tolerance,
+                atol=0.0,
+                equal_nan=True,
+            )
+        return narrowed if close else None
+
+    if pd.api.types.is_string_dtype(values) or values.dtype == object:
+        if len(values) == 0 or isinstance(values.dtype, pd.CategoricalDtype):
+            return None
+        if values.nunique(dropna=False) / len(values) > _CATEGORY_MAX_RATIO:
+            return None
+        return values.astype("category")
+
+    return None
+
+
+def compact_dataframe(
+    frame: object,
+    skip_cols: Optional[list] = None,
+    float_tolerance: Optional[float] = None,
+) -> list:
+    """Shrink column dtypes in place to reduce the written file size.
+
+    Integer columns are downcast to the smallest width that holds their range
+    (unsigned when non-negative); float64 columns become float32 when
+    ``float_tolerance`` is given and every value round-trips within that
+    relative tolerance; low-cardinality text columns become categoricals, which
+    parquet stores dictionary-encoded. Run it after :func:`normalize_dataframe`.
+
+    A column is narrowed when that shrinks it in memory. Its report gives
+    the bytes it takes written alone as zstd parquet before and after, which
+    can differ little: parquet stores 8 and 16-bit integers as 32-bit ones,
+    and dictionary-encodes repeated text either way.
+
+    Returns
+    -------
+    list[dict]
+        One entry per changed column: ``{"column", "from", "to", "before",
+        "after"}`` with its parquet byte sizes before and after.
+    """
+    skip = set(skip_cols or [])
+    savings = []
     for col in frame.columns:
         if col in skip:
             continue
-        # Leave already-numeric columns as they are (int/float/etc.).
-        if pd.api.types.is_numeric_dtype(frame[col]):
+        values = frame[col]
+        narrowed = _compact_column(values, float_tolerance)
+        if narrowed is None:
             continue
+        memory = [v.memory_usage(index=False, deep=True) for v in (values, narrowed)]
+        if memory[1] >= memory[0]:
+            continue
+        frame[col] = narrowed
+        savings.append(
+            {
+                "column": str(col),
+                "from": str(values.dtype),
+                "to": str(narrowed.dtype),
+                "before": _parquet_bytes(values),
+                "after": _parquet_bytes(narrowed),
+            }
+        )
+    return savings
 
-        numeric = pd.to_numeric(frame[col], errors="coerce")
-        if numeric.notna().all():
-            # All values parsed as numbers: prefer int when they are integral.
-            if (numeric == numeric.astype("int64")).all():
-                frame[col] = numeric.astype("int64")
-            else:
-                frame[col] = numeric.astype("float64")
-        else:
-            # Could not be made numeric; leave as text and flag for review.
-            text_cols.append(str(col))
 
-    return text_cols
+def _parquet_bytes(values: object) -> int:
+    """Bytes of the column ``values`` written alone as zstd parquet."""
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(values.to_frame(), preserve_index=False)
+    pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().size
+
+
+# Parquet writer settings used by convert_and_rename; callers override any
+# subset through ``parquet_options``. ``None`` keeps the pyarrow default.
+_PARQUET_DEFAULTS = {
+    "compression_level": None,
+    "row_group_size": None,
+    "data_page_size": None,
+    "use_dictionary": True,
+    "write_statistics": True,
+    "threads": None,
+}
+
+
+def write_parquet(frame: object, out_path: str, options: Optional[dict] = None) -> None:
+    """Write ``frame`` to ``out_path`` as zstd-compressed parquet.
+
+    ``options`` may set any key of ``_PARQUET_DEFAULTS``: the zstd
+    ``compression_level``, the ``row_group_size`` (rows) and ``data_page_size``
+    (bytes), ``use_dictionary``/``write_statistics`` and the number of
+    ``threads`` used to convert the frame to Arrow. Unknown keys raise
+    ``ValueError``.
+    """
+    # Lazy import: pyarrow is only needed when a file is actually written.
+    import pyarrow as pa  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+    unknown = set(options or {}) - set(_PARQUET_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown parquet option(s): {sorted(unknown)}")
+    opts = {**_PARQUET_DEFAULTS, **(options or {})}
+
+    table = pa.Table.from_pandas(frame, nthreads=opts.pop("threads"))
+    kwargs = {k: v for k, v in opts.items() if v is not None}
+    pq.write_table(table, out_path, compression="zstd", **kwargs)
+
+
+def _sort_by_time(frame: object, times: object) -> object:
+    """Return ``frame`` ordered by the parsed ``times`` (unparseable rows last)."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    order = times.reset_index(drop=True).sort_values(kind="stable").index
+    ordered = frame.iloc[order]
+    if isinstance(frame.index, pd.RangeIndex):
+        # A default index carries no information; keep it a plain range.
+        ordered = ordered.reset_index(drop=True)
+    return ordered
 
 
 def convert_and_rename(
@@ -680,8 +924,14 @@ def convert_and_rename(
     size: str = "",
     timestamp_col: Optional[str] = None,
     out_dir: Optional[str] = None,
+    compact: bool = False,
+    float_tolerance: Optional[float] = None,
+    savings: Optional[list] = None,
+    parquet_options: Optional[dict] = None,
+    sort_by_time: bool = False,
+    timestamp_format: Optional[str] = None,
 ) -> tuple[bool, str, list]:
-    # Mirrors rename_from_data plus an output directory.
+    # Mirrors rename_from_data plus an output directory and writer knobs.
     # pylint: disable=too-many-arguments,too-many-positional-arguments
     # pylint: disable=too-many-locals
     """Normalize a data file and write it as parquet + zstd with a convention name.
@@ -691,9 +941,17 @@ def convert_and_rename(
     the preferred ``.parquet.zst`` form, and writes the normalized DataFrame
     there. Returns ``(ok, out_path, object_columns)`` where ``object_columns``
     lists columns the user should review.
-    """
-    import pandas as pd  # pylint: disable=import-outside-toplevel
 
+    With ``compact`` the columns are additionally narrowed by
+    :func:`compact_dataframe` (``float_tolerance`` enables float64 -> float32);
+    its per-column report is appended to ``savings`` when a list is passed.
+
+    ``parquet_options`` tunes the writer (see :func:`write_parquet`; its
+    ``threads`` also sizes the type-inference pool) and ``sort_by_time`` orders
+    the rows by the timestamp column first, so the row-group statistics allow
+    downstream time-range pruning. ``timestamp_format`` is as for
+    :func:`rename_from_data`.
+    """
     if "_" in name:
         _logger.error("convert_and_rename, name must not contain '_': '%s'", name)
         return False, "", []
@@ -703,13 +961,23 @@ def convert_and_rename(
         _logger.error("convert_and_rename, '%s' has no rows", path)
         return False, "", []
 
-    col = _detect_timestamp_column(frame, timestamp_col)
-    times = pd.to_datetime(frame[col], errors="coerce", utc=True).dropna()
+    col, fmt = timestamps.detect(
+        frame, timestamp_col, timestamp_format=timestamp_format
+    )
+    parsed = timestamps.parse(frame[col], fmt)
+    times = parsed.dropna()
     if times.empty:
         _logger.error("convert_and_rename, no valid timestamps in '%s'", col)
         return False, "", []
 
-    object_cols = normalize_dataframe(frame, skip_cols=[col])
+    workers = (parquet_options or {}).get("threads")
+    object_cols = normalize_dataframe(frame, skip_cols=[col], workers=workers)
+    if compact:
+        report = compact_dataframe(
+            frame, skip_cols=[col], float_tolerance=float_tolerance
+        )
+        if savings is not None:
+            savings.extend(report)
 
     data = {
         "datatype": dtype,
@@ -726,5 +994,7 @@ def convert_and_rename(
 
     target_dir = out_dir if out_dir is not None else os.path.dirname(path)
     out_path = os.path.join(target_dir, new_name)
-    frame.to_parquet(out_path, compression="zstd")
+    if sort_by_time:
+        frame = _sort_by_time(frame, parsed)
+    write_parquet(frame, out_path, parquet_options)
     return True, out_path, object_cols
@@ -0,0 +1,138 @@
+"""Check that convention file names match the data they carry.
+
+A data file name encodes ``count``/``start``/``stop`` (see
+``src/namingconvention.md``). Nothing at upload time checks them against the
+contents, and a wrong name is only fixed later by deleting and re-uploading
+the file. :func:`verify_files` scans every candidate the way
+:func:`utils.rename_from_data` (metrics) or :func:`logscan.scan_log` (logs)
+does, compares the result with :func:`utils.parse_filename`, and stops at the
+first mismatch. Files are scanned in parallel worker processes, since the
+timestamp parsing is CPU-bound.
+"""
+
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional
+
+from . import logscan, timestamps, utils
+
+# Reuses utils' package-internal _read_dataframe rather than duplicating it.
+# pylint: disable=protected-access
+
+_logger = logging.getLogger("toolslib.verify")
+
+
+def _compare(meta: dict, count: int, start: str, stop: str) -> list:
+    """Return the fields of ``meta`` that disagree with the scanned values."""
+    problems = []
+    try:
+        named_count = int(meta["count"])
+    except ValueError:
+        named_count = None
+    if named_count != count:
+        problems.append(f"count {meta['count']} in name, {count} in data")
+    for field, scanned in (("start", start), ("stop", stop)):
+        named = utils.normalize_timestamp(meta[field])[1]
+        actual = utils.normalize_timestamp(scanned)[1]
+        if named != actual:
+            problems.append(f"{field} {named} in name, {actual or 'none'} in data")
+    return problems
+
+
+def verify_file(
+    path: str,
+    name: Optional[str] = None,
+    timestamp_col: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
+) -> list:
+    """Compare the convention fields of ``name`` with the contents of ``path``.
+
+    ``name`` defaults to the basename of ``path``. Names that do not follow
+    the convention (extra files) and metric files in formats that cannot be
+    read as a DataFrame are not checked.
+
+    Returns
+    -------
+    list[str]
+        One message per mismatching field; empty when the name is correct.
+    """
+    kind, meta = utils.parse_filename(name or os.path.basename(path))
+    if kind == "log":
+        scan = logscan.scan_log(path, timestamp_col)
+        return _compare(meta, scan["count"], scan["start"], scan["stop"])
+    if kind != "metric" or not utils.is_dataframe_format(path):
+        _logger.info("verify_file, not checking %s", path)
+        return []
+
+    frame = utils._read_dataframe(path)
+    if frame.empty:
+        return _compare(meta, 0, "", "")
+    col, fmt = timestamps.detect(
+        frame, timestamp_col, timestamp_format=timestamp_format
+    )
+    times = timestamps.parse(frame[col], fmt).dropna()
+    if times.empty:
+        return _compare(meta, len(frame), "", "")
+    return _compare(meta, len(frame), times.min().isoformat(), times.max().isoformat())
+
+
+def _verify_task(
+    path: str,
+    name: Optional[str],
+    timestamp_col: Optional[str],
+    timestamp_format: Optional[str],
+) -> list:
+    """Worker entry point: unreadable files are reported, not raised."""
+    try:
+        return verify_file(path, name, timestamp_col, timestamp_format)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Any read/parse failure means the name cannot be trusted either.
+        return [f"unreadable, {e}"]
+
+
+def verify_files(
+    paths: list,
+    names: Optional[dict] = None,
+    timestamp_col: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> dict:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """Verify ``paths`` in parallel, stopping at the first mismatch.
+
+    ``names`` optionally maps a path to the name it will be uploaded as
+    (when that is not its basename). ``workers`` processes scan the files
+    (default: CPU count; ``1`` scans in this process). Once a mismatch is
+    found, files not yet started are skipped.
+
+    Returns
+    -------
+    dict
+        ``{path: [messages]}`` for the files that failed; empty when all
+        checked names match their contents.
+    """
+    names = names or {}
+    args = [(p, names.get(p), timestamp_col, timestamp_format) for p in paths]
+    failed = {}
+
+    if (workers or os.cpu_count() or 1) <= 1 or len(paths) <= 1:
+        for arg in args:
+            problems = _verify_task(*arg)
+            if problems:
+                failed[arg[0]] = problems
+                break
+        return failed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_verify_task, *arg): arg[0] for arg in args}
+        while pending and not failed:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                problems = future.result()
+                if problems:
+                    failed[pending[future]] = problems
+                del pending[future]
+        for future in pending:
+            future.cancel()
+    return failed
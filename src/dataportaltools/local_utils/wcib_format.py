@@ -15,6 +15,15 @@ def print_created_dataset(j: dict) -> None:
     print(fmt.format(j.get("DatasetID", "-"), j.get("ContainerName", "-")))
 
 
+def print_uploads(uploads: dict) -> None:
+    """Print the table of uploaded source files and their destinations."""
+    fmt = "{:<50} | {:<50}"
+    print(fmt.format("Source", "Dest"))
+    print("-" * 51 + "+" + "-" * 61)
+    for src, dst in uploads.items():
+        print(fmt.format(src, dst))
+
+
 def print_datasets(datasets: list) -> None:
     """Print the table listing the user's datasets."""
     fmt = "{:>9} | {:>40} | {:>30} | {:>10} | {:>10}"
@@ -79,3 +88,44 @@ def print_files(file_groups: list) -> None:
 
     if num_files > 0:
         print(fmt.format(num_files, "", "", "", total_size, ""))
+
+
+def print_catalog(rows: list) -> None:
+    """Print the table of files recorded in the local catalog."""
+    fmt = "{:>9} | {:>6} | {:>24} | {:>24} | {:>32} | {}"
+    print(fmt.format("DatasetID", "FileID", "StartDate", "StopDate", "Hash", "Name"))
+    print("+".join("-" * n for n in (10, 8, 26, 26, 34, 23)))
+    for row in rows:
+        print(
+            fmt.format(
+                row["dataset"],
+                row["file_id"] or "n/a",
+                row["start"] or "n/a",
+                row["stop"] or "n/a",
+                row["hash"] or "n/a",
+                row["name"],
+            )
+        )
+
+
+def print_compaction(savings: list) -> None:
+    """Print the per-column parquet bytes reported by ``compact_dataframe``."""
+    fmt = "{:<30} | {:>10} | {:>10} | {:>18} | {:>18}"
+    print(fmt.format("Column", "From", "To", "Parquet before (B)", "Parquet after (B)"))
+    print("+".join("-" * n for n in (31, 12, 12, 20, 19)))
+    before = after = 0
+    for entry in savings:
+        print(
+            fmt.format(
+                entry["column"],
+                entry["from"],
+                entry["to"],
+                entry["before"],
+                entry["after"],
+            )
+        )
+        before += entry["before"]
+        after += entry["after"]
+    saved = before - after
+    pct = 100.0 * saved / before if before else 0.0
+    print(f"Total: {before} -> {after} parquet bytes, saved {saved} ({pct:.1f}%)")
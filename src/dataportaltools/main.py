@@ -2,26 +2,202 @@
 # flake8: noqa: ANN001
 """Command-line entry point for the WARA-Ops dataportaltools client."""
 
+# One Click command carries the whole documented CLI surface; its option
+# declarations alone are most of this module.
+# pylint: disable=too-many-lines
+
+import importlib
 import logging
 import os
 import sys
+from typing import Union
 
 import click
 
 try:
     # Normal case: installed/imported as part of the package.
     from .local_utils import config
-    from .local_utils import upload as up
+    from .local_utils import partition
+    from .local_utils import timestamps
     from .local_utils import utils
+    from .local_utils import wcib_format
 except ImportError:  # pragma: no cover - direct-script bootstrap fallback
     # Fallback: running this file directly (``python main.py``).
     from local_utils import config
-    from local_utils import upload as up
+    from local_utils import partition
+    from local_utils import timestamps
     from local_utils import utils
+    from local_utils import wcib_format
 
 
 _log = logging.getLogger("base")
 
+# Modules only some commands need, imported on first use: the HTTP client
+# pulls in requests (most of the CLI's startup time), the catalog sqlite3 and
+# xxhash, and the verifier multiprocessing. Maps the name used here to the
+# local_utils module.
+_LAZY_MODULES = {
+    "batch": "batch",
+    "catalog": "catalog",
+    "concurrency": "concurrency",
+    "daemon": "daemon",
+    "headtail": "headtail",
+    "logscan": "logscan",
+    "profiling": "profiling",
+    "tracing": "tracing",
+    "up": "upload",
+    "verify": "verify",
+}
+
+
+def _lazy(name: str) -> object:
+    """Import and return the command module known here as ``name``."""
+    module = globals().get(name)
+    if module is None:
+        package = f"{__package__}.local_utils" if __package__ else "local_utils"
+        module = importlib.import_module(f"{package}.{_LAZY_MODULES[name]}")
+        globals()[name] = module
+    return module
+
+
+def __getattr__(name: str) -> object:
+    """Resolve the lazily imported modules as attributes of this module."""
+    if name not in _LAZY_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _lazy(name)
+
+
+def _daemon_operation(opts: dict) -> Union[dict, None]:
+    """
+    The batch operation (see local_utils.batch) of the CLI options ``opts``
+
+    ``None`` for anything but an operation on the portal, and for invalid
+    option combinations, which are left to the regular checks.
+    """
+    op = None
+    if opts["setmeta"] is not None:
+        dataset = opts["upload"] if opts["upload"] is not None else opts["listfiles"]
+        if dataset is not None and (opts["tag"] or opts["poi"]):
+            op = {"op": "setmeta", "dataset": dataset, "file": opts["setmeta"]}
+    elif opts["createdataset"] is not None:
+        op = {
+            "op": "create",
+            "info": os.path.abspath(opts["createdataset"]),
+            "user": opts["user"],
+        }
+    elif opts["upload"] is not None:
+        op = {
+            "op": "upload",
+            "dataset": opts["upload"],
+            # The daemon resolves the paths from its own working directory.
+            "src": [os.path.abspath(s) for s in opts["src"]],
+            "extra": opts["extra_file"],
+            "prefix": opts["prefix"],
+        }
+        for key in ("kind", "start", "stop", "count", "dtype", "flag", "size"):
+            op[key] = opts[key]
+    elif opts["delete"] is not None:
+        op = {"op": "delete", "dataset": opts["delete"], "force": opts["force"]}
+    elif opts["listdataset"]:
+        op = {"op": "list"}
+    elif opts["listfiles"] is not None:
+        op = {"op": "list", "dataset": opts["listfiles"]}
+    if op is None:
+        return None
+
+    if opts["tag"]:
+        op["tags"] = list(opts["tag"])
+    if opts["poi"]:
+        op["poi"] = list(opts["poi"])
+    op["dryrun"] = opts["dryrun"]
+    return op
+
+
+# Options a daemon runs every operation with, by the parameter they set.
+_DAEMON_SETTINGS = {
+    "api": "api",
+    "token": "token",
+    "catalog": "catalog_path",
+    "workers": "workers",
+    "max-workers": "max_workers",
+    "compress": "compress",
+    "retries": "retries",
+    "small-lanes": "small_lanes",
+    "health-ttl": "health_ttl",
+    "lazy-connect": "lazy_connect",
+}
+
+# Options of the calling process only, which a daemon cannot honour.
+_LOCAL_OPTIONS = {
+    "trace_out": "--trace-out",
+    "profile": "--profile",
+    "profile_out": "--profile-out",
+}
+
+
+def _given(ctx: click.Context, param: str) -> bool:
+    """Whether ``param`` was given on the command line or in the environment."""
+    return ctx.get_parameter_source(param) not in (
+        click.core.ParameterSource.DEFAULT,
+        click.core.ParameterSource.DEFAULT_MAP,
+    )
+
+
+def _daemon_settings(ctx: click.Context, opts: dict, given_only: bool) -> dict:
+    """
+    The daemon settings (see local_utils.daemon) of the CLI options ``opts``
+
+    With ``given_only``, only those given on the command line or in the
+    environment: the defaults of a client ask nothing of the daemon.
+    """
+    settings = {}
+    for key, param in _DAEMON_SETTINGS.items():
+        if given_only and not _given(ctx, param):
+            continue
+        value = opts[param]
+        if key in ("token", "catalog") and value:
+            # The daemon resolves the paths from its own working directory.
+            value = os.path.abspath(value)
+        settings[key] = value
+    return settings
+
+
+def _forward_operation(
+    socket_path: str, opts: dict, settings: dict
+) -> Union[int, None]:
+    """
+    Runs the operation of ``opts`` on the daemon at ``socket_path``
+
+    Prints the result as the regular command does and returns the exit code,
+    or ``None`` when it is not an operation or no daemon is listening.
+    """
+    op = _daemon_operation(opts)
+    record = None if op is None else _lazy("daemon").call(socket_path, op, settings)
+    if record is None:
+        return None
+    if not record["ok"]:
+        print(f"Failed to execute: {record['error']}")
+        return 1
+
+    result = record["result"]
+    if op["op"] == "create":
+        wcib_format.print_created_dataset(result)
+    elif op["op"] == "upload":
+        wcib_format.print_uploads(result["files"])
+    elif op["op"] == "list" and "datasets" in result:
+        wcib_format.print_datasets(result["datasets"])
+    elif op["op"] == "list":
+        wcib_format.print_files([result["data"], result["extra"]])
+    return 0
+
+
+def _failure(e: Exception) -> str:
+    """The message reporting that an operation failed with ``e``."""
+    # Without the API test on connect, the first request finds it unreachable.
+    if isinstance(e, _lazy("up").WCIBConnectError):
+        return f"Failed to connect: {e}"
+    return f"Failed to execute: {e}"
+
 
 @click.command()
 @click.option(
@@ -153,16 +329,102 @@ _log = logging.getLogger("base")
     metavar="<file>",
     help="Derive a naming-convention filename from a data file (reads the data "
     "to get count/start/stop). Requires --name and --kind; use --dtype/--flag/"
-    "--size for the parts that cannot be inferred. Prints the new name; pass "
+    "--size for the parts that cannot be inferred. With --kind log a "
+    "(compressed) JSON/text log is streamed once to also derive the "
+    "uncompressed size. Prints the new name; pass "
     "--apply to also normalize column dtypes and rewrite the file as the "
     "preferred parquet+zstd form on disk.",
 )
-@click.option("--name", default="", metavar="<name>", help="Series name for --rename.")
+@click.option(
+    "--split",
+    default=None,
+    type=click.Path(exists=True),
+    metavar="<file>",
+    help="Split a data file (csv/parquet/pkl) into --window sized parquet+zstd "
+    "metric files named per the convention, next to the source. Requires "
+    "--name and --dtype; --tscol/--flag/--threads apply as for --rename.",
+)
+@click.option(
+    "--window",
+    default="hour",
+    type=click.Choice(sorted(partition.WINDOWS)),
+    help="Time window of each file written by --split.",
+)
+@click.option(
+    "--merge/--no-merge",
+    default=False,
+    help="Merge the small convention-named metric files given by --src into "
+    "fewer parquet+zstd files of up to --target-size, one series "
+    "(name/type/flag) and contiguous time range (see --max-gap) each. Count/start/stop are "
+    "recomputed from the merged rows. Use before --upload to cut the number "
+    "of uploads.",
+)
+@click.option(
+    "--target-size",
+    "target_size",
+    default="64MB",
+    show_default=True,
+    metavar="<size>",
+    help="With --merge, maximum summed size of the files merged into one, "
+    "e.g. 64MB or 1G.",
+)
+@click.option(
+    "--max-gap",
+    "max_gap",
+    default="5min",
+    show_default=True,
+    metavar="<duration>",
+    help="With --merge, longest gap in time between two files merged into "
+    "one, e.g. 90s, 5min or 1h. A longer gap starts a new merged file.",
+)
+@click.option(
+    "--remove-merged/--keep-merged",
+    "remove_merged",
+    default=False,
+    help="With --merge, delete the source files once merged (default: keep).",
+)
+@click.option(
+    "--name", default="", metavar="<name>", help="Series name for --rename/--split."
+)
 @click.option(
     "--tscol",
     default=None,
     metavar="<column>",
-    help="Timestamp column for --rename (auto-detected when omitted).",
+    help="Timestamp column for --rename, or the JSON key for --kind log "
+    "(auto-detected when omitted).",
+)
+@click.option(
+    "--tsformat",
+    default=None,
+    metavar="<format>",
+    help="strftime format of the timestamp column (e.g. '%d/%m/%Y %H:%M:%S', "
+    "or ISO8601) for --rename/--split/--merge. Inferred from a sample when "
+    "omitted.",
+)
+@click.option(
+    "--epoch-unit",
+    "epoch_unit",
+    default=None,
+    type=click.Choice(sorted(timestamps.EPOCH_UNITS)),
+    help="The timestamp column holds epoch numbers in this unit (instead of "
+    "--tsformat). Inferred from the magnitude when omitted.",
+)
+@click.option(
+    "--sorted",
+    "sorted_rows",
+    is_flag=True,
+    default=False,
+    help="With --rename, trust that the rows are in time order: count/start/"
+    "stop come from a newline count (or parquet metadata) and the first and "
+    "last rows only.",
+)
+@click.option(
+    "--check-sorted",
+    "check_sorted",
+    is_flag=True,
+    default=False,
+    help="Like --sorted, but first check on a sample of rows that the "
+    "timestamps are in order; falls back to a full scan when they are not.",
 )
 @click.option(
     "--apply/--no-apply",
@@ -171,6 +433,115 @@ _log = logging.getLogger("base")
     "columns int->float->text) named per the convention; warns about columns "
     "left as text. Without it, only the suggested name is printed.",
 )
+@click.option(
+    "--compact/--no-compact",
+    default=False,
+    help="With --rename --apply, also shrink column types: downcast integers "
+    "to the smallest safe width and store low-cardinality text as dictionary "
+    "(categorical) columns. Prints the per-column and total savings, in bytes "
+    "of each column written alone as parquet+zstd.",
+)
+@click.option(
+    "--float-tolerance",
+    "float_tolerance",
+    default=None,
+    type=float,
+    metavar="<rel tol>",
+    help="With --compact, store float64 columns as float32 when every value "
+    "round-trips within this relative tolerance (e.g. 1e-6).",
+)
+@click.option(
+    "--zstd-level",
+    "zstd_level",
+    default=None,
+    type=click.IntRange(1, 22),
+    metavar="<1-22>",
+    help="With --apply, zstd compression level of the parquet file, and with "
+    "--compress zstd of the uploaded files (higher is smaller but slower to "
+    "write).",
+)
+@click.option(
+    "--row-group-size",
+    "row_group_size",
+    default=None,
+    type=click.IntRange(min=1),
+    metavar="<rows>",
+    help="With --apply, maximum number of rows per parquet row group.",
+)
+@click.option(
+    "--page-size",
+    "page_size",
+    default=None,
+    type=click.IntRange(min=1),
+    metavar="<bytes>",
+    help="With --apply, target parquet data page size in bytes.",
+)
+@click.option(
+    "--dictionary/--no-dictionary",
+    default=True,
+    help="With --apply, dictionary-encode parquet columns (default on).",
+)
+@click.option(
+    "--statistics/--no-statistics",
+    default=True,
+    help="With --apply, write parquet min/max column statistics (default on).",
+)
+@click.option(
+    "--sort-by-time/--no-sort-by-time",
+    "sort_by_time",
+    default=False,
+    help="With --apply, sort rows by the timestamp column before writing so "
+    "row-group statistics allow time-range pruning downstream.",
+)
+@click.option(
+    "--threads",
+    default=None,
+    type=click.IntRange(min=1),
+    metavar="<n>",
+    help="With --apply, worker threads for column type inference and the "
+    "parquet conversion; with --split/--merge, parallel file writers "
+    "(default: CPU count).",
+)
+@click.option(
+    "--verify-content",
+    "verify_content",
+    is_flag=True,
+    default=False,
+    help="With --upload, first check that the count/start/stop in each data "
+    "file name match the file contents (files are scanned in parallel, "
+    "--threads processes). Nothing is uploaded if any name is wrong.",
+)
+@click.option(
+    "--catalog",
+    "catalog_path",
+    default=None,
+    envvar="PORTAL_CATALOG",
+    show_envvar=True,
+    type=click.Path(dir_okay=False),
+    metavar="<file>",
+    help="Local SQLite catalog (created if missing). Uploads and --listfiles "
+    "record the files of each dataset in it, and --upload skips files whose "
+    "content (xxh128) the dataset is known to have.",
+)
+@click.option(
+    "--catalog-query",
+    "catalog_query",
+    is_flag=True,
+    default=False,
+    help="Print the files recorded in the --catalog, without contacting the "
+    "portal. Filters: the dataset of --upload/--listfiles <id>, --src files "
+    "(by content), --name (substring) and --start/--stop (overlapping time "
+    "range). Exits 1 when nothing matches.",
+)
+@click.option(
+    "--batch",
+    default=None,
+    type=click.File("r"),
+    metavar="<file|->",
+    help="Run the operations of a JSON-lines script (create, upload, setmeta, "
+    "list, delete; '-' reads stdin) over one connection, printing one JSON "
+    "result line per operation. Exits 1 if any operation failed.",
+)
 @click.option(
     "--verbose",
     "-v",
@@ -179,6 +550,133 @@ _log = logging.getLogger("base")
     "only warnings/errors. The PORTAL_LOG_LEVEL env var sets a level when no "
     "-v is given.",
 )
+@click.option(
+    "--log-format",
+    default="text",
+    show_default=True,
+    envvar="PORTAL_LOG_FORMAT",
+    type=click.Choice(["text", "json"]),
+    help="Format of the log records on stderr; json writes one object per "
+    "record, with request and response bodies embedded as data.",
+)
+@click.option(
+    "--health-ttl",
+    default=300.0,
+    type=float,
+    show_default=True,
+    envvar="PORTAL_HEALTH_TTL",
+    metavar="<seconds>",
+    help="Skip the API test on connect when it passed (in any process) less "
+    "than this long ago; 0 always tests. Kept in "
+    "$XDG_CACHE_HOME/dataportaltools/health.json.",
+)
+@click.option(
+    "--lazy-connect",
+    is_flag=True,
+    default=False,
+    envvar="PORTAL_LAZY_CONNECT",
+    help="Never test the API on connect; the first request checks it, and an "
+    "unreachable API still fails with 'Failed to connect'.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    envvar="PORTAL_WORKERS",
+    type=click.IntRange(min=1),
+    metavar="<n>",
+    help="Upload files concurrently, starting with <n> requests in flight. "
+    "These adapt to the portal: they halve on 429/503 answers or a rising p95 "
+    "latency, and grow by one while latency and throughput hold, up to "
+    "--max-workers.",
+)
+@click.option(
+    "--max-workers",
+    default=None,
+    envvar="PORTAL_MAX_WORKERS",
+    type=click.IntRange(min=1),
+    metavar="<n>",
+    help="Upload up to <n> files at once: the most requests in flight the "
+    "adaptive limit grows to (default 4 times --workers).",
+)
+@click.option(
+    "--compress",
+    default=None,
+    type=click.Choice(["zstd"]),
+    help="Compress data files that are not compressed yet (e.g. plain .csv or "
+    ".json) while they upload, without a compressed copy on disk. The name "
+    "gets the compression suffix, and the size and Idempotency-Key are those "
+    "of the compressed bytes.",
+)
+@click.option(
+    "--small-lanes",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    metavar="<n>",
+    help="Reserve <n> of the --workers for small files, so these keep moving "
+    "while the other workers upload huge ones. Files are otherwise uploaded "
+    "largest first.",
+)
+@click.option(
+    "--retries",
+    default=3,
+    show_default=True,
+    type=click.IntRange(min=0),
+    metavar="<n>",
+    help="Send a request answered with 429 or 503 again up to <n> times, "
+    "after its Retry-After or an exponential backoff.",
+)
+@click.option(
+    "--trace-out",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    metavar="<file>",
+    help="Time every API request (connect, send, wait for the response, "
+    "receive) and write them on exit as JSON lines with per-route aggregates "
+    "(p50/p95/p99 latency, MB/s), or as OpenMetrics text when <file> ends "
+    "with .prom or .om.",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=click.Choice(["cpu", "mem"]),
+    help="Profile the command: cpu (cProfile) saves a pstats file, mem "
+    "(tracemalloc) the allocations near the peak; a summary goes to stderr.",
+)
+@click.option(
+    "--profile-out",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+    metavar="<file>",
+    help="File the --profile is saved to [default: dataportaltools.pstats "
+    "or dataportaltools.tracemalloc].",
+)
+@click.option(
+    "--profile-top",
+    default=20,
+    show_default=True,
+    type=click.IntRange(min=1),
+    metavar="<n>",
+    help="Functions or allocation sites listed in the --profile summary.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    envvar="PORTAL_SOCKET",
+    metavar="<path>",
+    help="Unix socket of a --daemon. When a daemon listens on it, operations "
+    "(and --batch scripts) are forwarded to it instead of connecting to the "
+    "portal. Can also be set with the PORTAL_SOCKET env var.",
+)
+@click.option(
+    "--daemon",
+    is_flag=True,
+    default=False,
+    help="Connect once and serve --batch style operations on the --socket "
+    "until interrupted, keeping the session and dataset listings warm.",
+)
 @click.pass_context
 def main(
     ctx,
@@ -206,10 +704,47 @@ def main(
     poi,
     setmeta,
     rename,
+    split,
+    window,
+    merge,
+    target_size,
+    max_gap,
+    remove_merged,
     name,
     tscol,
+    tsformat,
+    epoch_unit,
+    sorted_rows,
+    check_sorted,
     apply,
+    compact,
+    float_tolerance,
+    zstd_level,
+    row_group_size,
+    page_size,
+    dictionary,
+    statistics,
+    sort_by_time,
+    threads,
+    verify_content,
+    catalog_path,
+    catalog_query,
+    batch,
+    health_ttl,
+    lazy_connect,
+    workers,
+    max_workers,
+    compress,
+    small_lanes,
+    retries,
+    trace_out,
+    profile,
+    profile_out,
+    profile_top,
+    socket_path,
+    daemon,
     verbose,
+    log_format,
 ) -> None:
     # This is a Click command exposing the full CLI surface, so the large
     # number of options/branches maps directly onto the documented commands.
@@ -217,12 +752,81 @@ def main(
     # pylint: disable=too-many-locals,too-many-branches,too-many-statements
     """Dispatch a single dataportal operation based on the given options."""
 
-    utils.configure_logging(verbose)
+    utils.configure_logging(verbose, log_format)
+
+    # Profile everything dispatched below, offline operations included; the
+    # summary is written when the context closes, after any other cleanup.
+    if profile is not None:
+        ctx.call_on_close(_lazy("profiling").start(profile, profile_out, profile_top))
 
     # --prefix only makes sense for an extra-file upload.
     if prefix and not extra_file:
         raise click.UsageError("--prefix requires --extra-file/-e")
 
+    # Column shrinking only applies to the file --rename --apply writes.
+    if compact and (rename is None or not apply):
+        raise click.UsageError("--compact requires --rename and --apply")
+    if float_tolerance is not None and not compact:
+        raise click.UsageError("--float-tolerance requires --compact")
+
+    if tsformat is not None and epoch_unit is not None:
+        raise click.UsageError("--tsformat and --epoch-unit are mutually exclusive")
+    timestamp_format = epoch_unit if epoch_unit is not None else tsformat
+
+    if max_workers is None:
+        max_workers = _lazy("concurrency").CEILING_FACTOR * workers
+    elif max_workers < workers:
+        raise click.UsageError("--max-workers must be at least --workers")
+
+    # Offline operation: split a dump into convention-named time windows.
+    if split is not None:
+        if not name or not dtype:
+            raise click.UsageError("--split requires --name and --dtype")
+        ok, out_paths = partition.split_file(
+            split,
+            name=name,
+            dtype=dtype,
+            flag=flag or "raw",
+            window=window,
+            timestamp_col=tscol,
+            workers=threads,
+            timestamp_format=timestamp_format,
+        )
+        for out_path in out_paths:
+            print(out_path)
+        if not ok:
+            print("Failed to split the file (see log for details)")
+            ctx.exit(1)
+        ctx.exit(0)
+
+    # Offline operation: merge small convention files into larger windows.
+    if merge:
+        if not src:
+            raise click.UsageError("--merge requires --src")
+        try:
+            target_bytes = partition.parse_size(target_size)
+            gap = partition.parse_duration(max_gap)
+        except ValueError as e:
+            raise click.UsageError(str(e)) from e
+        paths = [f for f in utils.get_all_src_files(list(src)) if os.path.isfile(f)]
+        ok, merged = partition.merge_files(
+            paths,
+            target_bytes,
+            timestamp_col=tscol,
+            remove_sources=remove_merged,
+            workers=threads,
+            timestamp_format=timestamp_format,
+            max_gap=gap,
+        )
+        for out_path, sources in merged.items():
+            print(f"{out_path} ({len(sources)} files)")
+        if not merged:
+            print("Nothing to merge")
+        if not ok:
+            print("Failed to merge some files (see log for details)")
+            ctx.exit(1)
+        ctx.exit(0)
+
     # Offline operation: derive a naming-convention filename from a data file.
     # Handled before connecting since it does not touch the API.
     if rename is not None:
@@ -230,6 +834,7 @@ def main(
             raise click.UsageError("--rename requires --name and --kind")
         if apply:
             # Normalize column dtypes and write the preferred parquet+zstd form.
+            savings = []
             ok, out_path, review = utils.convert_and_rename(
                 rename,
                 name=name,
@@ -238,10 +843,25 @@ def main(
                 flag=flag or "raw",
                 size=size,
                 timestamp_col=tscol,
+                compact=compact,
+                float_tolerance=float_tolerance,
+                savings=savings,
+                parquet_options={
+                    "compression_level": zstd_level,
+                    "row_group_size": row_group_size,
+                    "data_page_size": page_size,
+                    "use_dictionary": dictionary,
+                    "write_statistics": statistics,
+                    "threads": threads,
+                },
+                sort_by_time=sort_by_time,
+                timestamp_format=timestamp_format,
             )
             if not ok:
                 print("Failed to convert/rename the file (see log for details)")
                 ctx.exit(1)
+            if compact:
+                wcib_format.print_compaction(savings)
             if review:
                 print(
                     "Review: could not infer a numeric type for column(s): "
@@ -249,6 +869,37 @@ def main(
                     + " (left as text)"
                 )
             print(out_path)
+        elif kind == "log" and not utils.is_dataframe_format(rename):
+            # Plain/compressed log lines: stream once for count/size/times.
+            ok, new_name = _lazy("logscan").rename_log(
+                rename,
+                name=name,
+                dtype=dtype,
+                flag=flag or "raw",
+                size=size,
+                timestamp_key=tscol,
+            )
+            if not ok:
+                print("Failed to build a name from the data (see log for details)")
+                ctx.exit(1)
+            print(new_name)
+        elif sorted_rows or check_sorted:
+            # Time-ordered data: name it from the first and last rows only.
+            ok, new_name = _lazy("headtail").rename_sorted(
+                rename,
+                name=name,
+                kind=kind,
+                dtype=dtype,
+                flag=flag or "raw",
+                size=size,
+                timestamp_col=tscol,
+                timestamp_format=timestamp_format,
+                check=not sorted_rows,
+            )
+            if not ok:
+                print("Failed to build a name from the data (see log for details)")
+                ctx.exit(1)
+            print(new_name)
         else:
             ok, new_name = utils.rename_from_data(
                 rename,
@@ -258,6 +909,7 @@ def main(
                 flag=flag or "raw",
                 size=size,
                 timestamp_col=tscol,
+                timestamp_format=timestamp_format,
             )
             if not ok:
                 print("Failed to build a name from the data (see log for details)")
@@ -265,16 +917,124 @@ def main(
             print(new_name)
         ctx.exit(0)
 
+    # Offline operation: answer from the local catalog.
+    if catalog_query:
+        catalog = _lazy("catalog")
+        if catalog_path is None:
+            raise click.UsageError("--catalog-query requires --catalog")
+        dataset_arg = upload if upload is not None else listfiles
+        try:
+            datasetid = int(dataset_arg) if dataset_arg is not None else None
+        except ValueError as e:
+            raise click.UsageError(f"Invalid dataset id '{dataset_arg}'") from e
+        digests = [None]
+        if src:
+            paths = [f for f in utils.get_all_src_files(list(src)) if os.path.isfile(f)]
+            digests = [catalog.content_hash(f) for f in paths]
+        rows = []
+        with catalog.Catalog(catalog_path) as db:
+            for digest in digests:
+                rows.extend(
+                    db.query(
+                        datasetid,
+                        name or None,
+                        digest,
+                        start or None,
+                        stop or None,
+                        api=api,
+                    )
+                )
+        wcib_format.print_catalog(rows)
+        ctx.exit(0 if rows else 1)
+
+    # Preflight: check names against contents before anything is sent.
+    if verify_content and upload is not None and not extra_file:
+        paths = [f for f in utils.get_all_src_files(list(src)) if os.path.isfile(f)]
+        names = {}
+        if len(paths) == 1:
+            # A single file may be uploaded under a name built from the options.
+            data = {
+                "datatype": dtype,
+                "dataflag": flag,
+                "start": start,
+                "stop": stop,
+                "count": count,
+                "size": size,
+            }
+            named, long_name = utils.create_filename(
+                data, os.path.basename(paths[0]), kind
+            )
+            if named:
+                names[paths[0]] = long_name
+        failed = _lazy("verify").verify_files(
+            paths,
+            names,
+            timestamp_col=tscol,
+            timestamp_format=timestamp_format,
+            workers=threads,
+        )
+        for path, problems in failed.items():
+            print(f"Name does not match contents: {path}: " + "; ".join(problems))
+        if failed:
+            ctx.exit(1)
+
     config.set_conf(locals())
     _log.debug("config %s", config.get())
 
+    if daemon and socket_path is None:
+        raise click.UsageError("--daemon requires --socket (or PORTAL_SOCKET)")
+
+    # Hand the operation to a running daemon, skipping the connection setup.
+    if socket_path is not None and not daemon:
+        local = [flag for param, flag in _LOCAL_OPTIONS.items() if _given(ctx, param)]
+        forwarded = batch is not None or _daemon_operation(config.get()) is not None
+        if local and forwarded and _lazy("daemon").listening(socket_path):
+            raise click.UsageError(
+                f"{', '.join(local)} cannot be used while a daemon listens on "
+                f"{socket_path}: the command runs in the daemon"
+            )
+        settings = _daemon_settings(ctx, config.get(), given_only=True)
+        try:
+            if batch is not None:
+                lines = _lazy("daemon").absolute_paths(batch)
+                ret = _lazy("daemon").forward(socket_path, lines, sys.stdout, settings)
+            else:
+                ret = _forward_operation(socket_path, config.get(), settings)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # CLI boundary: surface any daemon failure as a non-zero exit.
+            print(f"Failed to execute: {e}")
+            ret = 1
+        if ret is not None:
+            ctx.exit(ret)
+
     ok = True
     # A token file passed via -t takes precedence; otherwise fall back to the
     # token value in the PORTAL_TOKEN environment variable.
     env_token = os.environ.get("PORTAL_TOKEN", "")
-    wc = up.WCIBConnection(api, tokenfile=token, token="" if token else env_token)
+    db = None
+    if catalog_path is not None:
+        db = _lazy("catalog").Catalog(catalog_path)
+        ctx.call_on_close(db.close)
+    tracer = None
+    if trace_out is not None:
+        tracer = _lazy("tracing").Tracer()
+        ctx.call_on_close(lambda: tracer.write(trace_out))
+    wc = _lazy("up").WCIBConnection(
+        api,
+        tokenfile=token,
+        token="" if token else env_token,
+        catalog=db,
+        health_ttl=health_ttl,
+        tracer=tracer,
+        workers=workers,
+        max_workers=max_workers,
+        retries=retries,
+        small_lanes=small_lanes,
+        compress=compress,
+        compress_level=zstd_level,
+    )
     try:
-        wc.connect()
+        wc.connect(lazy=lazy_connect)
     except Exception as e:  # pylint: disable=broad-exception-caught
         # Top-level CLI boundary: report any failure and exit non-zero.
         print(f"Failed to connect: {e}")
@@ -286,6 +1046,19 @@ def main(
     # if api != "http://127.0.0.1:3001/v1":
     #    return 1
 
+    if batch is not None:
+        ctx.exit(_lazy("batch").run(wc, batch, sys.stdout, dryrun))
+
+    if daemon:
+        try:
+            settings = _daemon_settings(ctx, config.get(), given_only=False)
+            _lazy("daemon").serve(wc, socket_path, dryrun, settings)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # CLI boundary: surface any daemon failure as a non-zero exit.
+            print(_failure(e))
+            ctx.exit(1)
+        ctx.exit(0)
+
     ret = 0
 
     # Parse annotation flags. ``None`` means "not provided" so existing
@@ -339,7 +1112,7 @@ def main(
             wc.set_file_metadata(datasetid, setmeta, tags, pois, dryrun)
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -349,7 +1122,7 @@ def main(
             ret = wc.create_dataset(createdataset, user, dryrun)
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -381,7 +1154,7 @@ def main(
                 ret = 1
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -392,7 +1165,7 @@ def main(
             ret = wc.delete(datasetid, force, dryrun)
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -402,7 +1175,7 @@ def main(
             ret = wc.list_datasets(dryrun)
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -413,7 +1186,7 @@ def main(
             ret = wc.list_files(datasetid, dryrun)
         except Exception as e:  # pylint: disable=broad-exception-caught
             # CLI boundary: surface any operation failure as a non-zero exit.
-            print(f"Failed to execute: {e}")
+            print(_failure(e))
             ret = 1
 
         ctx.exit(ret)
@@ -0,0 +1,129 @@
+"""Tests for dataportaltools.local_utils.batch."""
+
+import io
+import json
+from unittest.mock import MagicMock
+
+import requests
+
+from dataportaltools.local_utils import batch
+
+
+def _run(wc, *lines, dryrun=False):
+    out = io.StringIO()
+    ret = batch.run(wc, [*lines], out, dryrun)
+    return ret, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_run_streams_one_result_per_operation(tmp_path):
+    wc = MagicMock()
+    wc.new_dataset.return_value = {"DatasetID": 7}
+    wc.datasets.return_value = [{"DatasetID": 7}]
+    wc._list_files.side_effect = [[{"FileID": 1}], []]
+    wc.delete.return_value = 0
+    ret, results = _run(
+        wc,
+        '{"op": "create", "info": "info.txt", "user": "u", "id": "a"}',
+        "",
+        "# comment",
+        '{"op": "list"}',
+        '{"op": "list", "dataset": "7"}',
+        '{"op": "delete", "dataset": 7, "force": true, "dryrun": true}',
+    )
+    assert ret == 0
+    assert [(r["line"], r["op"], r["ok"]) for r in results] == [
+        (1, "create", True),
+        (4, "list", True),
+        (5, "list", True),
+        (6, "delete", True),
+    ]
+    assert results[0]["id"] == "a"
+    assert results[0]["result"] == {"DatasetID": 7}
+    assert results[1]["result"] == {"datasets": [{"DatasetID": 7}]}
+    assert results[2]["result"] == {"data": [{"FileID": 1}], "extra": []}
+    wc.new_dataset.assert_called_once_with("info.txt", "u", False)
+    # A per-operation dryrun overrides the batch one.
+    wc.delete.assert_called_once_with(7, True, True)
+
+
+def test_upload_and_setmeta(tmp_path):
+    wc = MagicMock()
+    wc.upload_files.return_value = (0, {"a.csv": "metrics/a.csv"})
+    wc.set_file_metadata.return_value = {"fileId": 3}
+    ret, results = _run(
+        wc,
+        '{"op": "upload", "dataset": 7, "src": "a.csv", "kind": "metric", '
+        '"count": 3, "tags": ["x"], "poi": ["1704067200,1704067260,a, b"]}',
+        '{"op": "setmeta", "dataset": 7, "file": 3, '
+        '"poi": [{"start": "2024-01-01T00:00:00", "stop": "2024-01-01T00:01:00"}]}',
+        dryrun=True,
+    )
+    assert ret == 0
+    assert results[0]["result"] == {"files": {"a.csv": "metrics/a.csv"}}
+    poi = {"start": "2024-01-01T00:00:00Z", "stop": "2024-01-01T00:01:00Z"}
+    datasetid, src, data, prefix, kind, dryrun, tags, pois, extra = (
+        wc.upload_files.call_args.args
+    )
+    assert (datasetid, src, prefix, kind, dryrun, tags, extra) == (
+        7,
+        ["a.csv"],
+        "",
+        "metric",
+        True,
+        ["x"],
+        False,
+    )
+    assert data["count"] == 3 and data["datatype"] == ""
+    assert pois == [poi | {"text": "a, b"}]
+    wc.set_file_metadata.assert_called_once_with(7, 3, None, [poi | {"text": ""}], True)
+
+
+def test_failures_are_reported_and_the_batch_goes_on(tmp_path, mocker):
+    wc = MagicMock()
+
+    def upload_files(*args, **kwargs):
+        batch.upload._logger.error("upload failed for %s", "a.csv")
+        return 1, {}
+
+    wc.upload_files.side_effect = upload_files
+    wc.datasets.return_value = None
+    response = MagicMock(text="no such dataset")
+    wc.delete.side_effect = requests.exceptions.HTTPError("404", response=response)
+    mocker.patch.object(
+        batch.utils, "get_all_src_files", return_value=["a.csv", "b.csv"]
+    )
+    ret, results = _run(
+        wc,
+        "not json",
+        '["create"]',
+        '{"op": "rename"}',
+        '{"op": "create"}',
+        '{"op": "delete", "dataset": "x"}',
+        '{"op": "delete", "dataset": 9}',
+        '{"op": "upload", "dataset": 7, "src": ["*.csv"]}',
+        '{"op": "upload", "dataset": 7, "src": ["*.csv"], "poi": ["1704067200,1704067260,c"]}',
+        '{"op": "upload", "dataset": 7, "src": "a.csv", "poi": ["a,b,c"]}',
+        '{"op": "upload", "dataset": 7, "src": "a.csv", "poi": ["a,b"]}',
+        '{"op": "upload", "dataset": 7, "src": "a.csv", "poi": "a,b,c"}',
+        '{"op": "upload", "dataset": 7, "src": "a.csv", "tags": "x"}',
+        '{"op": "setmeta", "dataset": 7, "file": 3}',
+        '{"op": "setmeta", "dataset": 7, "file": 3, "poi": [{"start": 1}]}',
+        '{"op": "list"}',
+    )
+    assert ret == 1
+    assert [r["ok"] for r in results] == [False] * 15
+    errors = [r["error"] for r in results]
+    assert errors[0].startswith("Expecting value")
+    assert "unknown operation" in errors[1] and "unknown operation" in errors[2]
+    assert errors[3] == "'create' needs 'info'"
+    assert errors[4] == "invalid dataset id 'x'"
+    assert errors[5] == "404 | server said: no such dataset"
+    assert errors[6] == "upload failed for a.csv"
+    assert "multi-file" in errors[7]
+    assert "valid timestamps" in errors[8]
+    assert "expected 'start,stop,text'" in errors[9]
+    assert errors[10] == "'poi' must be a list"
+    assert errors[11] == "'tags' must be a list"
+    assert "needs 'tags' and/or 'poi'" in errors[12]
+    assert errors[13].startswith("invalid poi")
+    assert results[14]["result"] == {"datasets": None}
@@ -0,0 +1,148 @@
+"""Tests for dataportaltools.local_utils.catalog."""
+
+import sqlite3
+import threading
+
+import pytest
+import xxhash
+
+from dataportaltools.local_utils import catalog
+
+
+@pytest.fixture
+def db(tmp_path):
+    with catalog.Catalog(str(tmp_path / "catalog.db")) as cat:
+        yield cat
+
+
+def _upload(db, dataset=1, name="a.csv", digest="h1", start="2024-01-01T00:00:00Z"):
+    db.record_upload(
+        dataset,
+        name,
+        name,
+        digest,
+        10,
+        {"start": start, "stop": "2024-01-01T01:00:00Z", "count": 3},
+        {"fileId": 5, "path": f"metrics/{name}", "status": "READY"},
+    )
+
+
+def test_content_hash(tmp_path):
+    f = tmp_path / "f.bin"
+    f.write_bytes(b"x" * 3_000_000)
+    assert catalog.content_hash(str(f)) == xxhash.xxh128(f.read_bytes()).hexdigest()
+
+
+def test_find_upload_is_per_dataset(db):
+    _upload(db)
+    assert db.find_upload(1, "h1") == {
+        "fileId": 5,
+        "path": "metrics/a.csv",
+        "status": "READY",
+    }
+    assert db.find_upload(2, "h1") is None
+    assert db.find_upload(1, "h2") is None
+
+
+def test_find_upload_is_per_portal_and_file_kind(db):
+    db.record_upload(1, "a", "a", "h1", 1, {}, {"fileId": 5}, api="https://p1")
+    db.record_upload(1, "b", "b", "h2", 1, {}, {"fileId": 6}, True, "https://p1")
+    assert db.find_upload(1, "h1", "https://p1")["fileId"] == 5
+    assert db.find_upload(1, "h1", "https://p2") is None
+    assert db.find_upload(1, "h1", "https://p1", extra=True) is None
+    assert db.find_upload(1, "h2", "https://p1", extra=True)["fileId"] == 6
+    # A listing or deletion on one portal leaves the other's rows alone.
+    db.record_upload(1, "a", "a", "h1", 1, {}, {"fileId": 7}, api="https://p2")
+    db.record_listing(1, [], extra=False, api="https://p2")
+    db.forget(1, "https://p2")
+    assert [r["file_id"] for r in db.query()] == [5, 6]
+
+
+def test_catalog_without_api_key_is_migrated(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    old = sqlite3.connect(path)
+    old.executescript(
+        catalog._SCHEMA.replace("    api TEXT NOT NULL DEFAULT '',\n", "").replace(
+            "UNIQUE (api, dataset", "UNIQUE (dataset"
+        )
+    )
+    old.execute(
+        "INSERT INTO files (dataset, name, hash, extra, recorded) "
+        "VALUES (1, 'a.csv', 'h1', 0, 'now')"
+    )
+    old.commit()
+    old.close()
+    with catalog.Catalog(path) as db:
+        [row] = db.query()
+        assert (row["api"], row["name"], row["hash"]) == ("", "a.csv", "h1")
+        # Old rows name no portal, so they never skip an upload.
+        assert db.find_upload(1, "h1", "https://p1") is None
+        db.record_upload(1, "a.csv", "a.csv", "h1", 1, {}, {}, api="https://p1")
+        assert len(db.query()) == 2
+
+
+def test_listing_keeps_uploaded_hash_and_forgets_missing_files(db):
+    _upload(db, name="a.csv", digest="h1")
+    _upload(db, name="b.csv", digest="h2")
+    entry = {
+        "FileID": 8,
+        "MFileName": "a.csv",
+        "StartDate": "2024-01-01T00:00:00.000Z",
+        "StopDate": "2024-01-01T01:00:00.000Z",
+        "MetricEntries": 3,
+        "FileSize": 10,
+    }
+    db.record_listing(1, [entry], extra=False)
+
+    rows = db.query(datasetid=1)
+    assert [r["name"] for r in rows] == ["a.csv"]
+    assert rows[0]["file_id"] == 8
+    assert rows[0]["hash"] == "h1"
+    # Listed and uploaded timestamps are stored in one sortable form.
+    assert rows[0]["start"] == "2024-01-01T00:00:00.000Z"
+    assert db.find_upload(1, "h2") is None
+
+
+def test_query_filters(db):
+    _upload(db, dataset=1, name="cpu_a.csv", digest="h1", start="2024-01-01T00:00:00")
+    _upload(db, dataset=1, name="mem_b.csv", digest="h2", start="2024-01-01T00:30:00")
+    _upload(db, dataset=2, name="cpu_c.csv", digest="h3", start="1704067200")
+
+    assert len(db.query()) == 3
+    assert [r["name"] for r in db.query(name="cpu")] == ["cpu_a.csv", "cpu_c.csv"]
+    assert [r["name"] for r in db.query(digest="h2")] == ["mem_b.csv"]
+    # Overlap with [00:20:00.5, 00:25:00]: only files starting before it.
+    rows = db.query(start="2024-01-01T00:20:00.500", stop="2024-01-01T00:25:00Z")
+    assert [r["name"] for r in rows] == ["cpu_a.csv", "cpu_c.csv"]
+    assert db.query(stop="2023-12-31T00:00:00") == []
+    # Unparseable bounds are compared as they are.
+    assert db.query(start="bogus") == []
+
+
+def test_forget(db):
+    _upload(db, dataset=1)
+    _upload(db, dataset=2)
+    db.forget(1)
+    assert [r["dataset"] for r in db.query()] == [2]
+
+
+def test_records_from_worker_threads(db):
+    threads = [
+        threading.Thread(target=_upload, args=(db,), kwargs={"name": f"{i}.csv"})
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(db.query()) == 8
+
+
+def test_catalog_persists(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    with catalog.Catalog(path) as db:
+        _upload(db)
+    with catalog.Catalog(path) as db:
+        assert db.find_upload(1, "h1")["fileId"] == 5
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.query()
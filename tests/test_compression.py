@@ -0,0 +1,100 @@
+"""Tests for dataportaltools.local_utils.compression."""
+
+import email.parser
+import os
+import pathlib
+
+import pytest
+import xxhash
+import zstandard
+
+from dataportaltools.local_utils import compression
+
+
+@pytest.fixture
+def plain(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"timestamp,value\n" + os.urandom(300_000).hex().encode())
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    ("name", "plain"),
+    [
+        ("a.csv", True),
+        ("dir/a.JSON", True),
+        ("a.json.ZSTD", False),
+        ("a.csv.gz", False),
+        ("x.csv.zip", False),
+        ("a.parquet", False),
+        ("notes", False),
+        ("cpu_float_2024-01-01T00:00:00Z_2024-01-01T01:00:00Z_3_raw.csv", True),
+        ("cpu_float_2024-01-01T00:00:00Z_2024-01-01T01:00:00Z_3_raw.csv.zip", False),
+        ("cpu_float_2024-01-01T00:00:00Z_2024-01-01T01:00:00Z_3_raw.parquet", False),
+        ("k_2022-12-26T00:00:00Z_2022-12-26T01:00:00Z_700_8.1G_raw.log", True),
+        ("k_2022-12-26T00:00:00Z_2022-12-26T01:00:00Z_700_8.1G_raw.log.zst", False),
+    ],
+)
+def test_needs_compression(name, plain):
+    assert compression.needs_compression(name) is plain
+
+
+def test_names():
+    assert compression.compressed_name("a.csv", "zstd") == "a.csv.zst"
+
+
+def test_size_and_key(plain):
+    size, key = compression.size_and_key(plain, "zstd")
+    data = b"".join(compression._chunks(plain, "zstd", compression.LEVEL))
+    assert (size, key) == (len(data), xxhash.xxh128(data).hexdigest())
+    assert size < os.path.getsize(plain)
+    assert (
+        zstandard.ZstdDecompressor().decompress(data)
+        == pathlib.Path(plain).read_bytes()
+    )
+    with pytest.raises(ValueError, match="unknown compression"):
+        compression.size_and_key(plain, "lz4")
+
+
+def test_multipart_body(plain):
+    size, _ = compression.size_and_key(plain, "zstd")
+    body = compression.MultipartBody(
+        {"count": 3, "filename": "a.csv.zst"}, "data", "a.csv.zst", plain, "zstd", size
+    )
+    data = b"".join(iter(lambda: body.read(16384), b""))
+    assert len(data) == len(body) == body.tell()
+    assert body.read() == b""
+    assert body.seek(0) == 0 and body.read() == data
+
+    header = f"Content-Type: {body.content_type}\r\n\r\n".encode()
+    message = email.parser.BytesParser().parsebytes(header + data)
+    count, filename, part = message.get_payload()
+    assert count.get_param("name", header="content-disposition") == "count"
+    assert count.get_payload() == "3"
+    assert filename.get_payload() == "a.csv.zst"
+    assert part.get_filename() == "a.csv.zst"
+    payload = part.get_payload(decode=True)
+    assert (
+        zstandard.ZstdDecompressor().decompress(payload)
+        == pathlib.Path(plain).read_bytes()
+    )
+
+    with pytest.raises(OSError):
+        body.seek(10)
+    wrong = compression.MultipartBody({}, "data", "a", plain, "zstd", size + 1)
+    with pytest.raises(ValueError, match="not the"):
+        wrong.read()
+
+
+def test_multipart_body_checks_the_key(plain):
+    size, key = compression.size_and_key(plain, "zstd")
+    body = compression.MultipartBody(
+        {}, "data", "a", plain, "zstd", size, expected_key=key
+    )
+    assert len(body.read()) == len(body)
+    # Same size, other bytes: a file rewritten in place since it was measured.
+    wrong = compression.MultipartBody(
+        {}, "data", "a", plain, "zstd", size, expected_key="0"
+    )
+    with pytest.raises(ValueError, match="Idempotency-Key 0"):
+        wrong.read()
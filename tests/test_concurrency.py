@@ -0,0 +1,116 @@
+"""Tests for dataportaltools.local_utils.concurrency."""
+
+import threading
+
+import pytest
+
+from dataportaltools.local_utils import concurrency
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that only moves as the requests complete."""
+    now = [0.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _complete(limit, count, seconds=0.01, size=0, status=200, clock=None):
+    for _ in range(count):
+        ticket = limit.acquire()
+        if clock is not None:
+            clock[0] += seconds
+        limit.release(ticket, status, seconds, size)
+
+
+def test_starts_at_the_maximum():
+    limit = concurrency.AdaptiveLimit(8)
+    tickets = [limit.acquire() for _ in range(8)]
+    assert limit.in_flight == 8
+    limit.release(tickets.pop(), 503, 0.01)
+    assert limit.concurrency == 4
+    for ticket in tickets:
+        limit.release(ticket, 200, 0.01)
+    assert concurrency.AdaptiveLimit(8, initial=20).concurrency == 8
+
+
+def test_slow_start_then_additive_increase(clock):
+    limit = concurrency.AdaptiveLimit(8, initial=1)
+    assert limit.concurrency == 1
+    _complete(limit, concurrency.MIN_WINDOW, clock=clock)
+    assert limit.concurrency == 2
+    _complete(limit, concurrency.MIN_WINDOW, clock=clock)
+    assert limit.concurrency == 4
+    _complete(limit, 4, clock=clock)
+    assert limit.concurrency == 8
+    _complete(limit, 8, clock=clock)
+    assert limit.concurrency == 8  # capped at the maximum
+
+    limit.release(limit.acquire(), 503, 0.01)
+    assert limit.concurrency == 4
+    _complete(limit, 4, clock=clock)
+    assert limit.concurrency == 5  # congestion ended the slow start
+    assert limit.in_flight == 0
+
+
+def test_grows_additively_past_the_initial_limit(clock):
+    limit = concurrency.AdaptiveLimit(16, initial=4, slow_start=False)
+    assert limit.concurrency == 4
+    for expected in (5, 6, 7):
+        # Low, steady latency: each window raises the limit by one.
+        _complete(limit, limit.concurrency, clock=clock)
+        assert limit.concurrency == expected
+    tickets = [limit.acquire() for _ in range(7)]
+    assert limit.in_flight == 7
+    for ticket in tickets:
+        limit.release(ticket, 200, 0.01)
+
+
+def test_one_decrease_per_congestion():
+    limit = concurrency.AdaptiveLimit(8)
+    tickets = [limit.acquire() for _ in range(3)]
+    for ticket in tickets:
+        limit.release(ticket, 429, 0.01)
+    # The requests in flight at the first 429 do not decrease it again.
+    assert limit.concurrency == 4
+    limit.release(limit.acquire(), 429, 0.01)
+    assert limit.concurrency == 2
+    limit.release(limit.acquire(), 500, 0.01)
+    limit.release(limit.acquire(), None, 0.01)
+    assert limit.concurrency == 2 and limit.in_flight == 0
+
+
+def test_rising_latency_and_falling_throughput(clock):
+    limit = concurrency.AdaptiveLimit(16, initial=1)
+    _complete(limit, 3, seconds=0.01, clock=clock)
+    assert limit.concurrency == 2
+    # Per MiB: 2 MiB in 0.02 s is no slower than 1 MiB in 0.01 s.
+    _complete(limit, 3, seconds=0.02, size=2 * 1024 * 1024, clock=clock)
+    assert limit.concurrency == 4
+    _complete(limit, 4, seconds=0.05, clock=clock)
+    assert limit.concurrency == 2
+
+    limit = concurrency.AdaptiveLimit(16, initial=1)
+    _complete(limit, 3, size=1000, clock=clock)
+    assert limit.concurrency == 2
+    clock[0] += 0.05
+    _complete(limit, 3, size=1000, clock=clock)
+    assert limit.concurrency == 1
+
+
+def test_acquire_waits_for_a_slot():
+    limit = concurrency.AdaptiveLimit(1)
+    ticket = limit.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limit.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.05)
+    limit.release(ticket, 200, 0.01)
+    assert acquired.wait(5)
+    thread.join()
+    assert limit.in_flight == 1
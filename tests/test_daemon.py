@@ -0,0 +1,189 @@
+"""Tests for dataportaltools.local_utils.daemon."""
+
+import io
+import json
+import os
+import socket
+import stat
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from dataportaltools.local_utils import daemon
+
+
+@pytest.fixture
+def served(tmp_path):
+    """A daemon serving a MagicMock connection; yields (socket path, mock)."""
+    wc = MagicMock()
+    path = str(tmp_path / "d.sock")
+    server = daemon.Server(path, wc)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path, wc
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    assert not os.path.exists(path)
+
+
+def test_cached_connection_listings():
+    wc = MagicMock()
+    wc.datasets.side_effect = [[1], [1, 2], [1, 2, 3]]
+    wc._list_files.side_effect = lambda d, e, dry, limit=0: [(d, e, limit)]
+    cached = daemon.CachedConnection(wc)
+
+    assert cached.datasets(False) == [1]
+    assert cached.datasets(False) == [1]
+    assert cached.datasets(True) == [1, 2]  # dryruns are not cached
+    cached.new_dataset("info", "u", False)
+    assert cached.datasets(False) == [1, 2, 3]
+    assert wc.datasets.call_count == 3
+
+    assert cached._list_files(7, False, False) == [(7, False, 0)]
+    cached._list_files(7, False, False)
+    cached._list_files(7, True, False)
+    cached._list_files(7, False, False, limit=1)
+    assert wc._list_files.call_count == 3
+    cached.upload_files(7, ["a"], {}, "", "", False)
+    cached._list_files(7, False, False)
+    cached.set_file_metadata(7, 1, ["t"], None, False)
+    cached._list_files(7, False, False)
+    cached.delete(7, True, False)
+    cached._list_files(7, True, False)
+    assert wc._list_files.call_count == 6
+    # Everything else goes to the connection.
+    assert cached.token_data is wc.token_data
+
+
+def test_cached_connection_ttl_and_failures():
+    wc = MagicMock()
+    wc.datasets.side_effect = [None, [1], [2]]
+    cached = daemon.CachedConnection(wc, ttl=0)
+    assert cached.datasets(False) is None
+    assert cached.datasets(False) == [1]
+    assert cached.datasets(False) == [2]
+
+
+def test_forward_and_call(served):
+    path, wc = served
+    wc.datasets.return_value = [{"DatasetID": 7}]
+    wc.delete.return_value = 1
+    out = io.StringIO()
+    ret = daemon.forward(path, ['{"op": "list"}', "", '{"op": "list"}'], out)
+    assert ret == 0
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(r["line"], r["op"], r["ok"]) for r in results] == [
+        (1, "list", True),
+        (3, "list", True),
+    ]
+    assert results[1]["result"] == {"datasets": [{"DatasetID": 7}]}
+    # The second listing came from the cache, also for the next client.
+    assert daemon.call(path, {"op": "list"})["ok"]
+    wc.datasets.assert_called_once_with(False)
+
+    assert daemon.call(path, {"op": "delete", "dataset": 7})["ok"] is False
+    assert daemon.forward(path, ['{"op": "list"}'], io.StringIO()) == 0
+    assert wc.datasets.call_count == 2
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lines = [
+        '{"op": "upload", "dataset": 7, "src": ["a.csv", "/b.csv"]}',
+        '{"op": "upload", "dataset": 7, "src": "c/*.csv", "extra": true}',
+        '{"op": "create", "info": "info.md"}',
+        '{"op": "list"}',
+        "# not json",
+        "[1]",
+    ]
+    out = [json.loads(line) for line in list(daemon.absolute_paths(lines))[:4]]
+    assert out[0]["src"] == [str(tmp_path / "a.csv"), "/b.csv"]
+    assert out[1] == {
+        "op": "upload",
+        "dataset": 7,
+        "src": str(tmp_path / "c" / "*.csv"),
+        "extra": True,
+    }
+    assert out[2]["info"] == str(tmp_path / "info.md")
+    assert list(daemon.absolute_paths(lines))[3:] == lines[3:]
+
+
+def test_settings_mismatch_is_refused(tmp_path):
+    wc = MagicMock()
+    wc.datasets.return_value = []
+    path = str(tmp_path / "d.sock")
+    settings = {"api": "https://p1", "workers": 4, "compress": None}
+    with daemon.Server(path, wc, settings=settings) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        record = daemon.call(path, {"op": "list"}, {"api": "https://p2", "other": 1})
+        assert record["ok"] is False
+        assert record["error"] == (
+            "the daemon cannot run with --api https://p2 "
+            "(the daemon runs with https://p1)"
+        )
+        wc.datasets.assert_not_called()
+        assert daemon.call(path, {"op": "list"}, {"workers": 4, "other": 1})["ok"]
+        out = io.StringIO()
+        assert daemon.forward(path, ['{"op": "list"}'], out, {"workers": 4}) == 0
+        assert json.loads(out.getvalue())["line"] == 1
+        server.shutdown()
+        thread.join()
+
+
+def test_no_daemon(tmp_path):
+    path = str(tmp_path / "d.sock")
+    assert daemon.forward(path, iter(()), io.StringIO()) is None
+    assert daemon.call(path, {"op": "list"}) is None
+
+
+def test_claim(served, tmp_path):
+    path, _ = served
+    with pytest.raises(daemon.DaemonError, match="already running"):
+        daemon.claim(path)
+
+    not_socket = tmp_path / "file"
+    not_socket.write_text("x")
+    with pytest.raises(daemon.DaemonError, match="not a socket"):
+        daemon.claim(str(not_socket))
+
+    stale = str(tmp_path / "stale.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(stale)
+    sock.close()
+    daemon.claim(stale)
+    assert not os.path.exists(stale)
+    assert daemon.call(stale, {"op": "list"}) is None
+
+
+def test_listening(served, tmp_path):
+    path, _ = served
+    assert daemon.listening(path)
+    assert not daemon.listening(str(tmp_path / "none.sock"))
+
+
+def test_call_without_answer(tmp_path):
+    path = str(tmp_path / "d.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen(1)
+
+        def hang_up():
+            conn, _ = listener.accept()
+            conn.close()
+
+        thread = threading.Thread(target=hang_up)
+        thread.start()
+        with pytest.raises(daemon.DaemonError, match="no response"):
+            daemon.call(path, {"op": "list"})
+        thread.join()
+
+
+def test_serve_until_interrupted(tmp_path, mocker):
+    path = str(tmp_path / "d.sock")
+    mocker.patch.object(daemon.Server, "serve_forever", side_effect=KeyboardInterrupt)
+    daemon.serve(MagicMock(), path)
+    assert not os.path.exists(path)
@@ -0,0 +1,174 @@
+"""Tests for dataportaltools.local_utils.filenames."""
+
+import random
+import re
+
+import pytest
+
+from dataportaltools.local_utils import filenames, utils
+
+
+def _legacy_valid_date(s):
+    date_pattern = r"[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?Z?"
+    return re.search(date_pattern, s) is not None
+
+
+def _legacy_parse_filename(fname):
+    """The regex parser filenames.parse replaced, kept verbatim as the oracle."""
+    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)"
+    m = re.search(regex_pattern, fname)
+    if m is not None:
+        if _legacy_valid_date(m.group(3)) and _legacy_valid_date(m.group(4)):
+            tail = m.group(6)
+            tail_pattern = r"([^.]+)\.([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "metric", {
+                    "name": m.group(1),
+                    "type": m.group(2),
+                    "start": m.group(3),
+                    "stop": m.group(4),
+                    "count": m.group(5),
+                    "flag": t.group(1),
+                    "ext": t.group(2),
+                    "compression": t.group(3),
+                    "prefix": m.group(3)[0:4],
+                }
+
+            tail_pattern = r"([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "metric", {
+                    "name": m.group(1),
+                    "type": m.group(2),
+                    "start": m.group(3),
+                    "stop": m.group(4),
+                    "count": m.group(5),
+                    "flag": t.group(1),
+                    "ext": t.group(2),
+                    "prefix": m.group(3)[0:4],
+                }
+        else:
+            # invalid date(s)
+            pass
+
+    # try log
+    regex_pattern = r"([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^_]+)_([^.]+)\.(.*)"
+    m = re.search(regex_pattern, fname)
+    if m is not None:
+        if _legacy_valid_date(m.group(2)) and _legacy_valid_date(m.group(3)):
+            tail = m.group(7)
+            tail_pattern = r"([^.]+)\.([^.]+)"
+            t = re.search(tail_pattern, tail)
+            if t is not None:
+                return "log", {
+                    "name": m.group(1),
+                    "start": m.group(2),
+                    "stop": m.group(3),
+                    "count": m.group(4),
+                    "size": m.group(5),
+                    "flag": m.group(6),
+                    "type": t.group(1),
+                    "compression": t.group(2),
+                    "prefix": m.group(3)[0:4],
+                }
+
+            return "log", {
+                "name": m.group(1),
+                "start": m.group(2),
+                "stop": m.group(3),
+                "count": m.group(4),
+                "size": m.group(5),
+                "flag": m.group(6),
+                "compression": m.group(7),
+                "prefix": m.group(3)[0:4],
+            }
+        # invalid date(s)
+
+    return "extra", {}
+
+
+DATE = "2024-01-31T23:00:00Z"
+VALID = [
+    f"history_float_{DATE}_{DATE}_3000_raw.csv.zst",
+    f"history_float_{DATE}_{DATE}_3000_raw.csv",
+    f"history_{DATE}_{DATE}_3000_76Mb_raw.json.bz2",
+    f"history_{DATE}_{DATE}_3000_76Mb_raw.bz2",
+    f"history_{DATE}_{DATE}_3000_76Mb.json.zip",
+    f"pre__history_float_{DATE}_{DATE}_3000_raw..csv.gz.x",
+    f"a_b_{DATE}_{DATE}_1_flag_with_underscores.json.zst",
+    f"a_b_c_d_e_.x_{DATE}_{DATE}_1_2_f.g",
+    f"x_{DATE}_{DATE}_1_2_f.g\nh.i",
+    "readme.md",
+    "",
+]
+
+# Characters that exercise every branch: separators, date pieces, newlines.
+ALPHABET = "ab_._..__-:T0123456789Z\n"
+
+
+def _random_name(rng):
+    pieces = []
+    for _ in range(rng.randint(0, 12)):
+        roll = rng.random()
+        if roll < 0.3:
+            pieces.append(DATE if rng.random() < 0.8 else DATE[: rng.randint(0, 19)])
+        else:
+            pieces.append(
+                "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 4)))
+            )
+    return rng.choice(["_", ".", "__", "_."]).join(pieces)
+
+
+@pytest.mark.parametrize("fname", VALID)
+def test_parse_matches_legacy_examples(fname):
+    assert filenames.parse(fname) == _legacy_parse_filename(fname)
+    assert list(filenames.parse(fname)[1]) == list(_legacy_parse_filename(fname)[1])
+
+
+def test_parse_matches_legacy_fuzz():
+    rng = random.Random(20241019)
+    kinds = set()
+    for _ in range(5_000):
+        fname = _random_name(rng)
+        expected = _legacy_parse_filename(fname)
+        assert filenames.parse(fname) == expected, fname
+        kinds.add(expected[0])
+    assert kinds == {"metric", "log", "extra"}
+
+
+def test_parse_matches_legacy_mutated_valid_names():
+    rng = random.Random(7)
+    kinds = set()
+    for _ in range(5_000):
+        chars = list(rng.choice(VALID[:-2]))
+        for _ in range(rng.randint(1, 4)):
+            pos = rng.randrange(len(chars))
+            roll = rng.random()
+            if roll < 0.4:
+                chars.insert(pos, rng.choice(ALPHABET))
+            elif roll < 0.7:
+                del chars[pos]
+            else:
+                chars[pos] = rng.choice(ALPHABET)
+        fname = "".join(chars)
+        expected = _legacy_parse_filename(fname)
+        assert filenames.parse(fname) == expected, fname
+        kinds.add(expected[0])
+    assert kinds == {"metric", "log", "extra"}
+
+
+def test_parse_is_linear_on_pathological_names():
+    # Tens of seconds with the old unanchored regexes.
+    for fname in ("a" * 200_000, "a_" * 3 + "b" * 200_000, "_." * 100_000):
+        assert filenames.parse(fname) == ("extra", {})
+
+
+def test_parse_filenames_columns():
+    cols = utils.parse_filenames([VALID[0], VALID[2], "readme.md"])
+    assert list(cols) == list(filenames.COLUMNS)
+    assert cols["kind"] == ["metric", "log", "extra"]
+    assert cols["type"] == ["float", "json", None]
+    assert cols["size"] == [None, "76Mb", None]
+    assert cols["compression"] == ["zst", "bz2", None]
+    assert cols["count"] == ["3000", "3000", None]
@@ -0,0 +1,135 @@
+"""Tests for dataportaltools.local_utils.headtail."""
+
+import pandas as pd
+import pytest
+
+from dataportaltools.local_utils import headtail, utils
+
+
+def _frame(n, epoch=False):
+    times = pd.date_range("2024-01-01", periods=n, freq="min", tz="UTC")
+    if epoch:
+        stamps = [int(t.timestamp()) for t in times]
+    else:
+        stamps = times.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return pd.DataFrame({"timestamp": stamps, "v": range(n)})
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Make a few thousand rows span many head/tail blocks and probes."""
+    monkeypatch.setattr(headtail, "_HEAD_ROWS", 10)
+    monkeypatch.setattr(headtail, "_BLOCK_BYTES", 256)
+    monkeypatch.setattr(headtail, "_COUNT_CHUNK", 1000)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".csv.zst", ".parquet"])
+def test_summarize_matches_full_scan(tmp_path, small_blocks, suffix):
+    p = tmp_path / f"d{suffix}"
+    frame = _frame(3000)
+    if suffix == ".parquet":
+        frame.to_parquet(p, row_group_size=100)
+    else:
+        frame.to_csv(p, index=False)
+    summary = headtail.summarize(str(p))
+    assert summary["count"] == 3000
+    assert summary["start"] == pd.Timestamp("2024-01-01T00:00:00Z")
+    assert summary["stop"] == pd.Timestamp("2024-01-03T01:59:00Z")
+
+
+def test_summarize_csv_trailing_blank_lines_and_crlf(tmp_path):
+    p = tmp_path / "d.csv"
+    p.write_bytes(
+        b"timestamp,v\r\n2024-01-01T00:00:00Z,1\r\n2024-01-01T00:05:00Z,2\r\n\r\n"
+    )
+    summary = headtail.summarize(str(p))
+    assert summary["count"] == 2
+    assert summary["stop"] == pd.Timestamp("2024-01-01T00:05:00Z")
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".csv.gz"])
+def test_summarize_csv_skips_blank_lines_in_the_middle(tmp_path, small_blocks, suffix):
+    p = tmp_path / f"d{suffix}"
+    text = _frame(100).to_csv(index=False)
+    lines = text.splitlines()
+    text = "\n".join(lines[:40] + ["", "  \r"] + lines[40:] + [""]) + "\n"
+    if suffix == ".csv.gz":
+        import gzip
+
+        p.write_bytes(gzip.compress(text.encode()))
+    else:
+        p.write_text(text)
+    summary = headtail.summarize(str(p))
+    assert summary["count"] == 100 == len(pd.read_csv(p))
+
+
+def test_summarize_parquet_statistics(tmp_path):
+    p = tmp_path / "d.parquet"
+    frame = _frame(50, epoch=True).iloc[::-1]  # unsorted, stats still exact
+    frame.to_parquet(p, row_group_size=7)
+    summary = headtail.summarize(str(p))
+    assert summary == {
+        "count": 50,
+        "start": pd.Timestamp("2024-01-01T00:00:00Z"),
+        "stop": pd.Timestamp("2024-01-01T00:49:00Z"),
+    }
+    ts = tmp_path / "t.parquet"
+    pd.DataFrame({"t": pd.date_range("2024-01-01", periods=5, freq="h")}).to_parquet(ts)
+    assert headtail.summarize(str(ts))["stop"] == pd.Timestamp("2024-01-01T04:00Z")
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_check_rejects_unsorted(tmp_path, small_blocks, suffix):
+    p = tmp_path / f"d{suffix}"
+    frame = _frame(3000)
+    frame = pd.concat([frame.iloc[1500:], frame.iloc[:1500]])
+    if suffix == ".parquet":
+        frame.to_parquet(p, row_group_size=100)
+    else:
+        frame.to_csv(p, index=False)
+    assert headtail.summarize(str(p)) is None
+    # Trusted order takes the first/last rows as they are.
+    trusted = headtail.summarize(str(p), check=False)
+    assert trusted["start"] == pd.Timestamp("2024-01-02T01:00:00Z")
+
+
+def test_summarize_not_applicable(tmp_path):
+    quoted = tmp_path / "q.csv"
+    quoted.write_text('timestamp,v\n2024-01-01T00:00:00Z,"a\nb"\n')
+    assert headtail.summarize(str(quoted)) is None
+    pkl = tmp_path / "d.pkl"
+    _frame(3).to_pickle(pkl)
+    assert headtail.summarize(str(pkl)) is None
+    empty = tmp_path / "e.csv"
+    empty.write_text("timestamp,v\n")
+    assert headtail.summarize(str(empty)) is None
+    blank_end = tmp_path / "b.csv.gz"
+    pd.DataFrame({"timestamp": ["2024-01-01T00:00:00Z"]}).to_csv(blank_end, index=False)
+    with open(blank_end, "ab") as fh:
+        import gzip
+
+        fh.write(gzip.compress(b"\n"))
+    # A trailing blank line is not a row, compressed or not.
+    assert headtail.summarize(str(blank_end))["count"] == 1
+    bad_last = tmp_path / "l.csv"
+    bad_last.write_text("timestamp\n2024-01-01T00:00:00Z\nnot a time\n")
+    assert headtail.summarize(str(bad_last)) is None
+    empty_pq = tmp_path / "e.parquet"
+    _frame(0).to_parquet(empty_pq)
+    assert headtail.summarize(str(empty_pq)) is None
+
+
+def test_rename_sorted_and_fallback(tmp_path):
+    p = tmp_path / "raw.csv"
+    _frame(3).to_csv(p, index=False)
+    ok, name = headtail.rename_sorted(str(p), name="h", kind="metric", dtype="float")
+    assert ok
+    assert name == "h_float_2024-01-01T00:00:00Z_2024-01-01T00:02:00Z_3_raw.csv"
+    assert (ok, name) == utils.rename_from_data(
+        str(p), name="h", kind="metric", dtype="float"
+    )
+    unsorted = tmp_path / "u.csv"
+    _frame(3).iloc[::-1].to_csv(unsorted, index=False)
+    ok, name = headtail.rename_sorted(str(unsorted), name="u", kind="metric", dtype="f")
+    assert name == "u_f_2024-01-01T00:00:00Z_2024-01-01T00:02:00Z_3_raw.csv"
+    assert headtail.rename_sorted(str(p), name="a_b", kind="metric") == (False, "")
@@ -0,0 +1,56 @@
+"""Tests for dataportaltools.local_utils.health."""
+
+import json
+
+from dataportaltools.local_utils import health
+
+
+def test_state_file_location(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert health.state_file() == str(tmp_path / "dataportaltools" / "health.json")
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert health.state_file().endswith("/.cache/dataportaltools/health.json")
+
+
+def test_record_and_forget(tmp_path, mocker):
+    path = str(tmp_path / "sub" / "health.json")
+    assert not health.is_healthy("http://a", path=path)
+    health.record("http://a", path=path)
+    health.record("http://b", path=path)
+    assert health.is_healthy("http://a", path=path)
+    assert not health.is_healthy("http://c", path=path)
+
+    mocker.patch.object(health.time, "time", return_value=health.time.time() + 301)
+    assert not health.is_healthy("http://a", path=path)
+    assert health.is_healthy("http://a", ttl=600, path=path)
+
+    health.forget("http://a", path=path)
+    health.forget("http://c", path=path)
+    with open(path, encoding="utf-8") as fh:
+        assert list(json.load(fh)) == ["http://b"]
+
+
+def test_bad_state_files_are_ignored(tmp_path):
+    path = tmp_path / "health.json"
+    path.write_text("[1, 2]")
+    assert not health.is_healthy("http://a", path=str(path))
+    path.write_text("{not json")
+    health.record("http://a", path=str(path))
+    assert health.is_healthy("http://a", path=str(path))
+
+    # An unwritable state just is not saved.
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    health.record("http://a", path=str(blocker / "health.json"))
+    assert not health.is_healthy("http://a", path=str(blocker / "health.json"))
+
+
+def test_failed_write_removes_the_temporary_file(tmp_path, mocker):
+    path = tmp_path / "health.json"
+    mocker.patch.object(health.os, "replace", side_effect=OSError("read-only"))
+    health.record("http://a", path=str(path))
+    assert list(tmp_path.iterdir()) == []
+
+    mocker.patch.object(health.json, "dump", side_effect=OSError("disk full"))
+    health.record("http://a", path=str(path))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,56 @@
+"""Tests for dataportaltools.local_utils.logjson."""
+
+import json
+import logging
+import sys
+
+from dataportaltools.local_utils import logjson
+
+
+class _Counted:
+    """Serialised through ``default=str``, counting the serialisations."""
+
+    calls = 0
+
+    def __str__(self):
+        _Counted.calls += 1
+        return "counted"
+
+
+def test_lazy_json_is_serialised_only_when_emitted(caplog):
+    logger = logging.getLogger("toolslib.test_logjson")
+    body = {"files": [_Counted()]}
+    with caplog.at_level(logging.INFO, logger="toolslib.test_logjson"):
+        logger.debug("response %s", logjson.LazyJSON(body, indent=4))
+        assert _Counted.calls == 0
+        logger.info("response %s", logjson.LazyJSON(body))
+    assert _Counted.calls > 0  # once per handler formatting the record
+    assert caplog.messages == ['response {"files": ["counted"]}']
+    assert str(logjson.LazyJSON([1], indent=1)) == "[\n 1\n]"
+
+
+def _format(msg, *args, **extra):
+    record = logging.makeLogRecord(
+        {"name": "toolslib.x", "levelname": "DEBUG", "msg": msg, "args": args} | extra
+    )
+    return json.loads(logjson.JSONFormatter().format(record))
+
+
+def test_json_formatter():
+    entry = _format("form %s for %s", logjson.LazyJSON({"a": 1}, indent=4), "f.csv")
+    assert entry["message"] == "form <data[0]> for f.csv"
+    assert entry["data"] == [{"a": 1}]
+    assert (entry["level"], entry["logger"]) == ("DEBUG", "toolslib.x")
+    assert entry["time"].endswith("+00:00")
+
+    entry = _format("count %d", 3, datasetid=7)
+    assert entry["message"] == "count 3" and entry["datasetid"] == 7
+    assert "data" not in entry and "exc" not in entry
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.makeLogRecord({"msg": "failed", "stack_info": "here"})
+        record.exc_info = sys.exc_info()
+    entry = json.loads(logjson.JSONFormatter().format(record))
+    assert "ValueError: boom" in entry["exc"] and entry["stack"] == "here"
@@ -0,0 +1,170 @@
+"""Tests for dataportaltools.local_utils.logscan."""
+
+import bz2
+import gzip
+import json
+
+import pytest
+import zstandard
+
+from dataportaltools.local_utils import logscan
+
+
+def _lines(n, key="timestamp"):
+    return [
+        json.dumps({key: f"2024-02-01T00:00:{i:02d}Z", "msg": "x" * i})
+        for i in range(n)
+    ]
+
+
+def _write(path, text):
+    raw = text.encode("utf-8")
+    name = str(path)
+    if name.endswith((".zst", ".zstd")):
+        path.write_bytes(zstandard.ZstdCompressor().compress(raw))
+    elif name.endswith(".gz"):
+        path.write_bytes(gzip.compress(raw))
+    elif name.endswith(".bz2"):
+        path.write_bytes(bz2.compress(raw))
+    else:
+        path.write_bytes(raw)
+    return len(raw)
+
+
+@pytest.mark.parametrize("suffix", [".json.zstd", ".json.zst", ".json.gz", ".json.bz2"])
+def test_scan_log_compressed(tmp_path, suffix):
+    p = tmp_path / f"app{suffix}"
+    size = _write(p, "\n".join(_lines(5)) + "\n")
+    scan = logscan.scan_log(str(p))
+    assert scan["count"] == 5
+    assert scan["size"] == size
+    assert scan["start"] == "2024-02-01T00:00:00Z"
+    assert scan["stop"] == "2024-02-01T00:00:04Z"
+
+
+def test_scan_log_across_chunks_without_trailing_newline(tmp_path, monkeypatch):
+    monkeypatch.setattr(logscan, "_CHUNK_SIZE", 7)
+    p = tmp_path / "app.json"
+    _write(p, "\n".join(_lines(12)))
+    scan = logscan.scan_log(str(p))
+    assert scan["count"] == 12
+    assert scan["start"] == "2024-02-01T00:00:00Z"
+    assert scan["stop"] == "2024-02-01T00:00:11Z"
+
+
+@pytest.mark.parametrize("chunk", [7, 1 << 20])
+def test_scan_log_skips_blank_lines(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(logscan, "_CHUNK_SIZE", chunk)
+    lines = _lines(4)
+    p = tmp_path / "app.json.gz"
+    _write(p, "\n" + lines[0] + "\n\n" + "\n".join(lines[1:]) + "\n \r\n\n")
+    scan = logscan.scan_log(str(p))
+    assert scan["count"] == 4
+    assert scan["start"] == "2024-02-01T00:00:00Z"
+    assert scan["stop"] == "2024-02-01T00:00:03Z"
+
+    blank = tmp_path / "blank.json"
+    _write(blank, "\n\n")
+    assert logscan.scan_log(str(blank))["count"] == 0
+
+
+def test_scan_log_single_line_and_empty(tmp_path):
+    p = tmp_path / "one.json"
+    _write(p, _lines(1)[0])
+    scan = logscan.scan_log(str(p))
+    assert scan["count"] == 1
+    assert scan["start"] == scan["stop"] == "2024-02-01T00:00:00Z"
+
+    empty = tmp_path / "empty.json"
+    _write(empty, "")
+    assert logscan.scan_log(str(empty)) == {
+        "count": 0,
+        "size": 0,
+        "human_size": "0B",
+        "start": "",
+        "stop": "",
+    }
+
+
+def test_scan_log_reader_error_propagates(tmp_path):
+    p = tmp_path / "broken.json.zst"
+    p.write_bytes(b"definitely not zstd")
+    with pytest.raises(zstandard.ZstdError):
+        logscan.scan_log(str(p))
+
+
+def test_readahead_stops_early_consumer():
+    class _Endless:
+        def read(self, _n):
+            return b"x"
+
+    chunks = logscan._readahead(_Endless())
+    assert next(chunks) == b"x"
+    chunks.close()  # producer is unblocked and joined
+
+
+@pytest.mark.parametrize(
+    "line,key,expected",
+    [
+        (b'{"@timestamp": "2024-01-01T00:00:00Z"}', None, "2024-01-01T00:00:00Z"),
+        (b'{"t": "2024-01-01T00:00:00"}', "t", "2024-01-01T00:00:00"),
+        (b'{"ts": 1704067200}', None, "2024-01-01T00:00:00+00:00"),
+        (b'{"ts": 1704067200000}', None, "2024-01-01T00:00:00+00:00"),
+        (b'{"ts": 1704067200000000}', None, "2024-01-01T00:00:00+00:00"),
+        (b'{"ts": 1704067200000000000}', None, "2024-01-01T00:00:00+00:00"),
+        (b'{"ts": true, "time": "2024-01-01T00:00:00Z"}', None, "2024-01-01T00:00:00Z"),
+        (b'{"msg": "no time"}', None, ""),
+        (b"{not json", None, ""),
+        (b"2024-01-01 10:00:00.5 INFO started", None, "2024-01-01T10:00:00.5"),
+        (b"[2024-01-01T10:00:00Z] started", None, "2024-01-01T10:00:00Z"),
+        (b"started without time", None, ""),
+    ],
+)
+def test_line_timestamp(line, key, expected):
+    assert logscan.line_timestamp(line, key) == expected
+
+
+@pytest.mark.parametrize(
+    "num,expected",
+    [
+        (0, "0B"),
+        (999, "999B"),
+        (1500, "1.5KB"),
+        (8_168_000_000, "8.168GB"),
+        (10**20, "100000PB"),
+    ],
+)
+def test_human_size(num, expected):
+    assert logscan.human_size(num) == expected
+
+
+# --------------------------------------------------------------------------- #
+# rename_log
+# --------------------------------------------------------------------------- #
+def test_rename_log(tmp_path):
+    p = tmp_path / "dump.json.zstd"
+    _write(p, "\n".join(_lines(3)) + "\n")
+    ok, name = logscan.rename_log(str(p), name="app")
+    assert ok
+    size = logscan.scan_log(str(p))["human_size"]
+    assert name == (
+        f"app_2024-02-01T00:00:00Z_2024-02-01T00:00:02Z_3_{size}_raw.json.zstd"
+    )
+
+
+def test_rename_log_explicit_size_and_key(tmp_path):
+    p = tmp_path / "dump.json.gz"
+    _write(p, "\n".join(_lines(2, key="when")) + "\n")
+    ok, name = logscan.rename_log(str(p), name="app", size="8G", timestamp_key="when")
+    assert ok
+    assert "_2_8G_raw.json.gz" in name
+
+
+def test_rename_log_without_lines_or_timestamps(tmp_path):
+    empty = tmp_path / "e.json.gz"
+    _write(empty, "")
+    assert logscan.rename_log(str(empty), name="a") == (False, "")
+
+    untimed = tmp_path / "u.json.gz"
+    _write(untimed, '{"msg": 1}\n')
+    assert logscan.rename_log(str(untimed), name="a") == (False, "")
@@ -1,18 +1,35 @@
 """Tests for the dataportaltools.main Click CLI."""
 
+import json
+import os
+import threading
+from datetime import timedelta
+from unittest.mock import MagicMock
+
 import pytest
 from click.testing import CliRunner
 
-from dataportaltools.local_utils import config
+from dataportaltools.local_utils import catalog, config, daemon, tracing
+from dataportaltools.local_utils import upload as up
 from dataportaltools.main import main
 
 
-@pytest.fixture(autouse=True)
-def _reset_config():
+def _clear_config():
     attr = "_config__CONFIG" if hasattr(config, "_config__CONFIG") else "__CONFIG"
     setattr(config, attr, None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_config():
+    _clear_config()
     yield
-    setattr(config, attr, None)
+    _clear_config()
+
+
+def _invoke(runner, args, **kwargs):
+    """Invoke the CLI again within one test (the config is set once per run)."""
+    _clear_config()
+    return runner.invoke(main, args, **kwargs)
 
 
 @pytest.fixture
@@ -298,14 +315,21 @@ def test_verbose_flag_configures_logging(runner, mocker):
     _patch_conn(mocker)
     cfg = mocker.patch("dataportaltools.main.utils.configure_logging")
     runner.invoke(main, ["-vv", "-L"])
-    cfg.assert_called_once_with(2)
+    cfg.assert_called_once_with(2, "text")
 
 
 def test_default_quiet_configures_logging_zero(runner, mocker):
     _patch_conn(mocker)
     cfg = mocker.patch("dataportaltools.main.utils.configure_logging")
     runner.invoke(main, ["-L"])
-    cfg.assert_called_once_with(0)
+    cfg.assert_called_once_with(0, "text")
+
+
+def test_log_format_env(runner, mocker):
+    _patch_conn(mocker)
+    cfg = mocker.patch("dataportaltools.main.utils.configure_logging")
+    runner.invoke(main, ["-L"], env={"PORTAL_LOG_FORMAT": "json"})
+    cfg.assert_called_once_with(0, "json")
 
 
 def test_rename_prints_name(runner, mocker, tmp_path):
@@ -459,3 +483,626 @@ def test_no_extra_flag_routes_datafile(runner, mocker, tmp_path):
     result = runner.invoke(main, ["-U", "1", "-s", str(f)])
     assert result.exit_code == 0
     assert instance.upload.call_args.kwargs["extra"] is False
+
+
+def test_rename_apply_compact_prints_savings(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    import pandas as pd
+
+    p = tmp_path / "raw.csv"
+    pd.DataFrame(
+        {
+            "timestamp": ["2022-12-26T00:00:00Z", "2022-12-27T00:00:00Z"] * 2,
+            "code": [200, 404] * 2,
+        }
+    ).to_csv(p, index=False)
+    result = runner.invoke(
+        main,
+        [
+            "--rename",
+            str(p),
+            "--name",
+            "history",
+            "--kind",
+            "metric",
+            "--dtype",
+            "uint",
+            "--apply",
+            "--compact",
+        ],
+    )
+    assert result.exit_code == 0
+    assert "uint16" in result.output
+    assert "Total:" in result.output
+
+
+def test_compact_options_require_apply(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    p = tmp_path / "raw.csv"
+    p.write_text("timestamp,v\n")
+    rename = ["--rename", str(p), "--name", "h", "--kind", "metric"]
+    result = runner.invoke(main, rename + ["--compact"])
+    assert result.exit_code == 2
+    assert "--compact requires --rename and --apply" in result.output
+
+    result = _invoke(runner, ["-L", "--compact", "--apply"])
+    assert result.exit_code == 2
+
+    result = _invoke(runner, rename + ["--apply", "--float-tolerance", "1e-6"])
+    assert result.exit_code == 2
+    assert "--float-tolerance requires --compact" in result.output
+
+
+def test_rename_apply_passes_parquet_options(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    conv = mocker.patch(
+        "dataportaltools.main.utils.convert_and_rename",
+        return_value=(True, "out.parquet.zst", []),
+    )
+    p = tmp_path / "d.csv"
+    p.write_text("timestamp\n2022-12-26T00:00:00Z\n", encoding="utf-8")
+    result = runner.invoke(
+        main,
+        [
+            "--rename",
+            str(p),
+            "--name",
+            "h",
+            "--kind",
+            "metric",
+            "--dtype",
+            "float",
+            "--apply",
+            "--zstd-level",
+            "19",
+            "--row-group-size",
+            "1000",
+            "--no-statistics",
+            "--sort-by-time",
+            "--threads",
+            "2",
+        ],
+    )
+    assert result.exit_code == 0
+    kwargs = conv.call_args.kwargs
+    assert kwargs["sort_by_time"] is True
+    assert kwargs["parquet_options"] == {
+        "compression_level": 19,
+        "row_group_size": 1000,
+        "data_page_size": None,
+        "use_dictionary": True,
+        "write_statistics": False,
+        "threads": 2,
+    }
+
+
+def test_rename_log_prints_name(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    import gzip
+
+    p = tmp_path / "app.json.gz"
+    p.write_bytes(gzip.compress(b'{"time": "2024-01-01T00:00:00Z"}\n'))
+    result = runner.invoke(main, ["--rename", str(p), "--name", "app", "--kind", "log"])
+    assert result.exit_code == 0
+    assert "app_2024-01-01T00:00:00Z_2024-01-01T00:00:00Z_1_33B_raw.json.gz" in (
+        result.output
+    )
+
+
+def test_rename_log_build_failure(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    mocker.patch("dataportaltools.main.logscan.rename_log", return_value=(False, ""))
+    p = tmp_path / "app.json.gz"
+    p.write_bytes(b"")
+    result = runner.invoke(main, ["--rename", str(p), "--name", "a", "--kind", "log"])
+    assert result.exit_code != 0
+    assert "Failed to build a name" in result.output
+
+
+def test_split_prints_outputs(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    import pandas as pd
+
+    p = tmp_path / "dump.csv"
+    pd.DataFrame(
+        {"timestamp": ["2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"], "v": [1, 2]}
+    ).to_csv(p, index=False)
+    result = runner.invoke(
+        main, ["--split", str(p), "--name", "h", "--dtype", "uint", "--threads", "2"]
+    )
+    assert result.exit_code == 0
+    assert result.output.count(".parquet.zst") == 2
+
+
+def test_split_requires_name_and_dtype(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    p = tmp_path / "dump.csv"
+    p.write_text("timestamp\n", encoding="utf-8")
+    result = runner.invoke(main, ["--split", str(p), "--name", "h"])
+    assert result.exit_code == 2
+    assert "requires --name and --dtype" in result.output
+
+
+def test_split_failure(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    mocker.patch("dataportaltools.main.partition.split_file", return_value=(False, []))
+    p = tmp_path / "dump.csv"
+    p.write_text("timestamp\n", encoding="utf-8")
+    result = runner.invoke(main, ["--split", str(p), "--name", "h", "--dtype", "u"])
+    assert result.exit_code == 1
+    assert "Failed to split" in result.output
+
+
+def test_merge_prints_outputs(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    merge = mocker.patch(
+        "dataportaltools.main.partition.merge_files",
+        return_value=(True, {"out.parquet.zst": ["a", "b"]}),
+    )
+    (tmp_path / "a.csv").write_text("x", encoding="utf-8")
+    args = ["--merge", "-s", str(tmp_path / "*.csv"), "--target-size", "1MB"]
+    result = runner.invoke(main, args + ["--max-gap", "1h"])
+    assert result.exit_code == 0
+    assert "out.parquet.zst (2 files)" in result.output
+    assert merge.call_args.kwargs["max_gap"] == timedelta(hours=1)
+
+
+def test_merge_nothing_and_failure(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    mocker.patch("dataportaltools.main.partition.merge_files", return_value=(False, {}))
+    result = runner.invoke(main, ["--merge", "-s", str(tmp_path / "*.csv")])
+    assert result.exit_code == 1
+    assert "Nothing to merge" in result.output
+    assert "Failed to merge" in result.output
+
+
+def test_merge_usage_errors(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    result = runner.invoke(main, ["--merge"])
+    assert result.exit_code == 2
+    assert "--merge requires --src" in result.output
+    result = runner.invoke(main, ["--merge", "-s", "x", "--target-size", "big"])
+    assert result.exit_code == 2
+    assert "Invalid size" in result.output
+    result = runner.invoke(main, ["--merge", "-s", "x", "--max-gap", "soon"])
+    assert result.exit_code == 2
+    assert "Invalid duration" in result.output
+
+
+def test_rename_passes_timestamp_format(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    rename = mocker.patch(
+        "dataportaltools.main.utils.rename_from_data", return_value=(True, "n")
+    )
+    p = tmp_path / "raw.csv"
+    p.write_text("t\n1\n", encoding="utf-8")
+    args = ["--rename", str(p), "--name", "h", "--kind", "metric"]
+    result = runner.invoke(main, args + ["--epoch-unit", "ms"])
+    assert result.exit_code == 0
+    assert rename.call_args.kwargs["timestamp_format"] == "ms"
+    result = runner.invoke(main, args + ["--tsformat", "%d/%m/%Y"])
+    assert rename.call_args.kwargs["timestamp_format"] == "%d/%m/%Y"
+    result = runner.invoke(main, args + ["--tsformat", "x", "--epoch-unit", "s"])
+    assert result.exit_code == 2
+    assert "mutually exclusive" in result.output
+
+
+def test_rename_sorted_flags(runner, mocker, tmp_path):
+    _patch_conn(mocker)
+    rename = mocker.patch(
+        "dataportaltools.main.headtail.rename_sorted",
+        side_effect=[(True, "n"), (False, "")],
+    )
+    p = tmp_path / "raw.csv"
+    p.write_text("t\n1\n", encoding="utf-8")
+    args = ["--rename", str(p), "--name", "h", "--kind", "metric"]
+    result = runner.invoke(main, args + ["--sorted"])
+    assert result.exit_code == 0
+    assert rename.call_args.kwargs["check"] is False
+    result = runner.invoke(main, args + ["--check-sorted"])
+    assert result.exit_code == 1
+    assert rename.call_args.kwargs["check"] is True
+
+
+def test_upload_verify_content_blocks_upload(runner, mocker, tmp_path):
+    _, wc = _patch_conn(mocker)
+    verify_files = mocker.patch(
+        "dataportaltools.main.verify.verify_files",
+        return_value={"a.csv": ["count 3 in name, 2 in data"]},
+    )
+    p = tmp_path / "a.csv"
+    p.write_text("x", encoding="utf-8")
+    result = runner.invoke(
+        main,
+        [
+            "-U",
+            "7",
+            "-s",
+            str(p),
+            "--verify-content",
+            "--start",
+            "2024-01-01T00:00:00",
+            "--stop",
+            "2024-01-01T01:00:00",
+            "--count",
+            "2",
+            "--dtype",
+            "f",
+            "--flag",
+            "raw",
+            "--kind",
+            "metric",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "Name does not match contents: a.csv: count 3" in result.output
+    assert verify_files.call_args.args[1] == {
+        str(p): "a_f_2024-01-01T00:00:00Z_2024-01-01T01:00:00Z_2_raw.csv"
+    }
+    wc.connect.assert_not_called()
+    wc.upload.assert_not_called()
+
+
+def test_upload_verify_content_ok(runner, mocker, tmp_path):
+    _, wc = _patch_conn(mocker)
+    wc.upload.return_value = 0
+    mocker.patch("dataportaltools.main.verify.verify_files", return_value={})
+    for n in ("a.csv", "b.csv"):
+        (tmp_path / n).write_text("x", encoding="utf-8")
+    result = runner.invoke(
+        main, ["-U", "7", "-s", str(tmp_path / "*.csv"), "--verify-content"]
+    )
+    assert result.exit_code == 0
+    wc.upload.assert_called_once()
+
+
+def _catalog_with_upload(path, data_file):
+    with catalog.Catalog(str(path)) as db:
+        db.record_upload(
+            7,
+            str(data_file),
+            data_file.name,
+            catalog.content_hash(str(data_file)),
+            1,
+            {"start": "2024-01-01T00:00:00Z", "stop": "2024-01-01T01:00:00Z"},
+            {"fileId": 42, "status": "READY"},
+            api="https://portal.wara-ops.org/api/v1",
+        )
+
+
+def test_catalog_query(runner, mocker, tmp_path):
+    up_mock, _ = _patch_conn(mocker)
+    data_file = tmp_path / "a.csv"
+    data_file.write_text("x", encoding="utf-8")
+    other = tmp_path / "b.csv"
+    other.write_text("y", encoding="utf-8")
+    db = tmp_path / "catalog.db"
+    _catalog_with_upload(db, data_file)
+
+    args = ["--catalog", str(db), "--catalog-query"]
+    result = runner.invoke(main, args + ["-U", "7", "-s", str(data_file)])
+    assert result.exit_code == 0
+    assert "42" in result.output
+    assert "a.csv" in result.output
+    up_mock.assert_not_called()
+
+    assert runner.invoke(main, args + ["-l", "8"]).exit_code == 1
+    # Dataset 7 of another portal is a different dataset.
+    other_api = ["--api", "https://other.example/api/v1"]
+    assert runner.invoke(main, args + other_api + ["-U", "7"]).exit_code == 1
+    assert runner.invoke(main, args + ["-s", str(other)]).exit_code == 1
+    result = runner.invoke(
+        main, args + ["--name", "a.", "--start", "2024-01-01T00:30:00"]
+    )
+    assert result.exit_code == 0
+
+
+def test_catalog_query_usage_errors(runner, tmp_path):
+    result = runner.invoke(main, ["--catalog-query"], env={"PORTAL_CATALOG": ""})
+    assert result.exit_code == 2
+    assert "--catalog-query requires --catalog" in result.output
+    db = str(tmp_path / "catalog.db")
+    result = runner.invoke(main, ["--catalog", db, "--catalog-query", "-l", "x"])
+    assert result.exit_code == 2
+    assert "Invalid dataset id 'x'" in result.output
+
+
+def test_catalog_passed_to_connection(runner, mocker, tmp_path):
+    up_mock, wc = _patch_conn(mocker)
+    wc.list_files.return_value = 0
+    db = tmp_path / "catalog.db"
+    result = runner.invoke(main, ["-l", "1"], env={"PORTAL_CATALOG": str(db)})
+    assert result.exit_code == 0
+    assert up_mock.call_args.kwargs["catalog"].path == str(db)
+    assert db.exists()
+
+
+def test_batch_runs_over_one_connection(runner, mocker):
+    up_mock, instance = _patch_conn(mocker)
+    instance.datasets.return_value = []
+    instance.delete.return_value = 1
+    script = '{"op": "list"}\n{"op": "delete", "dataset": 3}\n'
+    result = runner.invoke(main, ["--batch", "-", "--dryrun"], input=script)
+    assert result.exit_code == 1
+    lines = [json.loads(line) for line in result.output.splitlines()]
+    assert [(r["op"], r["ok"]) for r in lines] == [("list", True), ("delete", False)]
+    up_mock.assert_called_once()
+    instance.connect.assert_called_once()
+    instance.datasets.assert_called_once_with(True)
+
+
+def test_operations_are_forwarded_to_the_daemon(runner, mocker, tmp_path):
+    up_mock, _ = _patch_conn(mocker)
+    (tmp_path / "info.md").write_text("info")
+    server_path = str(tmp_path / "d.sock")
+    wc = MagicMock()
+    wc.datasets.return_value = [
+        {
+            "DatasetID": 7,
+            "DatasetName": "n",
+            "CreateDate": "d",
+            "Category": "metric",
+            "Organization": "o",
+        }
+    ]
+    wc._list_files.return_value = []
+    wc.new_dataset.return_value = {"DatasetID": 8, "ContainerName": "c"}
+    wc.upload_files.return_value = (0, {"/x/a.csv": "metrics/a.csv"})
+    wc.set_file_metadata.return_value = {}
+    wc.delete.return_value = 1
+    with daemon.Server(server_path, wc) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        env = {"PORTAL_SOCKET": server_path}
+
+        result = _invoke(runner, ["-L"], env=env)
+        assert result.exit_code == 0
+        assert "DatasetID" in result.output and "metric" in result.output
+
+        result = _invoke(runner, ["-l", "7"], env=env)
+        assert result.exit_code == 0
+        assert "FileID" in result.output
+
+        info = str(tmp_path / "info.md")
+        result = _invoke(runner, ["-c", info, "-u", "me"], env=env)
+        assert result.exit_code == 0
+        assert "ContainerName" in result.output
+        wc.new_dataset.assert_called_once_with(info, "me", False)
+
+        args = ["-U", "7", "-s", "a.csv", "--kind", "metric", "--tag", "t"]
+        result = _invoke(runner, [*args, "--dryrun"], env=env)
+        assert result.exit_code == 0
+        assert "metrics/a.csv" in result.output
+        call = wc.upload_files.call_args.args
+        assert call[:2] == (7, [os.path.abspath("a.csv")])
+        assert call[4:7] == ("metric", True, ["t"])
+
+        poi = "1704067200,1704067260,text"
+        args = ["-U", "7", "--setmeta", "3", "--poi", poi]
+        result = _invoke(runner, args, env=env)
+        assert result.exit_code == 0
+        assert wc.set_file_metadata.call_args.args[:2] == (7, 3)
+
+        result = _invoke(runner, ["-d", "7"], env=env)
+        assert result.exit_code == 1
+        assert "Failed to execute: operation failed" in result.output
+
+        script = '{"op": "list"}\n'
+        result = _invoke(runner, ["--batch", "-"], input=script, env=env)
+        assert result.exit_code == 0
+        assert json.loads(result.output)["ok"] is True
+
+        server.shutdown()
+        thread.join()
+    up_mock.assert_not_called()
+
+
+def test_daemon_forwarding_paths_and_settings(runner, mocker, tmp_path, monkeypatch):
+    up_mock, _ = _patch_conn(mocker)
+    monkeypatch.chdir(tmp_path)
+    server_path = str(tmp_path / "d.sock")
+    wc = MagicMock()
+    wc.upload_files.return_value = (0, {})
+    wc.new_dataset.return_value = {}
+    settings = {"api": "https://p1/v1", "token": "", "workers": 2, "retries": 3}
+    with daemon.Server(server_path, wc, settings=settings) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        env = {"PORTAL_SOCKET": server_path, "PORTAL_URL": "https://p1/v1"}
+
+        # Batch paths are resolved where the script runs, not by the daemon.
+        script = (
+            '{"op": "upload", "dataset": 7, "src": ["a/*.csv", "/abs.csv"]}\n'
+            '# comment\n{"op": "create", "info": "info.md"}\n'
+        )
+        result = _invoke(runner, ["--batch", "-"], input=script, env=env)
+        assert result.exit_code == 0
+        assert [json.loads(line)["line"] for line in result.output.splitlines()] == [
+            1,
+            3,
+        ]
+        assert wc.upload_files.call_args.args[1] == [
+            str(tmp_path / "a" / "*.csv"),
+            "/abs.csv",
+        ]
+        assert wc.new_dataset.call_args.args[0] == str(tmp_path / "info.md")
+
+        # The daemon's settings cannot be changed per invocation.
+        result = _invoke(runner, ["-L", "--workers", "4"], env=env)
+        assert result.exit_code == 1
+        assert "--workers 4 (the daemon runs with 2)" in result.output
+        result = _invoke(runner, ["--batch", "-", "-t", "tok"], input=script, env=env)
+        assert result.exit_code == 1
+        assert f"--token {tmp_path / 'tok'}" in result.output
+        result = _invoke(runner, ["-L", "--api", "https://p2/v1"], env=env)
+        assert result.exit_code == 1
+        result = _invoke(runner, ["-L", "--retries", "5"], env=env)
+        assert result.exit_code == 1
+        assert "--retries 5 (the daemon runs with 3)" in result.output
+        # Outputs of the calling process cannot come from the daemon.
+        trace = str(tmp_path / "trace.json")
+        result = _invoke(runner, ["-L", "--trace-out", trace], env=env)
+        assert result.exit_code == 2
+        assert "--trace-out cannot be used while a daemon listens" in result.output
+        result = _invoke(runner, ["-L", "--profile", "mem"], env=env)
+        assert result.exit_code == 2
+        assert "--profile cannot be used" in result.output
+        # Settings matching the daemon's, or not given, are fine.
+        wc.datasets.return_value = []
+        assert _invoke(runner, ["-L", "--workers", "2"], env=env).exit_code == 0
+        assert wc.upload_files.call_count == 1
+
+        server.shutdown()
+        thread.join()
+    up_mock.assert_not_called()
+
+
+def test_no_daemon_connects_as_usual(runner, mocker, tmp_path):
+    _, instance = _patch_conn(mocker)
+    instance.list_datasets.return_value = 0
+    env = {"PORTAL_SOCKET": str(tmp_path / "none.sock")}
+    result = _invoke(runner, ["-L"], env=env)
+    assert result.exit_code == 0
+    instance.list_datasets.assert_called_once()
+    # Nothing to forward: the local checks and messages apply.
+    result = _invoke(runner, ["--setmeta", "3"], env=env)
+    assert result.exit_code == 2
+
+
+def test_daemon_forwarding_failure(runner, mocker, tmp_path):
+    mocker.patch.object(daemon, "call", side_effect=daemon.DaemonError("gone"))
+    result = _invoke(runner, ["-L", "--socket", str(tmp_path / "d.sock")])
+    assert result.exit_code == 1
+    assert "Failed to execute: gone" in result.output
+
+
+def test_daemon_serves_on_socket(runner, mocker, tmp_path):
+    _, instance = _patch_conn(mocker)
+    serve = mocker.patch.object(daemon, "serve")
+    path = str(tmp_path / "d.sock")
+    result = _invoke(runner, ["--daemon", "--socket", path, "--workers", "4"])
+    assert result.exit_code == 0
+    serve.assert_called_once_with(
+        instance,
+        path,
+        False,
+        {
+            "api": "https://portal.wara-ops.org/api/v1",
+            "token": "",
+            "catalog": None,
+            "workers": 4,
+            "max-workers": 16,
+            "compress": None,
+            "retries": 3,
+            "small-lanes": 0,
+            "health-ttl": 300.0,
+            "lazy-connect": False,
+        },
+    )
+
+    serve.side_effect = daemon.DaemonError("already running")
+    result = _invoke(runner, ["--daemon", "--socket", path])
+    assert result.exit_code == 1
+    assert "already running" in result.output
+
+    result = _invoke(runner, ["--daemon"], env={"PORTAL_SOCKET": ""})
+    assert result.exit_code == 2
+
+
+def test_health_ttl_and_lazy_connect_options(runner, mocker):
+    up_mock, instance = _patch_conn(mocker)
+    instance.list_datasets.return_value = 0
+    result = runner.invoke(main, ["-L"])
+    assert up_mock.call_args.kwargs["health_ttl"] == 300.0
+    instance.connect.assert_called_once_with(lazy=False)
+
+    env = {"PORTAL_HEALTH_TTL": "0", "PORTAL_LAZY_CONNECT": "1"}
+    result = _invoke(runner, ["-L"], env=env)
+    assert result.exit_code == 0
+    assert up_mock.call_args.kwargs["health_ttl"] == 0.0
+    instance.connect.assert_called_with(lazy=True)
+
+
+def test_workers_and_retries_options(runner, mocker):
+    up_mock, instance = _patch_conn(mocker)
+    instance.list_datasets.return_value = 0
+    result = runner.invoke(main, ["-L"])
+    assert result.exit_code == 0
+    assert up_mock.call_args.kwargs["workers"] == 1
+    assert up_mock.call_args.kwargs["max_workers"] == 4
+    assert up_mock.call_args.kwargs["retries"] == 3
+
+    assert up_mock.call_args.kwargs["small_lanes"] == 0
+    assert up_mock.call_args.kwargs["compress"] is None
+
+    args = ["-L", "--retries", "0", "--small-lanes", "2", "--compress", "zstd"]
+    result = _invoke(runner, args, env={"PORTAL_WORKERS": "8"})
+    assert result.exit_code == 0
+    assert up_mock.call_args.kwargs["workers"] == 8
+    assert up_mock.call_args.kwargs["max_workers"] == 32
+    assert up_mock.call_args.kwargs["retries"] == 0
+    assert up_mock.call_args.kwargs["small_lanes"] == 2
+    assert up_mock.call_args.kwargs["compress"] == "zstd"
+
+    result = _invoke(runner, ["-L", "--workers", "2", "--max-workers", "6"])
+    assert result.exit_code == 0
+    assert up_mock.call_args.kwargs["max_workers"] == 6
+    result = _invoke(runner, ["-L", "--workers", "8", "--max-workers", "4"])
+    assert result.exit_code == 2
+    assert "--max-workers must be at least --workers" in result.output
+
+    result = _invoke(runner, ["-L", "--workers", "0"])
+    assert result.exit_code == 2
+
+
+def test_lazy_connect_unreachable_api(runner, mocker, monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    mocker.patch(
+        "dataportaltools.main.up.requests.Session.request",
+        side_effect=up.requests.exceptions.ConnectionError("refused"),
+    )
+    args = ["-L", "--lazy-connect", "-a", "http://127.0.0.1:9/v1"]
+    result = runner.invoke(main, args, env={"PORTAL_TOKEN": "tok"})
+    assert result.exit_code == 1
+    assert "Failed to connect: Failed to reach api, refused" in result.output
+
+    result = _invoke(runner, ["-l", "x", "--lazy-connect"], env={"PORTAL_TOKEN": "t"})
+    assert result.exit_code == 1
+    assert "Failed to execute: invalid literal" in result.output
+
+
+def test_trace_out(runner, mocker, tmp_path):
+    up_mock, instance = _patch_conn(mocker)
+    instance.list_datasets.return_value = 0
+    path = tmp_path / "trace.prom"
+    result = runner.invoke(main, ["-L", "--trace-out", str(path)])
+    assert result.exit_code == 0
+    assert isinstance(up_mock.call_args.kwargs["tracer"], tracing.Tracer)
+    assert path.read_text() == tracing.Tracer().openmetrics()
+
+
+def test_profile(runner, mocker, tmp_path):
+    _, instance = _patch_conn(mocker)
+    instance.list_datasets.return_value = 0
+    import pandas as pd
+
+    p = tmp_path / "raw.csv"
+    pd.DataFrame({"timestamp": ["2022-12-26T00:00:00Z"], "v": [1.0]}).to_csv(
+        p, index=False
+    )
+    rename = ["--rename", str(p), "--name", "h", "--kind", "metric", "--dtype", "x"]
+    out = tmp_path / "rename.tracemalloc"
+    args = rename + ["--apply", "--profile", "mem", "--profile-out", str(out)]
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0
+    assert list(tmp_path.glob("h_x_*.parquet.zst"))
+    assert f"memory profile written to {out}" in result.stderr
+    assert "pyarrow memory pool peak" in result.stderr
+    assert out.exists()
+
+    out = tmp_path / "list.pstats"
+    args = ["-L", "--profile", "cpu", "--profile-out", str(out), "--profile-top", "3"]
+    result = _invoke(runner, args)
+    assert result.exit_code == 0
+    assert f"cpu profile written to {out}" in result.stderr
+    assert out.exists()
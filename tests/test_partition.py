@@ -0,0 +1,271 @@
+"""Tests for dataportaltools.local_utils.partition."""
+
+import os
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from dataportaltools.local_utils import partition, utils
+
+
+def _times(n, start="2024-01-01T00:00:00Z", step="20min"):
+    return pd.date_range(start, periods=n, freq=step).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _check_outputs(paths, total):
+    """Every output's name must match its contents exactly."""
+    seen = 0
+    for path in paths:
+        kind, meta = utils.parse_filename(os.path.basename(path))
+        assert kind == "metric"
+        frame = pd.read_parquet(path)
+        times = pd.to_datetime(frame["timestamp"], utc=True)
+        assert int(meta["count"]) == len(frame)
+        assert (
+            utils.normalize_timestamp(meta["start"])[1]
+            == (utils.normalize_timestamp(times.min().isoformat())[1])
+        )
+        assert (
+            utils.normalize_timestamp(meta["stop"])[1]
+            == (utils.normalize_timestamp(times.max().isoformat())[1])
+        )
+        seen += len(frame)
+    assert seen == total
+
+
+def test_split_csv_hourly(tmp_path):
+    p = tmp_path / "dump.csv"
+    pd.DataFrame({"timestamp": _times(9), "v": range(9)}).to_csv(p, index=False)
+    ok, paths = partition.split_file(str(p), name="hist", dtype="uint")
+    assert ok
+    assert [os.path.basename(x) for x in paths] == [
+        "hist_uint_2024-01-01T00:00:00Z_2024-01-01T00:40:00Z_3_raw.parquet.zst",
+        "hist_uint_2024-01-01T01:00:00Z_2024-01-01T01:40:00Z_3_raw.parquet.zst",
+        "hist_uint_2024-01-01T02:00:00Z_2024-01-01T02:40:00Z_3_raw.parquet.zst",
+    ]
+    _check_outputs(paths, 9)
+    assert not list(tmp_path.glob(".*.part"))
+
+
+def test_split_unsorted_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(partition, "_CHUNK_ROWS", 4)
+    times = list(_times(12, step="50min"))
+    times = times[::2] + times[1::2]  # out of order, buckets revisited
+    p = tmp_path / "dump.parquet"
+    pd.DataFrame({"timestamp": times, "v": range(12)}).to_parquet(p)
+    out = tmp_path / "out"
+    out.mkdir()
+    ok, paths = partition.split_file(
+        str(p), name="h", dtype="float", out_dir=str(out), workers=2
+    )
+    assert ok
+    assert all(os.path.dirname(x) == str(out) for x in paths)
+    _check_outputs(paths, 12)
+
+
+def test_split_daily_pickle_drops_bad_timestamps(tmp_path, caplog):
+    p = tmp_path / "dump.pkl"
+    frame = pd.DataFrame(
+        {"timestamp": list(_times(4, step="13h")) + ["garbage"], "v": range(5)}
+    )
+    frame.to_pickle(p)
+    ok, paths = partition.split_file(str(p), name="h", dtype="uint", window="day")
+    assert ok
+    assert len(paths) == 2
+    _check_outputs(paths, 4)
+    assert "dropped 1 row" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"name": "bad_name"}, {"name": "h", "window": "fortnight"}]
+)
+def test_split_rejects_bad_arguments(tmp_path, kwargs):
+    p = tmp_path / "dump.csv"
+    pd.DataFrame({"timestamp": _times(2)}).to_csv(p, index=False)
+    assert partition.split_file(str(p), dtype="uint", **kwargs) == (False, [])
+
+
+def test_split_no_valid_rows(tmp_path):
+    p = tmp_path / "dump.csv"
+    pd.DataFrame({"timestamp": ["x", "y"]}).to_csv(p, index=False)
+    assert partition.split_file(str(p), name="h", dtype="uint") == (False, [])
+
+
+def test_split_unnamed_bucket_is_removed(tmp_path):
+    p = tmp_path / "dump.csv"
+    pd.DataFrame({"timestamp": _times(2)}).to_csv(p, index=False)
+    # An empty dtype makes create_filename refuse the metric name.
+    ok, paths = partition.split_file(str(p), name="h", dtype="")
+    assert not ok and paths == []
+    assert not list(tmp_path.glob(".*.part"))
+
+
+@pytest.mark.parametrize(
+    ("late", "arrow_type"), [("1.5", pa.float64()), ("oops", pa.string())]
+)
+def test_split_widens_later_column_types(tmp_path, monkeypatch, late, arrow_type):
+    monkeypatch.setattr(partition, "_CHUNK_ROWS", 5)
+    p = tmp_path / "dump.csv"
+    # Seconds apart: every row lands in the one hourly bucket.
+    values = [str(i) for i in range(8)] + [late, "9"]
+    pd.DataFrame({"timestamp": _times(10, step="1s"), "v": values}).to_csv(
+        p, index=False
+    )
+    ok, out_paths = partition.split_file(str(p), name="h", dtype="float")
+    assert ok and len(out_paths) == 1
+    table = pq.read_table(out_paths[0])
+    assert table.schema.field("v").type == arrow_type
+    assert [str(v).removesuffix(".0") for v in table["v"].to_pylist()] == values
+    assert not list(tmp_path.glob(".*"))
+
+
+def test_split_cleans_up_on_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(partition, "_CHUNK_ROWS", 2)
+    p = tmp_path / "dump.csv"
+    pd.DataFrame({"timestamp": _times(4), "v": ["1", "2", "x", "y"]}).to_csv(
+        p, index=False
+    )
+    write = partition._Bucket.write
+    calls = []
+
+    def fail_second(bucket, table, times):
+        calls.append(1)
+        if len(calls) > 1:
+            raise OSError("disk full")
+        write(bucket, table, times)
+
+    monkeypatch.setattr(partition._Bucket, "write", fail_second)
+    with pytest.raises(OSError):
+        partition.split_file(str(p), name="h", dtype="uint")
+    assert not list(tmp_path.glob(".*.part*"))
+
+
+def _minute_file(directory, minute, rows=3, name="cpu", flag="raw"):
+    """Write one small convention file covering ``rows`` seconds of a minute."""
+    times = _times(rows, start=f"2024-01-01T00:{minute:02d}:00Z", step="10s")
+    frame = pd.DataFrame({"timestamp": times, "v": range(rows)})
+    fname = f"{name}_float_{times[0]}_{times[-1]}_{rows}_{flag}.csv"
+    path = directory / fname
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_parse_size():
+    assert partition.parse_size("1048576") == 1048576
+    assert partition.parse_size("64MB") == 64 * 10**6
+    assert partition.parse_size("1.5g") == 1_500_000_000
+    assert partition.parse_size("2 kb") == 2000
+    with pytest.raises(ValueError):
+        partition.parse_size("lots")
+
+
+def test_plan_merges_groups_and_target(tmp_path):
+    paths = [_minute_file(tmp_path, m) for m in range(6)]
+    other = [_minute_file(tmp_path, m, flag="clean") for m in range(2)]
+    size = os.path.getsize(paths[0])
+    runs = partition.plan_merges(list(reversed(paths + other)), 3 * size)
+    assert runs == [other, paths[:3], paths[3:]]
+
+
+def test_plan_merges_skips_singles_overlap_and_non_metric(tmp_path):
+    a = _minute_file(tmp_path, 0)
+    b = _minute_file(tmp_path, 0, rows=4)  # overlaps a
+    c = _minute_file(tmp_path, 1)
+    extra = tmp_path / "notes.txt"
+    extra.write_text("x")
+    runs = partition.plan_merges([a, b, c, str(extra)], 10**9)
+    assert runs == [[b, c]]
+    assert partition.plan_merges([a], 10**9) == []
+
+
+def test_plan_merges_ends_runs_at_gaps(tmp_path):
+    first = [_minute_file(tmp_path, m) for m in (0, 1, 2)]
+    second = [_minute_file(tmp_path, m) for m in (30, 31)]
+    runs = partition.plan_merges(first + second, 10**9)
+    assert runs == [first, second]
+    wide = partition.plan_merges(first + second, 10**9, timedelta(hours=1))
+    assert wide == [first + second]
+
+
+def test_parse_duration():
+    assert partition.parse_duration("90") == timedelta(seconds=90)
+    assert partition.parse_duration("5min") == timedelta(minutes=5)
+    assert partition.parse_duration("1.5 H") == timedelta(minutes=90)
+    assert partition.parse_duration("2d") == timedelta(days=2)
+    with pytest.raises(ValueError):
+        partition.parse_duration("soon")
+
+
+def test_merge_files(tmp_path):
+    paths = [_minute_file(tmp_path, m) for m in range(4)]
+    ok, merged = partition.merge_files(paths, 10**9, remove_sources=True, workers=2)
+    assert ok
+    [(out_path, sources)] = merged.items()
+    assert sources == paths
+    assert os.path.basename(out_path) == (
+        "cpu_float_2024-01-01T00:00:00Z_2024-01-01T00:03:20Z_12_raw.parquet.zst"
+    )
+    _check_outputs([out_path], 12)
+    assert not any(os.path.exists(p) for p in paths)
+
+
+def test_merge_files_keeps_sources_on_failure(tmp_path):
+    paths = [_minute_file(tmp_path, m) for m in range(2)]
+    ok, merged = partition.merge_files(
+        paths, 10**9, timestamp_col="missing", remove_sources=True
+    )
+    assert not ok
+    assert merged == {}
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_merge_files_keeps_rows_without_valid_timestamps(tmp_path):
+    paths = [_minute_file(tmp_path, m) for m in range(2)]
+    frame = pd.read_csv(paths[0])
+    frame.loc[1, "timestamp"] = "bad"
+    frame.to_csv(paths[0], index=False)
+    ok, merged = partition.merge_files(paths, 10**9, remove_sources=True)
+    assert ok
+    [out_path] = merged
+    assert os.path.basename(out_path).endswith("_6_raw.parquet.zst")
+    out = pd.read_parquet(out_path)
+    assert len(out) == 6 and out["timestamp"].iloc[-1] == "bad"
+    assert not any(os.path.exists(p) for p in paths)
+
+
+def test_merge_files_keeps_sources_on_row_mismatch(tmp_path, monkeypatch):
+    paths = [_minute_file(tmp_path, m) for m in range(2)]
+    merge_run = partition._merge_run
+
+    def short(*args):
+        out_path, rows = merge_run(*args)
+        return out_path, rows + 1
+
+    monkeypatch.setattr(partition, "_merge_run", short)
+    ok, merged = partition.merge_files(paths, 10**9, remove_sources=True)
+    assert not ok and len(merged) == 1
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_merge_files_no_valid_timestamps(tmp_path):
+    paths = [_minute_file(tmp_path, m) for m in range(2)]
+    for p in paths:
+        pd.DataFrame({"timestamp": ["bad"], "v": [1]}).to_csv(p, index=False)
+    ok, merged = partition.merge_files(paths, 10**9)
+    assert not ok and merged == {}
+
+
+def test_merge_files_write_error_cleans_up(tmp_path, monkeypatch):
+    paths = [_minute_file(tmp_path, m) for m in range(2)]
+
+    def _boom(self, frame, times):
+        open(self.tmp_path, "wb").close()
+        raise OSError("disk full")
+
+    monkeypatch.setattr(partition._Bucket, "write", _boom)
+    ok, merged = partition.merge_files(paths, 10**9)
+    assert not ok and merged == {}
+    assert not list(tmp_path.glob(".*.part"))
@@ -0,0 +1,69 @@
+"""Tests for dataportaltools.local_utils.profiling."""
+
+import io
+import pstats
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dataportaltools.local_utils import profiling
+
+
+def _busy():
+    return sum(i * i for i in range(20_000))
+
+
+def test_cpu(tmp_path):
+    path = tmp_path / "run.pstats"
+    out = io.StringIO()
+    stop = profiling.start("cpu", str(path), top=5, stream=out)
+    _busy()
+    stop()
+    assert f"cpu profile written to {path}" in out.getvalue()
+    assert "cumulative" in out.getvalue()
+    functions = {func for _, _, func in pstats.Stats(str(path)).stats}
+    assert "_busy" in functions
+
+
+def test_cpu_profiles_worker_threads(tmp_path):
+    path = tmp_path / "run.pstats"
+    stop = profiling.start("cpu", str(path), stream=io.StringIO())
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda _: _busy(), range(2)))
+    stop()
+    stats = pstats.Stats(str(path)).stats
+    calls = [value[1] for (_, _, func), value in stats.items() if func == "_busy"]
+    assert calls == [2]
+
+
+def test_mem(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_PEAK_INTERVAL", 0.01)
+    path = tmp_path / "run.tracemalloc"
+    out = io.StringIO()
+    stop = profiling.start("mem", str(path), top=3, stream=out)
+    blocks = [bytearray(1024 * 1024) for _ in range(8)]
+    time.sleep(0.5)
+    del blocks
+    stop()
+    assert not tracemalloc.is_tracing()
+    lines = out.getvalue().splitlines()
+    assert lines[0] == f"memory profile written to {path}"
+    assert lines[1].startswith("traced memory: peak ")
+    assert float(lines[1].split()[3]) >= 8
+    assert any(line.startswith("max RSS: ") for line in lines)
+    sites = lines[lines.index("top 3 allocation sites near the peak:") + 1 :]
+    # The snapshot is taken near the peak, while the blocks were allocated.
+    assert "test_profiling.py" in sites[0] and len(sites) <= 3
+    snapshot = tracemalloc.Snapshot.load(str(path))
+    assert sum(s.size for s in snapshot.statistics("filename")) >= 8 * 1024 * 1024
+
+
+def test_defaults(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    profiling.start("cpu")()
+    assert (tmp_path / profiling.DEFAULT_FILES["cpu"]).exists()
+    assert "cpu profile written" in capsys.readouterr().err
+    with pytest.raises(ValueError, match="unknown profile mode"):
+        profiling.start("io")
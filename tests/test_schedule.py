@@ -0,0 +1,43 @@
+"""Tests for dataportaltools.local_utils.schedule."""
+
+from dataportaltools.local_utils import schedule
+
+
+def _files(tmp_path, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(b"x" * size)
+        paths.append(str(path))
+    return paths
+
+
+def test_file_size(tmp_path):
+    (path,) = _files(tmp_path, [5])
+    assert schedule.file_size(path) == 5
+    assert schedule.file_size(str(tmp_path / "missing")) == 0
+
+
+def test_lanes():
+    assert schedule.lanes(4, 0) == [False] * 4
+    assert schedule.lanes(4, 1) == [False, False, False, True]
+    assert schedule.lanes(2, 5) == [False, True]
+    assert schedule.lanes(1, 1) == [False]
+
+
+def test_largest_first(tmp_path):
+    a, b, c, d = _files(tmp_path, [10, 30, 20, 30])
+    queue = schedule.SizeQueue([a, b, c, d])
+    assert len(queue) == 4
+    assert [queue.take() for _ in range(5)] == [b, d, c, a, None]
+
+
+def test_small_lanes_take_the_smallest(tmp_path):
+    a, b, c = _files(tmp_path, [10, 300, 20])
+    queue = schedule.SizeQueue([a, b, c], small_size=100)
+    assert queue.take(small=True) == a
+    assert queue.take(small=True) == c
+    assert queue.take(small=True) is None  # b is not small
+    assert len(queue) == 1
+    queue.clear()
+    assert queue.take() is None
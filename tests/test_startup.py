@@ -0,0 +1,62 @@
+"""Startup cost of the dataportaltools CLI (see benchmarks/bench_startup.py)."""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+from dataportaltools import main as main_module
+from dataportaltools.local_utils import upload
+
+# Cumulative import time of dataportaltools.main, best of a few runs. Loading
+# requests and the other command dependencies eagerly takes it well past this.
+_IMPORT_BUDGET_US = 120_000
+
+# Imported by commands that need them only.
+_COMMAND_DEPENDENCIES = (
+    "multiprocessing",
+    "pandas",
+    "pyarrow",
+    "requests",
+    "sqlite3",
+    "xxhash",
+)
+
+
+def _python(*args):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def test_main_import_does_not_load_command_dependencies():
+    code = (
+        "import sys, dataportaltools.main; "
+        f"print([m for m in {_COMMAND_DEPENDENCIES!r} if m in sys.modules])"
+    )
+    assert _python("-c", code).stdout.strip() == "[]"
+
+
+def test_main_import_time_budget():
+    best = None
+    for _ in range(3):
+        stderr = _python("-X", "importtime", "-c", "import dataportaltools.main").stderr
+        m = re.search(r"\|\s*(\d+) \| dataportaltools\.main$", stderr, re.MULTILINE)
+        best = int(m.group(1)) if best is None else min(best, int(m.group(1)))
+    assert best <= _IMPORT_BUDGET_US, f"import took {best} us"
+
+
+def test_lazy_modules_resolve_as_attributes():
+    assert main_module.up is upload
+    with pytest.raises(AttributeError):
+        main_module.not_a_module
+
+
+def test_daemon_client_does_not_load_the_http_client():
+    code = (
+        "import sys, dataportaltools.main; "
+        "from dataportaltools.local_utils import daemon; "
+        f"print([m for m in {_COMMAND_DEPENDENCIES!r} if m in sys.modules])"
+    )
+    assert _python("-c", code).stdout.strip() == "[]"
@@ -0,0 +1,101 @@
+"""Tests for dataportaltools.local_utils.timestamps."""
+
+import pandas as pd
+import pytest
+
+from dataportaltools.local_utils import timestamps
+
+ISO = ["2024-01-01T00:00:00Z", "2024-01-01T00:01:00Z", "2024-01-01T00:02:00Z"]
+
+
+@pytest.mark.parametrize(
+    "unit,scale", [("s", 1), ("ms", 10**3), ("us", 10**6), ("ns", 10**9)]
+)
+def test_score_epoch_units(unit, scale):
+    values = pd.Series([1_704_067_200 * scale, 1_704_067_260 * scale])
+    assert timestamps.score_column(values) == (1.0, unit)
+    assert timestamps.score_column(values.astype(str)) == (1.0, unit)
+
+
+def test_score_iso_partial_and_others():
+    assert timestamps.score_column(pd.Series(ISO + ["bad"])) == (0.75, "ISO8601")
+    assert timestamps.score_column(pd.Series(["a", "b"])) == (0.0, None)
+    assert timestamps.score_column(pd.Series([1, 2])) == (0.0, None)
+    assert timestamps.score_column(pd.Series([True])) == (0.0, None)
+    assert timestamps.score_column(pd.Series([None, None])) == (0.0, None)
+    assert timestamps.score_column(pd.to_datetime(pd.Series(ISO))) == (1.0, None)
+
+
+def test_score_samples_large_columns():
+    values = pd.Series(["x"] * 10_000 + ISO * 10_000)
+    score, fmt = timestamps.score_column(values, sample_size=100)
+    assert fmt == "ISO8601"
+    assert 0.6 < score < 0.9
+
+
+def test_detect_prefers_content_over_name():
+    frame = pd.DataFrame(
+        {
+            "hostname_ts_bucket": ["node-1", "node-2", "node-3"],
+            "value": [1.0, 2.0, 3.0],
+            "when": [1_704_067_200_000, 1_704_067_260_000, 1_704_067_320_000],
+        }
+    )
+    assert timestamps.detect(frame) == ("when", "ms")
+
+
+def test_detect_ties_go_to_time_like_name_then_leftmost():
+    frame = pd.DataFrame({"a": ISO, "b": ISO, "time": ISO})
+    assert timestamps.detect(frame) == ("time", "ISO8601")
+    assert timestamps.detect(frame.drop(columns="time")) == ("a", "ISO8601")
+
+
+def test_detect_fallback_and_explicit_column():
+    frame = pd.DataFrame({"alpha": ["x"], "date_str": ["y"]})
+    assert timestamps.detect(frame) == ("date_str", None)
+    assert timestamps.detect(frame, "alpha") == ("alpha", None)
+    with pytest.raises(ValueError, match="not found"):
+        timestamps.detect(frame, "missing")
+    with pytest.raises(ValueError, match="no columns"):
+        timestamps.detect(pd.DataFrame())
+
+
+def test_parse_formats():
+    epoch = timestamps.parse(pd.Series(["1704067200", "junk"]), "s")
+    assert epoch.iloc[0] == pd.Timestamp("2024-01-01T00:00:00Z")
+    assert pd.isna(epoch.iloc[1])
+    iso = timestamps.parse(pd.Series(ISO + ["bad"]), "ISO8601")
+    assert iso.iloc[2] == pd.Timestamp("2024-01-01T00:02:00Z")
+    assert pd.isna(iso.iloc[3])
+
+
+def test_score_infers_strftime_format_day_first():
+    values = pd.Series(["01/02/2024 10:00:00", "13/02/2024 10:00:00"])
+    assert timestamps.score_column(values) == (1.0, "%d/%m/%Y %H:%M:%S")
+    values = pd.Series(["01/02/2024 10:00:00", "01/13/2024 10:00:00"])
+    assert timestamps.score_column(values) == (1.0, "%m/%d/%Y %H:%M:%S")
+
+
+def test_detect_explicit_format_overrides_sample():
+    frame = pd.DataFrame({"t": [1_704_067_200_000], "v": [1]})
+    assert timestamps.detect(frame, "t", timestamp_format="s") == ("t", "s")
+    assert timestamps.detect(frame, timestamp_format="us") == ("t", "us")
+
+
+def test_parse_int64_epoch_is_a_view():
+    values = pd.Series([1_704_067_200_000, 1_704_067_260_000], index=[5, 6])
+    parsed = timestamps.parse(values, "ms")
+    assert str(parsed.dtype) == "datetime64[ms, UTC]"
+    assert list(parsed.index) == [5, 6]
+    assert parsed.iloc[1] == pd.Timestamp("2024-01-01T00:01:00Z")
+    floats = timestamps.parse(pd.Series([1_704_067_200.5, None]), "s")
+    assert floats.iloc[0] == pd.Timestamp("2024-01-01T00:00:00.5Z")
+    assert pd.isna(floats.iloc[1])
+
+
+def test_parse_strftime_format():
+    parsed = timestamps.parse(
+        pd.Series(["13/02/2024 10:00:00", "x"]), "%d/%m/%Y %H:%M:%S"
+    )
+    assert parsed.iloc[0] == pd.Timestamp("2024-02-13T10:00:00Z")
+    assert pd.isna(parsed.iloc[1])
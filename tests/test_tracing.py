@@ -0,0 +1,169 @@
+"""Tests for dataportaltools.local_utils.tracing."""
+
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from dataportaltools.local_utils import tracing
+from dataportaltools.local_utils.upload import WCIBConnection
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply({"Datasets": [], "data": []})
+
+    def do_POST(self):
+        size = int(self.headers["Content-Length"])
+        self._reply({"received": len(self.rfile.read(size))})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_are_timed(api):
+    tracer = tracing.Tracer()
+    wc = WCIBConnection(api, token="tok", tracer=tracer)
+    wc.connect()
+    assert wc.datasets(False) == []
+    wc._list_files(17, False, False)
+    resp = wc._s.post(f"{api}/dataset/17/files", data=b"x" * 100_000)
+    assert resp.json() == {"received": 100_000}
+
+    test, listing, files, upload = tracer.records
+    assert [r["route"] for r in tracer.records] == [
+        "/v1/test",
+        "/v1/dataset",
+        "/v1/dataset/{id}/files",
+        "/v1/dataset/{id}/files",
+    ]
+    assert test["reused"] is False and test["tcp_s"] > 0
+    assert listing["reused"] is True and listing["tcp_s"] == 0
+    assert listing["status"] == 200 and listing["error"] is None
+    for r in tracer.records:
+        assert r["tls_s"] == 0
+        assert 0 <= r["send_s"] <= r["ttfb_s"] <= r["total_s"]
+        assert r["wait_s"] > 0 and r["receive_s"] >= 0
+        assert r["received_bytes"] > 0
+    assert upload["method"] == "POST" and upload["sent_bytes"] == 100_000
+    assert upload["send_MBps"] > 0
+    assert files["sent_bytes"] == 0 and files["send_MBps"] is None
+    assert all(r["concurrency"] == 1 for r in tracer.records)
+    assert tracer.aggregates()[0]["concurrency_max"] == 1
+
+
+def test_failed_requests_are_recorded():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    tracer = tracing.Tracer()
+    session = requests.Session()
+    tracer.install(session)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get(f"http://127.0.0.1:{port}/v1/test", timeout=5)
+    (record,) = tracer.records
+    assert record["error"] == "ConnectionError"
+    assert record["status"] is None and record["ttfb_s"] is None
+
+
+def test_streamed_responses_are_not_read(api):
+    tracer = tracing.Tracer()
+    session = requests.Session()
+    tracer.install(session)
+    session.get(f"{api}/dataset", stream=True).close()
+    assert tracer.records[0]["receive_s"] is None
+
+
+def _record(method, route, total, ttfb=0.1, sent=0, send=None, error=None):
+    return {
+        "method": method,
+        "route": route,
+        "total_s": total,
+        "ttfb_s": ttfb,
+        "send_s": send,
+        "sent_bytes": sent,
+        "received_bytes": 10,
+        "reused": True,
+        "error": error,
+    }
+
+
+def test_aggregates():
+    tracer = tracing.Tracer()
+    tracer.records = [_record("GET", "/v1/dataset", t / 10) for t in range(1, 11)]
+    tracer.records.append(
+        _record("POST", "/v1/x", 2.0, ttfb=None, sent=4_000_000, send=1.0)
+    )
+    get, post, everything = tracer.aggregates()
+    assert get["requests"] == 10 and get["errors"] == 0
+    assert get["p50_s"] == pytest.approx(0.55)
+    assert get["p95_s"] == pytest.approx(0.955)
+    assert get["p99_s"] == pytest.approx(0.991)
+    assert get["ttfb_p99_s"] == pytest.approx(0.1)
+    assert get["send_MBps"] is None
+    assert post["ttfb_p50_s"] is None
+    assert post["send_MBps"] == 4.0
+    assert post["MBps"] == pytest.approx(2.000005)
+    assert (everything["method"], everything["requests"]) == ("*", 11)
+    assert tracing.Tracer().aggregates() == []
+
+
+def test_write_jsonl_and_openmetrics(tmp_path):
+    tracer = tracing.Tracer()
+    tracer.records = [
+        _record("GET", "/v1/dataset", 0.2),
+        _record("POST", "/v1/x", 2.0, sent=4_000_000, send=1.0, error="Timeout"),
+    ]
+    path = tmp_path / "trace.jsonl"
+    tracer.write(str(path))
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["type"] for line in lines] == ["request"] * 2 + ["aggregate"] * 3
+
+    path = tmp_path / "trace.prom"
+    tracer.write(str(path))
+    text = path.read_text()
+    assert text.endswith("# EOF\n")
+    assert "# TYPE dataportal_request_duration_seconds summary" in text
+    assert (
+        'dataportal_request_duration_seconds{method="GET",route="/v1/dataset",'
+        'quantile="0.5"} 0.2'
+    ) in text
+    count = 'dataportal_request_duration_seconds_count{method="POST",route="/v1/x"} 1'
+    assert count in text
+    assert 'dataportal_request_errors_total{method="POST",route="/v1/x"} 1' in text
+    assert 'dataportal_sent_bytes_total{method="POST",route="/v1/x"} 4000000' in text
+    assert (
+        'dataportal_send_throughput_bytes_per_second{method="POST",route="/v1/x"} '
+        "4000000"
+    ) in text
+    assert 'route="*"' not in text
+    assert "dataportal_concurrency_max" not in text
+
+    tracer.records[1]["concurrency"] = 4
+    tracer.write(str(path))
+    text = path.read_text()
+    assert "# TYPE dataportal_concurrency_max gauge" in text
+    assert 'dataportal_concurrency_max{method="POST",route="/v1/x"} 4' in text
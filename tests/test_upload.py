@@ -1,12 +1,15 @@
 """Tests for dataportaltools.local_utils.upload.WCIBConnection."""
 
+import io
+import os
+import threading
 from unittest.mock import MagicMock
 
 import pytest
 import requests
 import xxhash
 
-from dataportaltools.local_utils import upload
+from dataportaltools.local_utils import catalog, upload
 from dataportaltools.local_utils.upload import WCIBConnection, WCIBError
 
 
@@ -61,6 +64,75 @@ def test_connect_default_session(mocker):
     assert wc._s is sess
 
 
+def test_connect_unreachable_raises():
+    wc = WCIBConnection("http://x/v1", token="tok")
+    sess = MagicMock()
+    sess.get.side_effect = requests.exceptions.ConnectionError("refused")
+    with pytest.raises(upload.WCIBConnectError, match="refused"):
+        wc.connect(session=sess)
+
+
+def test_connect_records_and_reuses_health(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    wc = WCIBConnection("http://x/v1", token="tok", health_ttl=300)
+    sess = MagicMock()
+    sess.get.return_value.status_code = 200
+    wc.connect(session=sess)
+    wc.connect(session=sess)
+    # The second connect trusted the recorded state and left the check to
+    # the first request.
+    sess.get.assert_called_once()
+    wc.datasets(False)
+    assert sess.get.call_count == 2
+    # Without a TTL nothing is trusted.
+    WCIBConnection("http://x/v1", token="tok").connect(session=sess)
+    assert sess.get.call_count == 3
+
+
+def test_lazy_connect_first_request_checks(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    upload.health.record("http://x/v1")
+    wc = WCIBConnection("http://x/v1", token="tok", health_ttl=300)
+    sess = MagicMock()
+    sess.get.side_effect = requests.exceptions.ConnectionError("refused")
+    wc.connect(session=sess, lazy=True)
+    sess.get.assert_not_called()
+    with pytest.raises(upload.WCIBConnectError, match="refused"):
+        wc.datasets(False)
+    assert not upload.health.is_healthy("http://x/v1")
+
+    # A server error does not count as a check; any other answer does.
+    sess.get.side_effect = None
+    sess.get.return_value.status_code = 503
+    wc.datasets(False)
+    assert not upload.health.is_healthy("http://x/v1")
+    sess.get.return_value.status_code = 200
+    wc.datasets(False)
+    assert upload.health.is_healthy("http://x/v1")
+    sess.get.side_effect = requests.exceptions.ConnectionError("gone")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        wc.datasets(False)
+
+
+def test_upload_stops_when_unreachable(tmp_path, mocker):
+    wc = WCIBConnection("http://x/v1", token="tok")
+    sess = MagicMock()
+    sess.post.side_effect = requests.exceptions.ConnectionError("refused")
+    wc.connect(session=sess, lazy=True)
+    files = []
+    for name in ("a.bin", "b.bin"):
+        files.append(str(tmp_path / name))
+        (tmp_path / name).write_bytes(b"x")
+    with pytest.raises(upload.WCIBConnectError):
+        wc.upload_files(1, files, {}, "", "", False, extra=True)
+    sess.post.assert_called_once()
+
+    data = tmp_path / "cpu_float_2024-01-01T00:00:00_2024-01-01T01:00:00_3_raw.csv"
+    data.write_bytes(b"x")
+    with pytest.raises(upload.WCIBConnectError):
+        wc.upload_files(1, [str(data)], {}, "", "metric", False)
+
+
 # --------------------------------------------------------------------------- #
 # create_dataset
 # --------------------------------------------------------------------------- #
@@ -157,6 +229,28 @@ def test_upload_data_ok(tmp_path):
     assert headers["Idempotency-Key"] == expected_key
 
 
+def test_upload_data_compressed(tmp_path):
+    wc, sess = _connected()
+    wc.compress = "zstd"
+    f = tmp_path / "cpu_float_2024-01-01T00:00:00Z_2024-01-02T00:00:00Z_3_raw.csv"
+    f.write_bytes(b"timestamp,value\n" * 10_000)
+    sess.post.return_value.json.return_value = {"fileId": 1}
+    wc._upload_data(1, str(f), _filedata(), False)
+    kwargs = sess.post.call_args.kwargs
+    body = kwargs["data"]
+    assert isinstance(body, upload.compression.MultipartBody)
+    assert "files" not in kwargs
+    assert kwargs["headers"]["Content-Type"] == body.content_type
+    size, key = upload.compression.size_and_key(str(f), "zstd")
+    assert kwargs["headers"]["Idempotency-Key"] == key
+    assert size < f.stat().st_size
+    assert f'name="filename"\r\n\r\n{f.name}.zst\r\n'.encode() in body.read()
+
+    compressed = tmp_path / "b.csv.gz"
+    assert wc._upload_name(str(compressed)) == "b.csv.gz"
+    assert wc._compression_of(str(compressed)) is None
+
+
 def test_upload_data_dryrun(tmp_path):
     wc, sess = _connected()
     f = tmp_path / "file.bin"
@@ -333,6 +427,24 @@ def test_upload_data_files_single(tmp_path, mocker):
     assert resp == {str(f): "P"}
 
 
+def test_upload_data_files_compressed_names(tmp_path, mocker):
+    wc, _ = _connected()
+    wc.compress = "zstd"
+    f = tmp_path / "file.json"
+    f.write_bytes(b"{}")
+    create = mocker.patch.object(
+        upload.utils, "create_filename", return_value=(True, "long_name")
+    )
+    parse = mocker.patch.object(
+        upload.utils, "parse_filename", return_value=("log", _filedata())
+    )
+    mocker.patch.object(wc, "_upload_data", return_value={"path": "P"})
+    wc._upload_data_files(1, [str(f)], _filedata(), "log", False)
+    assert create.call_args.args[1] == "file.json.zst"
+    wc._upload_data_files(1, [str(f), str(f)], _filedata(), "log", False)
+    assert parse.call_args.args[0] == "file.json.zst"
+
+
 def test_upload_data_files_single_bad_name(tmp_path, mocker):
     wc, _ = _connected()
     f = tmp_path / "file.csv"
@@ -374,6 +486,132 @@ def test_upload_data_files_upload_error(tmp_path, mocker):
     assert ret == 1
 
 
+# --------------------------------------------------------------------------- #
+# workers and retries
+# --------------------------------------------------------------------------- #
+def _answer(status, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    resp.request.headers = {"Content-Length": "100"}
+    return resp
+
+
+def test_request_retries_busy_answers(tmp_path, mocker):
+    sleep = mocker.patch.object(upload.time, "sleep")
+    wc = WCIBConnection("http://x/v1", token="tok", retries=2)
+    sess = MagicMock()
+    sess.get.return_value.status_code = 200
+    wc.connect(session=sess)
+    sess.post.side_effect = [
+        _answer(503, {"Retry-After": "7"}),
+        _answer(429),
+        _answer(200),
+    ]
+    f = tmp_path / "a.bin"
+    f.write_bytes(b"data")
+    body = io.BytesIO(b"form")
+    body.read()
+    with open(f, "rb") as fh:
+        fh.read()
+        files = {"file": ("a", fh)}
+        resp = wc._request("post", "http://x/v1/y", data=body, files=files)
+        assert fh.tell() == 0 and body.tell() == 0
+    assert resp.status_code == 200
+    assert sess.post.call_count == 3
+    assert sleep.call_args_list[0].args == (7.0,)
+    assert 0.5 <= sleep.call_args_list[1].args[0] <= 2.0
+    assert wc.limiter.in_flight == 0
+
+    sess.post.side_effect = [_answer(503)] * 3
+    assert wc._request("post", "http://x/v1/y").status_code == 503
+    assert sess.post.call_count == 6
+
+
+def test_upload_each_on_workers(mocker):
+    wc = WCIBConnection("http://x/v1", token="tok", workers=3)
+    mocker.patch.object(wc, "_annotate_uploaded")
+
+    def send(f):
+        if f == "bad":
+            raise ValueError("boom")
+        return {"path": f"P/{f}"}
+
+    ret, resp = wc._upload_each(1, ["a", "bad", "c"], send, None, None, False)
+    assert ret == 1
+    assert resp == {"a": "P/a", "c": "P/c"}
+
+    def unreachable(f):
+        raise upload.WCIBConnectError(f)
+
+    with pytest.raises(upload.WCIBConnectError):
+        wc._upload_each(1, ["a", "b"], unreachable, None, None, False)
+
+
+def test_workers_upload_at_once(tmp_path, mocker):
+    wc = WCIBConnection("http://x/v1", token="tok", workers=4)
+    mocker.patch.object(wc, "_annotate_uploaded")
+    sess = MagicMock()
+    sess.get.return_value.status_code = 200
+    wc.connect(session=sess)
+    # Each upload waits until all four are in flight.
+    barrier = threading.Barrier(4, timeout=5)
+
+    def post(*args, **kwargs):
+        barrier.wait()
+        resp = _answer(200)
+        resp.json.return_value = {"path": kwargs["data"]["filename"]}
+        return resp
+
+    sess.post.side_effect = post
+    files = []
+    for i in range(4):
+        files.append(str(tmp_path / f"f{i}.bin"))
+        (tmp_path / f"f{i}.bin").write_bytes(b"x" * (i + 1))
+
+    def send(f):
+        return wc._upload_data(1, f, _filedata(), False)
+
+    ret, resp = wc._upload_each(1, files, send, None, None, False)
+    assert ret == 0 and len(resp) == 4
+    assert wc.limiter.in_flight == 0
+
+
+def test_upload_each_largest_first_with_small_lanes(tmp_path, mocker):
+    wc = WCIBConnection("http://x/v1", token="tok", workers=2, small_lanes=1)
+    mocker.patch.object(wc, "_annotate_uploaded")
+    mocker.patch.object(upload.schedule, "SMALL_FILE_SIZE", 100)
+    files = []
+    for name, size in (("s1", 1), ("big", 1000), ("s2", 2), ("mid", 500)):
+        files.append(str(tmp_path / name))
+        (tmp_path / name).write_bytes(b"x" * size)
+    lanes = {}
+
+    def send(f):
+        lanes.setdefault(threading.current_thread().name, []).append(f)
+        return {"path": f}
+
+    ret, resp = wc._upload_each(1, files, send, None, None, False)
+    assert ret == 0 and list(resp) == files
+    (large,) = [lane for lane in lanes.values() if lane[0] == files[1]]
+    assert large[:2] == [files[1], files[3]]  # largest first
+    for lane in lanes.values():
+        if lane is not large:
+            assert all(os.path.getsize(f) <= 100 for f in lane)
+
+
+def test_connect_sizes_pool_to_workers():
+    wc = WCIBConnection("http://x/v1", token="tok", workers=4)
+    assert wc.max_workers == 16
+    assert wc.limiter.concurrency == 4 and wc.limiter.maximum == 16
+    sess = MagicMock()
+    wc.connect(session=sess, lazy=True)
+    adapter = sess.mount.call_args.args[1]
+    assert adapter._pool_maxsize == 16
+    assert sess.mount.call_count == 2
+    assert WCIBConnection("http://x/v1", workers=4, max_workers=2).max_workers == 4
+
+
 # --------------------------------------------------------------------------- #
 # delete
 # --------------------------------------------------------------------------- #
@@ -918,3 +1156,94 @@ def test_upload_data_normalizes_timestamps(tmp_path):
     # API requires RFC3339 date-time -> normalized with trailing Z
     assert form["start"] == "2024-01-31T21:00:00Z"
     assert form["stop"] == "2024-01-31T21:59:59Z"
+
+
+# --------------------------------------------------------------------------- #
+# local catalog
+# --------------------------------------------------------------------------- #
+def _cataloged(tmp_path):
+    """Return a connected WCIBConnection with a catalog, plus its session."""
+    wc, sess = _connected()
+    wc.catalog = catalog.Catalog(str(tmp_path / "catalog.db"))
+    post_resp = MagicMock()
+    post_resp.json.return_value = {"fileId": 5, "status": "READY", "path": "p/f"}
+    post_resp.raise_for_status.return_value = None
+    sess.post.return_value = post_resp
+    return wc, sess
+
+
+def test_catalog_skips_known_data_content(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    f = tmp_path / "file.bin"
+    f.write_bytes(b"data")
+    first = wc._upload_data(1, str(f), _filedata(), False)
+    again = wc._upload_data(1, str(f), _filedata(), False)
+    other = wc._upload_data(2, str(f), _filedata(), False)
+
+    assert first == again == other == {"fileId": 5, "status": "READY", "path": "p/f"}
+    # The second upload to dataset 1 is answered from the catalog.
+    assert sess.post.call_count == 2
+    row = wc.catalog.query(datasetid=1)[0]
+    assert row["name"] == "file.bin"
+    assert row["hash"] == xxhash.xxh128(b"data").hexdigest()
+    assert row["count"] == 3
+
+
+def test_catalog_is_per_portal_and_file_kind(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    f = tmp_path / "file.bin"
+    f.write_bytes(b"data")
+    wc._upload_data(1, str(f), _filedata(), False)
+    # Same content as an extra file of dataset 1, then on another portal.
+    wc._upload_extra(1, str(f), "", False)
+    wc.url = "https://other.example/api/v1"
+    wc._upload_data(1, str(f), _filedata(), False)
+    assert sess.post.call_count == 3
+    rows = wc.catalog.query(datasetid=1, extra=False)
+    assert [r["api"] for r in rows] == ["http://x/v1", "https://other.example/api/v1"]
+
+
+def test_catalog_skips_known_extra_content(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    f = tmp_path / "notes.md"
+    f.write_bytes(b"notes")
+    wc._upload_extra(1, str(f), "docs/", False)
+    assert wc._upload_extra(1, str(f), "docs", False)["fileId"] == 5
+    sess.post.assert_called_once()
+    assert wc.catalog.query(datasetid=1)[0]["name"] == "docs/notes.md"
+
+
+def test_catalog_dryrun_not_recorded(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    f = tmp_path / "file.bin"
+    f.write_bytes(b"data")
+    wc._upload_data(1, str(f), _filedata(), True)
+    sess.post.assert_not_called()
+    assert wc.catalog.query() == []
+
+
+def test_catalog_records_complete_listings_only(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    resp = MagicMock()
+    resp.json.return_value = {"data": [_file_entry(3)]}
+    resp.raise_for_status.return_value = None
+    sess.get.return_value = resp
+
+    wc._list_files(1, False, False, limit=1)
+    assert wc.catalog.query() == []
+    assert wc.list_files(1, False) == 0
+    rows = wc.catalog.query(datasetid=1)
+    assert [(r["file_id"], r["extra"]) for r in rows] == [(3, 0), (3, 1)]
+
+
+def test_catalog_forgets_deleted_dataset(tmp_path):
+    wc, sess = _cataloged(tmp_path)
+    f = tmp_path / "file.bin"
+    f.write_bytes(b"data")
+    wc._upload_data(1, str(f), _filedata(), False)
+    resp = MagicMock()
+    resp.json.return_value = {}
+    resp.raise_for_status.return_value = None
+    sess.delete.return_value = resp
+    assert wc.delete(1, True, False) == 0
+    assert wc.catalog.query() == []
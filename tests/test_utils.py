@@ -2,10 +2,13 @@
 
 import logging
 import os
+import random
+import re
+from datetime import datetime, timezone
 
 import pytest
 
-from dataportaltools.local_utils import utils
+from dataportaltools.local_utils import logjson, utils
 
 
 @pytest.fixture
@@ -45,6 +48,13 @@ def test_configure_logging_flag_overrides_env(monkeypatch, _restore_logging):
     assert logging.getLogger("toolslib").level == logging.INFO
 
 
+def test_configure_logging_json(mocker, _restore_logging):
+    basic = mocker.patch("dataportaltools.local_utils.utils.logging.basicConfig")
+    utils.configure_logging(0, "json")
+    (handler,) = basic.call_args.kwargs["handlers"]
+    assert isinstance(handler.formatter, logjson.JSONFormatter)
+
+
 def test_configure_logging_invalid_env_falls_back(monkeypatch, _restore_logging):
     monkeypatch.setenv("PORTAL_LOG_LEVEL", "NOTALEVEL")
     utils.configure_logging(0)
@@ -205,6 +215,24 @@ def test_parse_time_epoch_seconds():
     assert norm.endswith("Z")
 
 
+@pytest.mark.parametrize("epoch", [1700000000, 1700000000.0])
+def test_parse_time_numeric_epoch(epoch):
+    assert utils._parse_time(epoch)[1] == "2023-11-14T22:13:20Z"
+
+
+def test_create_filename_numeric_epoch():
+    data = {
+        "datatype": "float",
+        "dataflag": "raw",
+        "start": 1700000000,
+        "stop": 1700003600,
+        "count": 1,
+    }
+    ok, name = utils.create_filename(data, "cpu.csv", "metric")
+    assert ok
+    assert name == "cpu_float_2023-11-14T22:13:20Z_2023-11-14T23:13:20Z_1_raw.csv"
+
+
 def test_parse_time_invalid_string():
     assert utils._parse_time("totally-not-a-time") == (None, "")
 
@@ -214,6 +242,89 @@ def test_parse_time_too_large_epoch_invalid():
     assert utils._parse_time("99999999999999") == (None, "")
 
 
+def _legacy_parse_time(s):
+    """The generic parse _parse_time used for every value, kept as the oracle."""
+    if s == "":
+        return None, ""
+    try:
+        time_f = float(s)
+    except ValueError:
+        time_f = -1.0
+    if time_f > 1e9:
+        if time_f / 1e10 > 1.0:
+            return None, ""
+        time_o = datetime.fromtimestamp(time_f, timezone.utc)
+    else:
+        try:
+            time_o = datetime.fromisoformat(s)
+        except ValueError:
+            return None, ""
+    time_ts = time_o.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    time_ts = re.sub(r"\.000000", "", time_ts)
+    if "." in time_ts:
+        time_ts = time_ts[:-3]
+    return time_o, f"{time_ts}Z"
+
+
+_TIMES = [
+    "2024-01-31T23:59:59",
+    "2024-01-31T23:59:59Z",
+    "2024-01-31T23:59:59.000Z",
+    "2024-01-31T23:59:59.120",
+    "2024-01-31T23:59:59.999Z",
+    "2024-02-29T00:00:00Z",
+    "2023-02-29T00:00:00Z",
+    "2024-13-01T00:00:00",
+    "2024-01-01T24:00:00Z",
+    "2024-01-01T00:00:60",
+    "0999-01-01T00:00:00",
+    "2024-01-01T00:00:00.1234Z",
+    "2024-01-01T00:00:00+02:00",
+    "2024-01-01 00:00:00",
+    "1737645608",
+    "1737645608.5",
+    "99999999999999",
+    "not-a-time",
+    "",
+]
+
+
+def _mutate_time(rng, s):
+    chars = list(s)
+    for _ in range(rng.randint(1, 3)):
+        pos = rng.randrange(len(chars) + 1)
+        op = rng.random()
+        if op < 0.5 and chars:
+            chars[min(pos, len(chars) - 1)] = rng.choice("0123456789.:-TZ +")
+        elif op < 0.75:
+            chars.insert(pos, rng.choice("0123456789.Z"))
+        elif chars:
+            del chars[min(pos, len(chars) - 1)]
+    return "".join(chars)
+
+
+def _times_sample():
+    rng = random.Random(37)
+    return _TIMES + [_mutate_time(rng, rng.choice(_TIMES[:6])) for _ in range(3000)]
+
+
+def test_parse_time_fast_path_matches_generic_parse():
+    for s in _times_sample():
+        obj, norm = utils._parse_time(s)
+        expected_obj, expected_norm = _legacy_parse_time(s)
+        assert norm == expected_norm, s
+        assert obj == expected_obj, s
+        assert getattr(obj, "tzinfo", None) == getattr(expected_obj, "tzinfo", None)
+
+
+def test_normalize_timestamps_matches_scalar():
+    values = _times_sample()
+    assert utils.normalize_timestamps(values) == [
+        utils.normalize_timestamp(s)[1] for s in values
+    ]
+    assert utils.normalize_timestamps([]) == []
+
+
 # --- create_filename: ported from the original module __main__ assertions ---
 
 
@@ -429,6 +540,28 @@ def test_rename_from_data_explicit_tscol(tmp_path):
     assert "2024-03-01T00:00:00Z" in name
 
 
+def test_rename_from_data_epoch_and_format(tmp_path):
+    import pandas as pd
+
+    p = tmp_path / "d.csv"
+    pd.DataFrame({"value": [7, 8], "t": [1_704_067_200, 1_704_070_800]}).to_csv(
+        p, index=False
+    )
+    ok, name = utils.rename_from_data(str(p), name="e", kind="metric", dtype="int")
+    assert ok
+    assert "_2024-01-01T00:00:00Z_2024-01-01T01:00:00Z_2_" in name
+
+    p2 = tmp_path / "f.csv"
+    pd.DataFrame({"t": ["01/02/2024 10:00", "03/02/2024 10:00"]}).to_csv(
+        p2, index=False
+    )
+    ok, name = utils.rename_from_data(
+        str(p2), name="f", kind="metric", dtype="int", timestamp_format="%d/%m/%Y %H:%M"
+    )
+    assert ok
+    assert "_2024-02-01T10:00:00Z_2024-02-03T10:00:00Z_" in name
+
+
 def test_rename_from_data_bad_tscol_raises(tmp_path):
     p = tmp_path / "d.csv"
     _write_csv(p, ["2024-03-01T00:00:00Z"])
@@ -476,6 +609,63 @@ def test_normalize_dataframe_skips_listed_columns():
     assert review == []
 
 
+def test_normalize_dataframe_integral_floats_become_int():
+    import pandas as pd
+
+    frame = pd.DataFrame({"v": ["1.0", "2.0"], "big": ["1e300", "2"]})
+    review = utils.normalize_dataframe(frame)
+    assert pd.api.types.is_integer_dtype(frame["v"])
+    # Out of int64 range: kept as float rather than wrapped.
+    assert pd.api.types.is_float_dtype(frame["big"])
+    assert review == []
+
+
+def test_normalize_dataframe_uint64_beyond_int64_is_not_wrapped():
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {"u": ["18446744073709551615", "1"], "edge": ["9223372036854775807", "1"]}
+    )
+    review = utils.normalize_dataframe(frame)
+    assert pd.api.types.is_float_dtype(frame["u"])
+    assert frame["u"].iloc[0] == 2.0**64
+    assert frame["edge"].dtype == "int64"
+    assert frame["edge"].iloc[0] == 2**63 - 1
+    assert review == []
+
+
+def test_normalize_dataframe_late_text_or_missing_values_stay_text():
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {
+            # Text only past the sampled rows: caught by the full pass.
+            "late": [str(i) for i in range(999)] + ["oops"],
+            "gap": [str(i) for i in range(999)] + [None],
+        }
+    )
+    review = utils.normalize_dataframe(frame)
+    assert review == ["late", "gap"]
+    assert not pd.api.types.is_numeric_dtype(frame["late"])
+
+
+def test_normalize_dataframe_parallel_matches_serial():
+    import pandas as pd
+
+    cols = {f"i{n}": ["1", "2"] for n in range(6)}
+    cols.update({f"f{n}": ["1.5", "2"] for n in range(6)})
+    cols.update({f"t{n}": ["a", "2"] for n in range(6)})
+    serial, parallel = pd.DataFrame(cols), pd.DataFrame(cols)
+
+    review_serial = utils.normalize_dataframe(serial, workers=1)
+    review_parallel = utils.normalize_dataframe(parallel, workers=4)
+
+    assert review_serial == review_parallel == [f"t{n}" for n in range(6)]
+    assert list(serial.dtypes) == list(parallel.dtypes)
+    assert pd.api.types.is_integer_dtype(parallel["i0"])
+    assert pd.api.types.is_float_dtype(parallel["f5"])
+
+
 def _write_csv_cols(path, **cols):
     import pandas as pd
 
@@ -669,3 +859,164 @@ def test_convert_and_rename_create_filename_fails(tmp_path):
     ok, out, _ = utils.convert_and_rename(str(p), name="h", kind="metric", dtype="")
     assert not ok and out == ""
     assert not list(tmp_path.glob("*.parquet.zst"))
+
+
+# --------------------------------------------------------------------------- #
+# compact_dataframe / convert_and_rename(compact=True)
+# --------------------------------------------------------------------------- #
+def test_compact_dataframe_downcasts_and_dictionary_encodes():
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {
+            "ts": ["2022-01-01T00:00:00Z"] * 4,
+            "status": [200, 404, 200, 500],
+            "delta": [-3, 2, 1, 0],
+            "label": ["a", "b", "a", "a"],
+            "uniq": ["w", "x", "y", "z"],
+        }
+    )
+    savings = utils.compact_dataframe(frame, skip_cols=["ts"])
+    changed = {s["column"]: s for s in savings}
+
+    assert str(frame["status"].dtype) == "uint16"
+    assert str(frame["delta"].dtype) == "int8"
+    assert isinstance(frame["label"].dtype, pd.CategoricalDtype)
+    assert "uniq" not in changed  # too many distinct values
+    assert "ts" not in changed
+
+
+def test_compact_dataframe_reports_parquet_bytes():
+    import io
+
+    import numpy as np
+    import pandas as pd
+
+    def written(frame):
+        out = io.BytesIO()
+        frame.to_parquet(out, engine="pyarrow", compression="zstd", index=False)
+        return len(out.getvalue())
+
+    values = np.random.default_rng(0).integers(-30000, 30000, 20000)
+    frame = pd.DataFrame({"v": values})
+    before = written(frame)
+    [saved] = utils.compact_dataframe(frame)
+    assert (saved["from"], saved["to"]) == ("int64", "int16")
+    # Sizes on disk, not the 4x in memory: parquet stores int16 as 32-bit.
+    assert saved["before"] == before
+    assert saved["after"] == written(frame)
+    assert saved["after"] > saved["before"] / 2
+
+
+def test_compact_dataframe_float32_only_within_tolerance():
+    import pandas as pd
+
+    frame = pd.DataFrame({"coarse": [0.5, 1.25], "fine": [0.1, 1e-12 + 1.0]})
+    assert utils.compact_dataframe(frame) == []  # no tolerance: floats kept
+
+    savings = utils.compact_dataframe(frame, float_tolerance=1e-6)
+    assert [s["column"] for s in savings] == ["coarse", "fine"]
+    assert str(frame["coarse"].dtype) == "float32"
+
+    exact = pd.DataFrame({"v": [0.1, 0.2]})
+    assert utils.compact_dataframe(exact, float_tolerance=1e-12) == []
+    assert str(exact["v"].dtype) == "float64"
+
+
+def test_compact_dataframe_leaves_bools_and_narrow_columns():
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        {"flag": [True, False], "small": pd.Series([1, 2], dtype="uint8")}
+    )
+    assert utils.compact_dataframe(frame) == []
+
+
+def test_convert_and_rename_compact_reports_savings(tmp_path):
+    import pandas as pd
+
+    p = tmp_path / "dump.csv"
+    _write_csv_cols(
+        p,
+        timestamp=["2022-12-26T00:00:00Z", "2022-12-27T00:00:00Z"] * 3,
+        code=["200", "404"] * 3,
+        label=["up", "down"] * 3,
+    )
+    savings = []
+    ok, out_path, review = utils.convert_and_rename(
+        str(p), name="h", kind="metric", dtype="uint", compact=True, savings=savings
+    )
+    assert ok
+    assert review == ["label"]
+    assert {s["column"] for s in savings} == {"code", "label"}
+    df = pd.read_parquet(out_path)
+    assert str(df["code"].dtype) == "uint16"
+    assert isinstance(df["label"].dtype, pd.CategoricalDtype)
+
+
+# --------------------------------------------------------------------------- #
+# write_parquet / sort_by_time
+# --------------------------------------------------------------------------- #
+def test_write_parquet_applies_options(tmp_path):
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    out = tmp_path / "o.parquet.zst"
+    frame = pd.DataFrame({"v": range(10)})
+    utils.write_parquet(
+        frame,
+        str(out),
+        {"row_group_size": 4, "write_statistics": False, "compression_level": 9},
+    )
+    meta = pq.ParquetFile(out).metadata
+    assert meta.num_row_groups == 3
+    col = meta.row_group(0).column(0)
+    assert col.compression == "ZSTD"
+    assert not col.is_stats_set
+    assert pd.read_parquet(out)["v"].tolist() == list(range(10))
+
+
+def test_write_parquet_rejects_unknown_option(tmp_path):
+    import pandas as pd
+
+    with pytest.raises(ValueError, match="Unknown parquet option"):
+        utils.write_parquet(pd.DataFrame({"v": [1]}), str(tmp_path / "x"), {"bad": 1})
+
+
+def test_convert_and_rename_sort_by_time(tmp_path):
+    import pandas as pd
+
+    p = tmp_path / "dump.csv"
+    _write_csv_cols(
+        p,
+        timestamp=["2022-12-27T00:00:00Z", "bad", "2022-12-26T00:00:00Z"],
+        v=["3", "2", "1"],
+    )
+    ok, out_path, _ = utils.convert_and_rename(
+        str(p),
+        name="h",
+        kind="metric",
+        dtype="uint",
+        parquet_options={"threads": 1},
+        sort_by_time=True,
+    )
+    assert ok
+    df = pd.read_parquet(out_path)
+    # Parseable rows in time order, the unparseable one last; plain index.
+    assert df["v"].tolist() == [1, 3, 2]
+    assert isinstance(df.index, pd.RangeIndex)
+
+
+def test_sort_by_time_keeps_meaningful_index():
+    import pandas as pd
+
+    frame = pd.DataFrame({"v": [2, 1]}, index=["b", "a"])
+    times = pd.to_datetime(pd.Series(["2024-01-02", "2024-01-01"], index=frame.index))
+    assert utils._sort_by_time(frame, times).index.tolist() == ["a", "b"]
+
+
+def test_is_dataframe_format_and_synthetic_name():
+    assert utils.is_dataframe_format("a/B.CSV.zst")
+    assert utils.is_dataframe_format("x.parquet")
+    assert not utils.is_dataframe_format("x.json.zstd")
+    assert utils.synthetic_name("/d/dump.json.zstd", "app") == "app.json.zstd"
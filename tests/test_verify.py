@@ -0,0 +1,74 @@
+"""Tests for dataportaltools.local_utils.verify."""
+
+import pandas as pd
+
+from dataportaltools.local_utils import verify
+
+GOOD = "cpu_float_2024-01-01T00:00:00Z_2024-01-01T00:02:00Z_3_raw.csv"
+
+
+def _write(path, times=("00:00", "00:01", "00:02")):
+    stamps = [f"2024-01-01T{t}:00Z" for t in times]
+    pd.DataFrame({"timestamp": stamps, "v": range(len(stamps))}).to_csv(
+        path, index=False
+    )
+    return str(path)
+
+
+def test_verify_file_metric(tmp_path):
+    assert verify.verify_file(_write(tmp_path / GOOD)) == []
+    bad = _write(tmp_path / GOOD.replace("_3_", "_4_").replace("02:00Z", "03:00Z"))
+    assert verify.verify_file(bad) == [
+        "count 4 in name, 3 in data",
+        "stop 2024-01-01T00:03:00Z in name, 2024-01-01T00:02:00Z in data",
+    ]
+
+
+def test_verify_file_explicit_name_and_skips(tmp_path):
+    path = _write(tmp_path / "plain.csv")
+    assert verify.verify_file(path) == []  # extra file, not checked
+    assert verify.verify_file(path, GOOD) == []
+    assert verify.verify_file(path, GOOD.replace("_3_", "_x_")) == [
+        "count x in name, 3 in data"
+    ]
+    other = tmp_path / GOOD.replace(".csv", ".json")
+    other.write_text("{}")
+    assert verify.verify_file(str(other)) == []
+
+
+def test_verify_file_empty_and_no_timestamps(tmp_path):
+    empty = tmp_path / GOOD
+    empty.write_text("timestamp,v\n")
+    assert verify.verify_file(str(empty))[0] == "count 3 in name, 0 in data"
+    bad = tmp_path / GOOD.replace("cpu", "mem")
+    pd.DataFrame({"timestamp": ["x", "y", "z"]}).to_csv(bad, index=False)
+    assert verify.verify_file(str(bad)) == [
+        "start 2024-01-01T00:00:00Z in name, none in data",
+        "stop 2024-01-01T00:02:00Z in name, none in data",
+    ]
+
+
+def test_verify_file_log(tmp_path):
+    name = "app_2024-01-01T00:00:00Z_2024-01-01T00:00:05Z_2_40B_raw.json"
+    log = tmp_path / name
+    log.write_text(
+        '{"timestamp": "2024-01-01T00:00:00Z"}\n{"timestamp": "2024-01-01T00:00:05Z"}\n'
+    )
+    assert verify.verify_file(str(log)) == []
+    assert verify.verify_file(str(log), name.replace("_2_", "_3_")) == [
+        "count 3 in name, 2 in data"
+    ]
+
+
+def test_verify_files_serial_and_parallel(tmp_path):
+    good = [_write(tmp_path / GOOD.replace("cpu", f"c{i}")) for i in range(4)]
+    assert verify.verify_files(good, workers=1) == {}
+    assert verify.verify_files(good, workers=2) == {}
+
+    broken = tmp_path / GOOD.replace("cpu", "broken")
+    broken.write_bytes(b"\x00\xff")
+    failed = verify.verify_files(good + [str(broken)], workers=2)
+    assert list(failed) == [str(broken)]
+    assert failed[str(broken)][0].startswith("unreadable")
+    failed = verify.verify_files([str(broken)] + good, workers=1)
+    assert list(failed) == [str(broken)]